@@ -99,6 +99,12 @@ class City {
   final double? lat;
   final double? lon;
 
+  // Optional same-name disambiguation precomputed by the generator. Only
+  // present on records whose normalized name is shared with another record.
+  final String? disambiguationLabel;
+  final bool? preferredInNameCluster;
+  final bool? preferredInCountryCluster;
+
   const City({
     required this.id,
     required this.cityName,
@@ -114,6 +120,9 @@ class City {
     bool? defaultUse24h,
     this.lat,
     this.lon,
+    this.disambiguationLabel,
+    this.preferredInNameCluster,
+    this.preferredInCountryCluster,
   }) : _defaultUnitSystem = defaultUnitSystem,
        _defaultUse24h = defaultUse24h;
 
@@ -201,6 +210,9 @@ class City {
       defaultUse24h: json['defaultUse24h'] as bool,
       lat: (json['lat'] as num).toDouble(),
       lon: (json['lon'] as num).toDouble(),
+      disambiguationLabel: json['disambiguationLabel']?.toString(),
+      preferredInNameCluster: json['preferredInNameCluster'] as bool?,
+      preferredInCountryCluster: json['preferredInCountryCluster'] as bool?,
     );
   }
 
@@ -219,6 +231,9 @@ class City {
     'defaultUse24h': _defaultUse24h,
     'lat': lat,
     'lon': lon,
+    'disambiguationLabel': disambiguationLabel,
+    'preferredInNameCluster': preferredInNameCluster,
+    'preferredInCountryCluster': preferredInCountryCluster,
   };
 
   /// Rough distance helper for ranking (optional use).
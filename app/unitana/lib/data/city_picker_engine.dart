@@ -28,6 +28,8 @@ class CityPickerEngineEntry<T> {
   });
 }
 
+/// Scoring changes here must be mirrored in
+/// `tools/unitana_cities/search.py` (offline parity + latency benchmark).
 class CityPickerEngine {
   const CityPickerEngine._();
 
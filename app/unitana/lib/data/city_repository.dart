@@ -7,15 +7,24 @@ import 'cities.dart';
 /// Loads the city dataset from assets and caches it in memory.
 ///
 /// Primary source: assets/data/cities_v1.json
+/// Localized names: assets/data/city_names/<locale>.json, loaded per locale on
+/// first use (see [localizedCityName]).
 class CityRepository {
   CityRepository._();
 
   static final CityRepository instance = CityRepository._();
 
   static const String assetPath = 'assets/data/cities_v1.json';
+  static const String namesAssetDir = 'assets/data/city_names';
+
+  /// Locales with a generated name shard (tools/generate_cities_v1.py
+  /// `SUPPORTED_NAME_LOCALES`).
+  static const Set<String> nameLocales = <String>{'es', 'fr', 'pt'};
 
   List<City> _cities = const [];
   Map<String, City> _byId = const {};
+  Map<String, int> _indexById = const {};
+  final Map<String, Future<_CityNameShard?>> _nameShards = {};
   bool _loaded = false;
 
   /// Clears in-memory caches.
@@ -25,6 +34,8 @@ class CityRepository {
   void resetCache() {
     _cities = const [];
     _byId = const {};
+    _indexById = const {};
+    _nameShards.clear();
     _loaded = false;
   }
 
@@ -32,16 +43,7 @@ class CityRepository {
     if (_loaded) return _cities;
 
     final raw = await rootBundle.loadString(assetPath);
-    final decoded = json.decode(raw);
-
-    final List<dynamic> list;
-    if (decoded is List) {
-      list = decoded;
-    } else if (decoded is Map<String, dynamic> && decoded['cities'] is List) {
-      list = decoded['cities'] as List;
-    } else {
-      throw const FormatException('City dataset must be a JSON array');
-    }
+    final list = decodeRows(json.decode(raw));
 
     final loaded = list
         .whereType<Map>()
@@ -53,14 +55,101 @@ class CityRepository {
 
     _cities = loaded;
     _byId = {for (final c in loaded) c.id: c};
+    _indexById = {for (var i = 0; i < loaded.length; i++) loaded[i].id: i};
     _loaded = true;
     return _cities;
   }
 
+  /// Dataset rows in flat (v1) form.
+  ///
+  /// Accepts the v1 array, the schema v2 object (`countries` and `timeZones`
+  /// side tables, rows carry `timeZoneIndex`; see
+  /// docs/ai/design_lock/CITY_DATA_SCHEMA_CONTRACT.md) and any other object
+  /// with a `cities` array, which is read as-is.
+  static List<dynamic> decodeRows(Object? decoded) {
+    if (decoded is List) return decoded;
+    if (decoded is! Map<String, dynamic> || decoded['cities'] is! List) {
+      throw const FormatException('City dataset must be a JSON array');
+    }
+    final cities = decoded['cities'] as List;
+    if (decoded['schemaVersion'] != 2) return cities;
+
+    final countries = decoded['countries'] is Map
+        ? decoded['countries'] as Map
+        : const <String, dynamic>{};
+    final timeZones = decoded['timeZones'] is List
+        ? decoded['timeZones'] as List
+        : const <dynamic>[];
+    return cities
+        .map((row) {
+          if (row is! Map) return row;
+          final shared = countries[row['countryCode']];
+          final out = <String, dynamic>{
+            if (shared is Map) ...Map<String, dynamic>.from(shared),
+          };
+          row.forEach((key, value) {
+            if (key == 'timeZoneIndex') {
+              if (value is int && value >= 0 && value < timeZones.length) {
+                out['timeZoneId'] = timeZones[value];
+              }
+            } else {
+              out[key.toString()] = value;
+            }
+          });
+          return out;
+        })
+        .toList(growable: false);
+  }
+
   List<City> get cities => _cities;
 
   City? byId(String id) => _byId[id];
 
+  /// GeoNames preferred (or, with [short], short) name for [id] in
+  /// [languageCode], or null when there is none and callers should show
+  /// `City.cityName`.
+  ///
+  /// Each locale's shard is decoded once, on the first lookup for that locale.
+  /// A shard built for a different dataset (record count mismatch) is ignored,
+  /// since it is keyed by record index.
+  Future<String?> localizedCityName(
+    String id,
+    String languageCode, {
+    bool short = false,
+  }) async {
+    final locale = languageCode.toLowerCase();
+    if (!nameLocales.contains(locale)) return null;
+    final index = _indexById[id];
+    if (index == null) return null;
+    final shard = await _nameShards.putIfAbsent(
+      locale,
+      () => _loadNameShard(locale),
+    );
+    if (shard == null || shard.records != _cities.length) return null;
+    final key = '$index';
+    if (short) return shard.short[key] ?? shard.preferred[key];
+    return shard.preferred[key];
+  }
+
+  Future<_CityNameShard?> _loadNameShard(String locale) async {
+    try {
+      final raw = await rootBundle.loadString('$namesAssetDir/$locale.json');
+      final decoded = json.decode(raw);
+      if (decoded is! Map<String, dynamic>) return null;
+      return _CityNameShard(
+        records: (decoded['records'] as num?)?.toInt() ?? -1,
+        preferred: Map<String, String>.from(
+          decoded['preferred'] as Map? ?? const {},
+        ),
+        short: Map<String, String>.from(decoded['short'] as Map? ?? const {}),
+      );
+    } catch (_) {
+      // Shards are optional; a missing or malformed one means no
+      // localized names for that locale.
+      return null;
+    }
+  }
+
   /// Best-effort match for a stored place.
   ///
   /// This is intentionally forgiving: we normalize case/whitespace and then
@@ -169,3 +258,15 @@ class CityRepository {
     return s;
   }
 }
+
+class _CityNameShard {
+  final int records;
+  final Map<String, String> preferred;
+  final Map<String, String> short;
+
+  const _CityNameShard({
+    required this.records,
+    required this.preferred,
+    required this.short,
+  });
+}
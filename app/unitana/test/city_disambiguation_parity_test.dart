@@ -0,0 +1,46 @@
+import 'dart:convert';
+import 'dart:io';
+
+import 'package:flutter_test/flutter_test.dart';
+import 'package:unitana/data/cities.dart';
+import 'package:unitana/data/city_picker_engine.dart';
+import 'package:unitana/data/city_picker_ranking.dart';
+import 'package:unitana/data/city_repository.dart';
+
+void main() {
+  // The generator precomputes `preferredInCountryCluster` (most populous
+  // record per same-name, same-country cluster); the picker still ranks with
+  // `CityPickerRanking.exactCityDisambiguationBonus`. Both must pick the
+  // same time zone wherever the ranking has an opinion.
+  test('precomputed preferred zones agree with CityPickerRanking', () {
+    final file = File('assets/data/cities_v1.json');
+    expect(
+      file.existsSync(),
+      isTrue,
+      reason: 'Missing assets/data/cities_v1.json',
+    );
+
+    final decoded = jsonDecode(file.readAsStringSync());
+    final cities = CityRepository.decodeRows(decoded)
+        .whereType<Map>()
+        .map((m) => City.fromJson(Map<String, dynamic>.from(m)))
+        .where((c) => c.preferredInCountryCluster == true);
+
+    final disagreements = <String>[];
+    for (final city in cities) {
+      final cityNameNorm = CityPickerEngine.normalizeQuery(city.cityName);
+      final bonus = CityPickerRanking.exactCityDisambiguationBonus(
+        cityNameNorm: cityNameNorm,
+        countryCode: city.countryCode,
+        timeZoneId: city.timeZoneId,
+      );
+      if (bonus < 0) {
+        disagreements.add(
+          '$cityNameNorm|${city.countryCode}: generator prefers '
+          '${city.timeZoneId} (${city.id})',
+        );
+      }
+    }
+    expect(disagreements, isEmpty, reason: disagreements.join('\n'));
+  });
+}
@@ -0,0 +1,103 @@
+import 'package:flutter_test/flutter_test.dart';
+import 'package:unitana/data/cities.dart';
+import 'package:unitana/data/city_repository.dart';
+import 'package:unitana/data/city_schema_validator.dart';
+
+// Schema v2 fixture: the same two rows as [_v1Rows], written the way
+// `generate_cities_v1.py --schema-version 2` writes them.
+Map<String, dynamic> _v2Fixture() {
+  return <String, dynamic>{
+    'schemaVersion': 2,
+    'countries': <String, dynamic>{
+      'US': <String, dynamic>{
+        'countryName': 'United States',
+        'currencyCode': 'USD',
+        'defaultUnitSystem': 'imperial',
+        'defaultUse24h': false,
+      },
+    },
+    'timeZones': <String>['America/Denver', 'America/Los_Angeles'],
+    'cities': <dynamic>[
+      <String, dynamic>{
+        'id': 'gn_5746545',
+        'cityName': 'Portland',
+        'countryCode': 'US',
+        'timeZoneIndex': 1,
+        'lat': 45.52345,
+        'lon': -122.67621,
+      },
+      <String, dynamic>{
+        'id': 'override_us',
+        'cityName': 'Override',
+        'countryCode': 'US',
+        'timeZoneIndex': 0,
+        'defaultUse24h': true,
+        'lat': 39.7,
+        'lon': -105.0,
+      },
+    ],
+  };
+}
+
+List<Map<String, dynamic>> _v1Rows() {
+  return <Map<String, dynamic>>[
+    <String, dynamic>{
+      'id': 'gn_5746545',
+      'cityName': 'Portland',
+      'countryCode': 'US',
+      'countryName': 'United States',
+      'timeZoneId': 'America/Los_Angeles',
+      'currencyCode': 'USD',
+      'defaultUnitSystem': 'imperial',
+      'defaultUse24h': false,
+      'lat': 45.52345,
+      'lon': -122.67621,
+    },
+    <String, dynamic>{
+      'id': 'override_us',
+      'cityName': 'Override',
+      'countryCode': 'US',
+      'countryName': 'United States',
+      'timeZoneId': 'America/Denver',
+      'currencyCode': 'USD',
+      'defaultUnitSystem': 'imperial',
+      'defaultUse24h': true,
+      'lat': 39.7,
+      'lon': -105.0,
+    },
+  ];
+}
+
+void main() {
+  test('v1 arrays are returned as-is', () {
+    final rows = _v1Rows();
+    expect(identical(CityRepository.decodeRows(rows), rows), isTrue);
+  });
+
+  test('schema v2 rows expand to the equivalent v1 records', () {
+    final rows = CityRepository.decodeRows(_v2Fixture());
+
+    expect(rows, _v1Rows());
+    for (final row in rows) {
+      expect(
+        CitySchemaValidator.validateRecord(row as Map<String, dynamic>),
+        isEmpty,
+      );
+      expect(row.containsKey('timeZoneIndex'), isFalse);
+    }
+    // A per-row value overrides the shared country entry.
+    expect((rows[1] as Map)['defaultUse24h'], isTrue);
+    expect(
+      City.fromJson(rows[0] as Map<String, dynamic>).countryName,
+      'United States',
+    );
+  });
+
+  test('objects without a cities array are rejected', () {
+    expect(
+      () => CityRepository.decodeRows(<String, dynamic>{'schemaVersion': 2}),
+      throwsFormatException,
+    );
+    expect(() => CityRepository.decodeRows('nope'), throwsFormatException);
+  });
+}
@@ -0,0 +1,103 @@
+import 'dart:convert';
+import 'dart:typed_data';
+
+import 'package:flutter/services.dart';
+import 'package:flutter_test/flutter_test.dart';
+import 'package:unitana/data/city_repository.dart';
+
+Map<String, dynamic> _city(String id, String name, String tz) {
+  return <String, dynamic>{
+    'id': id,
+    'cityName': name,
+    'countryCode': 'PT',
+    'timeZoneId': tz,
+    'currencyCode': 'EUR',
+    'defaultUnitSystem': 'metric',
+    'defaultUse24h': true,
+    'lat': 38.7,
+    'lon': -9.1,
+  };
+}
+
+void main() {
+  TestWidgetsFlutterBinding.ensureInitialized();
+
+  final assets = <String, String>{};
+  final repo = CityRepository.instance;
+
+  setUp(() {
+    assets
+      ..clear()
+      ..[CityRepository.assetPath] = jsonEncode(<Object>[
+        _city('gn_2267057', 'Lisbon', 'Europe/Lisbon'),
+        _city('gn_2735943', 'Porto', 'Europe/Lisbon'),
+      ]);
+    rootBundle.clear();
+    repo.resetCache();
+    TestDefaultBinaryMessengerBinding.instance.defaultBinaryMessenger
+        .setMockMessageHandler('flutter/assets', (message) async {
+          final key = utf8.decode(
+            message!.buffer.asUint8List(
+              message.offsetInBytes,
+              message.lengthInBytes,
+            ),
+          );
+          final body = assets[Uri.decodeFull(key)];
+          if (body == null) return null;
+          return ByteData.sublistView(Uint8List.fromList(utf8.encode(body)));
+        });
+  });
+
+  tearDown(() {
+    TestDefaultBinaryMessengerBinding.instance.defaultBinaryMessenger
+        .setMockMessageHandler('flutter/assets', null);
+    rootBundle.clear();
+    repo.resetCache();
+  });
+
+  test('localizedCityName reads preferred and short names by index', () async {
+    assets['${CityRepository.namesAssetDir}/pt.json'] = jsonEncode(
+      <String, dynamic>{
+        'version': 1,
+        'locale': 'pt',
+        'records': 2,
+        'preferred': <String, String>{'0': 'Lisboa'},
+        'short': <String, String>{},
+      },
+    );
+    await repo.load();
+
+    expect(await repo.localizedCityName('gn_2267057', 'PT'), 'Lisboa');
+    // No short name: fall back to the preferred one.
+    expect(
+      await repo.localizedCityName('gn_2267057', 'pt', short: true),
+      'Lisboa',
+    );
+    expect(await repo.localizedCityName('gn_2735943', 'pt'), isNull);
+    expect(await repo.localizedCityName('missing', 'pt'), isNull);
+  });
+
+  test('mismatched, missing or unsupported shards fall back to the '
+      'default name', () async {
+    // Built for a different dataset: indexes cannot be trusted.
+    assets['${CityRepository.namesAssetDir}/es.json'] = jsonEncode(
+      <String, dynamic>{
+        'version': 1,
+        'locale': 'es',
+        'records': 3,
+        'preferred': <String, String>{'0': 'Lisboa (es)'},
+        'short': <String, String>{},
+      },
+    );
+    await repo.load();
+
+    Future<String> displayName(String languageCode) async {
+      return await repo.localizedCityName('gn_2267057', languageCode) ??
+          repo.byId('gn_2267057')!.cityName;
+    }
+
+    expect(await displayName('es'), 'Lisbon');
+    expect(await displayName('fr'), 'Lisbon'); // no shard asset
+    expect(await displayName('de'), 'Lisbon'); // not a name locale
+  });
+}
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Throughput and peak RSS benchmark for the alternateNamesV2.zip parse.
+
+Selects the cities15000 geonameids (the bulk of a real build), then streams
+the dump in a freshly spawned process so `ru_maxrss` covers interpreter
+startup and the parse only, and reports rows/s, MB/s and peak RSS against
+that process's baseline.
+
+Usage (from app/unitana):
+  python3 tools/bench_alternate_names.py --geonames-dir /path/to/geonames/files
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from generate_cities_v1 import SUPPORTED_NAME_LOCALES
+from unitana_cities.geonames import iter_cities, read_alternate_names_isolated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--geonames-dir",
+        required=True,
+        help="Directory containing cities15000.zip and alternateNamesV2.zip",
+    )
+    args = parser.parse_args()
+
+    geonames_dir = Path(args.geonames_dir).expanduser().resolve()
+    selected = {r.geonameid for r in iter_cities(geonames_dir / "cities15000.zip")}
+    _, stats = read_alternate_names_isolated(geonames_dir / "alternateNamesV2.zip", selected, SUPPORTED_NAME_LOCALES)
+
+    print(f"selected={len(selected)} locales={','.join(SUPPORTED_NAME_LOCALES)}")
+    print(
+        f"rows={stats.rows:,} megabytes={stats.bytes_read / (1 << 20):.1f} seconds={stats.seconds:.2f} "
+        f"rowsPerSecond={stats.rows_per_second:,.0f} megabytesPerSecond={stats.mb_per_second:.1f}"
+    )
+    if stats.peak_rss_mb is None:
+        print("peakRssMb=n/a (no resource module on this platform)")
+    else:
+        print(f"peakRssMb={stats.peak_rss_mb:.0f} baselineRssMb={stats.baseline_rss_mb:.0f}")
+    print(f"kept={stats.kept:,} " + " ".join(f"{loc}={n:,}" for loc, n in stats.locales.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Throughput benchmark for the `unitana_cities` dataset package.
+
+Reports open latency, first-use index build time, and queries/second for each
+query type against a built dataset.
+
+Usage (from app/unitana):
+  python3 tools/bench_city_dataset.py --input assets/data/cities_v1.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from pathlib import Path
+from typing import Callable, List, Sequence
+
+from unitana_cities import CityDataset
+
+
+def _ops_per_sec(fn: Callable[[object], object], args: Sequence[object], min_seconds: float) -> float:
+    done = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_seconds:
+        for a in args:
+            fn(a)
+        done += len(args)
+        elapsed = time.perf_counter() - start
+    return done / elapsed
+
+
+def _timed_ms(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input",
+        default="assets/data/cities_v1.json",
+        help="Path to city dataset JSON asset",
+    )
+    parser.add_argument("--seconds", type=float, default=1.0, help="Minimum run time per query type")
+    parser.add_argument("--sample", type=int, default=500, help="Distinct query arguments per type")
+    parser.add_argument("--cache-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    path = Path(args.input).expanduser()
+    start = time.perf_counter()
+    ds = CityDataset.open(path, cache_size=args.cache_size)
+    open_ms = (time.perf_counter() - start) * 1000.0
+
+    with ds:
+        print(f"dataset={path} openMs={open_ms:.2f}")
+        print(f"index.spansMs={_timed_ms(ds._spans):.1f} records={len(ds)}")
+        print(f"index.idMs={_timed_ms(ds._id_index):.1f}")
+        print(f"index.placeMs={_timed_ms(ds._place_index):.1f}")
+        print(f"index.countryMs={_timed_ms(ds._country_index):.1f}")
+        print(f"index.timeZoneMs={_timed_ms(ds._time_zone_index):.1f}")
+        print(f"index.coordinatesMs={_timed_ms(ds._coordinate_index):.1f}")
+
+        rng = random.Random(7)
+        sample = [ds.record(rng.randrange(len(ds))) for _ in range(args.sample)]
+        ds.record.cache_clear()
+        ids: List[object] = [r.id for r in sample]
+        names: List[object] = [r.city_name.upper() for r in sample]
+        countries: List[object] = sorted({r.country_code for r in sample})
+        zones: List[object] = sorted({r.time_zone_id for r in sample})
+        points: List[object] = [(r.lat + 0.05, r.lon - 0.05) for r in sample]
+
+        rows = [
+            ("by_id", lambda a: ds.by_id(a), ids),
+            ("by_place", lambda a: ds.by_place(a), names),
+            ("in_country", lambda a: ds.in_country(a), countries),
+            ("in_time_zone", lambda a: ds.in_time_zone(a), zones),
+            ("nearest_k1", lambda a: ds.nearest(a[0], a[1]), points),
+            ("nearest_k10", lambda a: ds.nearest(a[0], a[1], limit=10), points),
+        ]
+        for label, fn, qargs in rows:
+            qps = _ops_per_sec(fn, qargs, args.seconds)
+            print(f"{label}: {qps:,.0f} ops/s")
+
+        info = ds.record.cache_info()
+        print(f"decodeCache hits={info.hits} misses={info.misses} size={info.currsize}/{info.maxsize}")
+
+
+if __name__ == "__main__":
+    main()
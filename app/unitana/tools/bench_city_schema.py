@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Compare city dataset schema v1 and v2 on asset size and JSON decode cost.
+
+Builds the v2 layout from a v1 asset in memory (or reads both from disk) and
+reports raw and gzip size (the APK/IPA store assets compressed), decode time,
+and decode allocations: the peak traced memory during `json.loads` and the
+blocks/bytes still held by the decoded document. `v2+expand` adds the
+expansion back to flat rows that `CityRepository.decodeRows` performs.
+Allocations are measured with `tracemalloc` on CPython's decoder; they are a
+proxy for `dart:convert`, which allocates per string, map and list the same
+way.
+
+Usage (from app/unitana):
+  python3 tools/bench_city_schema.py --input assets/data/cities_v1.json
+  python3 tools/bench_city_schema.py --input v1.json --v2 v2.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from unitana_cities.schema import compact_v2, dataset_rows
+
+
+def _timed_ms(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - start) * 1000.0)
+    return best
+
+
+def _allocations(fn: Callable[[], object]) -> Tuple[int, int, int]:
+    """(peak bytes, retained blocks, retained bytes) while `fn`'s result is alive."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().statistics("filename")
+        blocks = sum(s.count for s in stats)
+        size = sum(s.size for s in stats)
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak, blocks, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input",
+        default="assets/data/cities_v1.json",
+        help="Path to the v1 city dataset JSON asset",
+    )
+    parser.add_argument("--v2", default="", help="Optional prebuilt v2 file (default: compact --input in memory)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed decodes per layout (best is reported)")
+    args = parser.parse_args()
+
+    v1_bytes = Path(args.input).expanduser().read_bytes()
+    if args.v2:
+        v2_bytes = Path(args.v2).expanduser().read_bytes()
+    else:
+        v2_doc = compact_v2(json.loads(v1_bytes))
+        v2_bytes = json.dumps(v2_doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    v2_doc = json.loads(v2_bytes)
+    print(
+        f"records={len(v2_doc['cities'])} countries={len(v2_doc['countries'])} "
+        f"timeZones={len(v2_doc['timeZones'])}"
+    )
+
+    rows: List[Tuple[str, int, int, Callable[[], object]]] = [
+        ("v1", len(v1_bytes), len(gzip.compress(v1_bytes, 9)), lambda: json.loads(v1_bytes)),
+        ("v2", len(v2_bytes), len(gzip.compress(v2_bytes, 9)), lambda: json.loads(v2_bytes)),
+        ("v2+expand", len(v2_bytes), len(gzip.compress(v2_bytes, 9)), lambda: dataset_rows(json.loads(v2_bytes))),
+    ]
+    base_raw, base_gz = rows[0][1], rows[0][2]
+    print(
+        f"{'layout':<10} {'bytes':>11} {'gzip':>10} {'decodeMs':>9} "
+        f"{'peakMB':>8} {'heldBlocks':>11} {'heldMB':>8}"
+    )
+    for label, raw, gz, fn in rows:
+        ms = _timed_ms(fn, args.repeat)
+        peak, blocks, held = _allocations(fn)
+        print(
+            f"{label:<10} {raw:>11,} {gz:>10,} {ms:>9.1f} "
+            f"{peak / (1 << 20):>8.1f} {blocks:>11,} {held / (1 << 20):>8.1f}"
+        )
+    print(
+        f"v2 vs v1: bytes {100.0 * (1 - rows[1][1] / base_raw):.1f}% smaller, "
+        f"gzip {100.0 * (1 - rows[1][2] / base_gz):.1f}% smaller"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Latency benchmark for city picker search (`unitana_cities.search`).
+
+Runs the query corpus through the linear `search_entries` port and the
+postings-backed `SearchIndex` the way the wizard calls them (`wizard_search`:
+normalized query, wizard options), checks that both return the same rows,
+and reports p50/p99 latency per query plus how each path scales over growing
+slices of the dataset.
+
+Usage (from app/unitana):
+  python3 tools/bench_city_search.py --input assets/data/cities_v1.json
+  python3 tools/bench_city_search.py --sizes 0.25,0.5,1 --repeat 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Sequence, Tuple
+
+from generate_cities_v1 import CURATED_CITIES
+from unitana_cities.search import SearchIndex, wizard_entries, wizard_search
+
+DEFAULT_QUERIES = Path(__file__).resolve().parent / "city_search_queries.txt"
+
+
+def load_queries(path: Path) -> List[str]:
+    out: List[str] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        out.append(line)
+    return out
+
+
+def load_records(path: Path) -> List[dict]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(data, dict):
+        data = data.get("cities", [])
+    return [r for r in data if isinstance(r, dict)]
+
+
+def _percentile(samples: Sequence[float], pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100.0 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def _latencies_ms(fn: Callable[[], object], repeat: int) -> List[float]:
+    out: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - start) * 1000.0)
+    return out
+
+
+def _run(records: List[dict], queries: List[str], repeat: int) -> Tuple[dict, List[Tuple[str, int, float, float, float, float]]]:
+    start = time.perf_counter()
+    entries = wizard_entries(records, [c["id"] for c in CURATED_CITIES])
+    build_ms = (time.perf_counter() - start) * 1000.0
+    start = time.perf_counter()
+    index = SearchIndex(entries)
+    index_ms = (time.perf_counter() - start) * 1000.0
+
+    per_query = []
+    naive_all: List[float] = []
+    indexed_all: List[float] = []
+    for q in queries:
+        naive = wizard_search(entries, q)
+        indexed = wizard_search(index, q)
+        if [e.key for e in naive] != [e.key for e in indexed]:
+            raise SystemExit(f"result mismatch for query {q!r}")
+        n = _latencies_ms(lambda: wizard_search(entries, q), repeat)
+        i = _latencies_ms(lambda: wizard_search(index, q), repeat)
+        naive_all.extend(n)
+        indexed_all.extend(i)
+        per_query.append((q, len(naive), _percentile(n, 50), _percentile(n, 99), _percentile(i, 50), _percentile(i, 99)))
+
+    summary = {
+        "records": len(records),
+        "entries": len(entries),
+        "buildEntriesMs": build_ms,
+        "indexMs": index_ms,
+        "naiveP50": _percentile(naive_all, 50),
+        "naiveP99": _percentile(naive_all, 99),
+        "indexedP50": _percentile(indexed_all, 50),
+        "indexedP99": _percentile(indexed_all, 99),
+    }
+    return summary, per_query
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input",
+        default="assets/data/cities_v1.json",
+        help="Path to city dataset JSON asset",
+    )
+    parser.add_argument("--queries", default=str(DEFAULT_QUERIES), help="Query corpus, one query per line")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query and path")
+    parser.add_argument(
+        "--sizes",
+        default="0.125,0.25,0.5,1",
+        help="Comma-separated dataset fractions for the scaling table",
+    )
+    args = parser.parse_args()
+
+    records = load_records(Path(args.input).expanduser())
+    queries = load_queries(Path(args.queries))
+    fractions = sorted(float(s) for s in args.sizes.split(",") if s.strip())
+    if not records or not queries or not fractions:
+        sys.exit("need records, queries and at least one size")
+
+    print(f"dataset={args.input} records={len(records)} queries={len(queries)} repeat={args.repeat}")
+    print()
+    print(f"{'records':>8} {'buildMs':>9} {'indexMs':>9} {'naiveP50':>9} {'naiveP99':>9} {'idxP50':>9} {'idxP99':>9}")
+    full_rows: List[Tuple[str, int, float, float, float, float]] = []
+    for fraction in fractions:
+        subset = records[: max(1, int(len(records) * fraction))]
+        summary, per_query = _run(subset, queries, args.repeat)
+        full_rows = per_query
+        print(
+            f"{summary['records']:>8} {summary['buildEntriesMs']:>9.1f} {summary['indexMs']:>9.1f} "
+            f"{summary['naiveP50']:>9.3f} {summary['naiveP99']:>9.3f} "
+            f"{summary['indexedP50']:>9.3f} {summary['indexedP99']:>9.3f}"
+        )
+
+    print()
+    print(f"per query at {int(len(records) * fractions[-1])} records (ms):")
+    print(f"{'query':<22} {'hits':>5} {'naiveP50':>9} {'naiveP99':>9} {'idxP50':>9} {'idxP99':>9}")
+    for q, hits, n50, n99, i50, i99 in full_rows:
+        print(f"{q[:22]:<22} {hits:>5} {n50:>9.3f} {n99:>9.3f} {i50:>9.3f} {i99:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
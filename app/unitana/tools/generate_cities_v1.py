@@ -10,225 +10,64 @@ Required inputs (download from https://www.geonames.org/export/dump/):
   - admin1CodesASCII.txt
   - countryInfo.txt
 
+Optional input:
+  - alternateNamesV2.zip (localized city names; without it the name shard stages are skipped)
+
 Usage (from app/unitana):
   python3 tools/generate_cities_v1.py \
     --geonames-dir /path/to/geonames/files \
-    --output assets/data/cities_v1.json
+    --output assets/data/cities_v1.json \
+    --names-dir assets/data/city_names
 
 Notes:
   - The generated list includes all cities in cities15000 plus any missing capitals found in cities1000.
+  - Same-name cities get a precomputed `disambiguationLabel` and preferred-record flags;
+    pass --disambiguation-report <path> to also write every cluster found.
   - The dataset is large; keep it as a bundled asset for predictable, offline operation.
+  - The build runs as cached stages (parse, admin/country tables, capital resolution,
+    record assembly, validation, serialization). Artifacts live in --cache-dir and are
+    keyed by input content and stage code (including every helper a stage calls by
+    name), so unchanged stages are skipped; use --force <stage> (or --force all) to
+    rerun one along with every stage downstream of it.
+  - Localized city names come from alternateNamesV2.zip, streamed without unpacking. Only
+    preferred and short names for the selected cities and SUPPORTED_NAME_LOCALES are kept,
+    one shard per locale (`<names-dir>/<locale>.json`) keyed by record index, so the app
+    loads a locale only when it needs it. Parse throughput is printed. With --jobs 1 the
+    parse runs inline; with --jobs > 1 or --isolate-names it runs in a fresh process and
+    its peak RSS is printed too (a fresh process, so earlier stages do not inflate it).
+  - --schema-version 2 writes the normalized layout (`unitana_cities.schema`): a
+    `countries` side table and an interned `timeZones` list ahead of `cities`. Record
+    indexes are identical in both layouts, so name shards work with either.
 """
 
 from __future__ import annotations
 
 import argparse
 import json
-import re
-import unicodedata
-import zipfile
-from dataclasses import dataclass
+import os
+import tempfile
+from collections import Counter
+from functools import partial
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set, Tuple
-
-
-_PUNCT_RE = re.compile(r"[^a-z0-9\s]")
-_SPACE_RE = re.compile(r"\s+")
-
-
-def _strip_diacritics(s: str) -> str:
-    return "".join(
-        ch for ch in unicodedata.normalize("NFD", s) if unicodedata.category(ch) != "Mn"
-    )
-
-
-def _norm(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = _strip_diacritics(s)
-    s = s.replace("&", " and ")
-    s = _PUNCT_RE.sub(" ", s)
-    s = _SPACE_RE.sub(" ", s).strip()
-    return s
-
-
-def _capital_variants(capital: str) -> List[str]:
-    base = _norm(capital)
-    out: Set[str] = {base}
-
-    # Common Saint abbreviations.
-    if base.startswith("st "):
-        out.add("saint " + base[3:])
-    if base.startswith("st "):
-        out.add("st" + base[2:])
-
-    # Some countryInfo capitals use hyphenation; try a space variant.
-    out.add(base.replace("-", " "))
-
-    # Macau vs Macao.
-    if base == "macao":
-        out.add("macau")
-
-    return [v for v in out if v]
-
-
-@dataclass(frozen=True)
-class Country:
-    code2: str
-    name: str
-    iso3: str
-    capital: str
-    continent: str
-    currency: str
-
-
-@dataclass
-class GeoRow:
-    geonameid: int
-    name: str
-    asciiname: str
-    alternates: List[str]
-    country: str
-    admin1: str
-    tz: str
-    population: int
-    lat: float
-    lon: float
-
-
-def _read_country_info(path: Path) -> Dict[str, Country]:
-    countries: Dict[str, Country] = {}
-    with path.open("r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            if not line.strip() or line.startswith("#"):
-                continue
-            parts = line.rstrip("\n").split("\t")
-            if len(parts) < 11:
-                continue
-            code2 = parts[0].strip()
-            iso3 = parts[1].strip()
-            name = parts[4].strip()
-            capital = parts[5].strip()
-            continent = parts[8].strip()
-            currency = parts[10].strip()
-            if not code2:
-                continue
-            countries[code2] = Country(
-                code2=code2,
-                name=name,
-                iso3=iso3,
-                capital=capital,
-                continent=continent,
-                currency=currency,
-            )
-    return countries
-
-
-def _read_admin1(path: Path) -> Dict[str, str]:
-    # Key format: CC.ADMIN1 (e.g. US.CO)
-    out: Dict[str, str] = {}
-    with path.open("r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            if not line.strip() or line.startswith("#"):
-                continue
-            parts = line.rstrip("\n").split("\t")
-            if len(parts) < 2:
-                continue
-            out[parts[0].strip()] = parts[1].strip()
-    return out
-
-
-def _iter_geonames_cities(zip_path: Path) -> Iterable[GeoRow]:
-    with zipfile.ZipFile(zip_path, "r") as z:
-        # Each zip contains a single .txt with the same stem.
-        txt_names = [n for n in z.namelist() if n.endswith(".txt")]
-        if not txt_names:
-            raise RuntimeError(f"No .txt found in {zip_path}")
-        txt_name = txt_names[0]
-        with z.open(txt_name) as raw:
-            for b in raw:
-                line = b.decode("utf-8", errors="ignore").rstrip("\n")
-                if not line:
-                    continue
-                parts = line.split("\t")
-                if len(parts) < 19:
-                    continue
-
-                # GeoNames schema for cities*.txt
-                # 0 geonameid
-                # 1 name
-                # 2 asciiname
-                # 3 alternatenames
-                # 8 country code
-                # 10 admin1
-                # 14 population
-                # 17 timezone
-                # 4 latitude
-                # 5 longitude
-                try:
-                    geonameid = int(parts[0])
-                except ValueError:
-                    continue
-
-                name = parts[1].strip()
-                asciiname = parts[2].strip()
-                alternates = [a for a in (parts[3] or "").split(",") if a]
-                country = parts[8].strip()
-                admin1 = parts[10].strip()
-                tz = parts[17].strip()
-                try:
-                    lat = float(parts[4])
-                    lon = float(parts[5])
-                except ValueError:
-                    continue
-                try:
-                    population = int(parts[14])
-                except ValueError:
-                    population = 0
-
-                # Keep only populated places.
-                if parts[6].strip() != "P":
-                    continue
-
-                if not (name and country and tz):
-                    continue
-
-                yield GeoRow(
-                    geonameid=geonameid,
-                    name=name,
-                    asciiname=asciiname,
-                    alternates=alternates,
-                    country=country,
-                    admin1=admin1,
-                    tz=tz,
-                    population=population,
-                    lat=lat,
-                    lon=lon,
-                )
-
-
-def _best_capital_match(rows: List[GeoRow], country_code: str, capital: str) -> Optional[GeoRow]:
-    variants = _capital_variants(capital)
-    for v in variants:
-        best: Optional[GeoRow] = None
-        for r in rows:
-            if r.country != country_code:
-                continue
-            if _norm(r.name) == v or _norm(r.asciiname) == v:
-                if best is None or r.population > best.population:
-                    best = r
-        if best is not None:
-            return best
-
-    # Fall back to alternatenames matching.
-    vset = set(variants)
-    best: Optional[GeoRow] = None
-    for r in rows:
-        if r.country != country_code:
-            continue
-        if any(_norm(a) in vset for a in r.alternates[:80]):
-            if best is None or r.population > best.population:
-                best = r
-    return best
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from unitana_cities.geonames import (
+    Country,
+    GeoRow,
+    LocalizedName,
+    best_capital_match,
+    capital_variants,
+    iter_cities,
+    norm_name,
+    read_admin1,
+    read_alternate_names,
+    read_alternate_names_isolated,
+    read_country_info,
+    strip_diacritics,
+)
+from unitana_cities.pipeline import Stage, run_pipeline
+from unitana_cities.schema import COUNTRY_FIELDS, SCHEMA_VERSION, compact_v2, dataset_rows, is_v2
+from unitana_cities.search import fold_diacritics, normalize_query
 
 
 def _default_unit_system(country_code: str) -> str:
@@ -245,13 +84,332 @@ def _default_use_24h(country_code: str) -> bool:
     return True
 
 
-def build_asset(geonames_dir: Path, output_path: Path) -> None:
-    country_info = _read_country_info(geonames_dir / "countryInfo.txt")
-    admin1 = _read_admin1(geonames_dir / "admin1CodesASCII.txt")
-
-    cities_15000 = list(_iter_geonames_cities(geonames_dir / "cities15000.zip"))
-    cities_1000 = list(_iter_geonames_cities(geonames_dir / "cities1000.zip"))
+_LABEL_QUALIFIERS: List[Tuple[str, ...]] = [
+    ("admin1",),
+    ("country",),
+    ("timeZone",),
+    ("admin1", "country"),
+    ("admin1", "timeZone"),
+    ("country", "timeZone"),
+    ("admin1", "country", "timeZone"),
+]
+
+
+def _qualifier_values(row: dict, keys: Tuple[str, ...]) -> Optional[Tuple[str, ...]]:
+    values = {
+        "admin1": (row.get("admin1Name") or "").strip(),
+        "country": row["countryCode"],
+        "timeZone": row["timeZoneId"],
+    }
+    out = tuple(values[k] for k in keys)
+    return out if all(out) else None
+
+
+def _format_label(city_name: str, keys: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    parts = [city_name]
+    tz = ""
+    for k, v in zip(keys, values):
+        if k == "timeZone":
+            tz = v
+        else:
+            parts.append(v)
+    label = ", ".join(parts)
+    return f"{label} ({tz})" if tz else label
+
+
+def _add_disambiguation(records: List[dict], population_by_id: Dict[str, int]) -> dict:
+    """Annotate same-name records with precomputed labels and preferred flags.
+
+    Clusters are built in one hashed pass over GeoNames records, keyed by
+    name and by name + country, both normalized with the picker's
+    `normalize_query` so `preferredZoneByCityCountry` keys match the lookups
+    in `CityPickerRanking`. Each ambiguous record
+    gets `disambiguationLabel`: the city name plus the fewest qualifiers
+    (admin1 name, then country, then timezone) that no other record in its
+    name cluster shares. `preferredInNameCluster` / `preferredInCountryCluster`
+    mark the most populous record of each cluster. Curated seeds duplicate
+    GeoNames places, so they copy the annotations of their GeoNames twin.
+
+    Returns a report of every cluster found.
+    """
+    by_name: Dict[str, List[int]] = {}
+    by_name_country: Dict[str, List[int]] = {}
+    curated: List[int] = []
+    for i, row in enumerate(records):
+        if not row["id"].startswith("gn_"):
+            curated.append(i)
+            continue
+        name = normalize_query(row["cityName"])
+        by_name.setdefault(name, []).append(i)
+        by_name_country.setdefault(f"{name}|{row['countryCode']}", []).append(i)
+
+    def preferred(members: List[int]) -> int:
+        return max(members, key=lambda i: (population_by_id.get(records[i]["id"], 0), -i))
+
+    clusters: List[dict] = []
+    unresolved = 0
+    for key in sorted(by_name):
+        members = by_name[key]
+        if len(members) < 2:
+            continue
+        best = preferred(members)
+        counts = {
+            keys: Counter(_qualifier_values(records[i], keys) for i in members)
+            for keys in _LABEL_QUALIFIERS
+        }
+        for i in members:
+            row = records[i]
+            label = None
+            for keys in _LABEL_QUALIFIERS:
+                values = _qualifier_values(row, keys)
+                if values is not None and counts[keys][values] == 1:
+                    label = _format_label(row["cityName"], keys, values)
+                    break
+            if label is None:
+                unresolved += 1
+                keys = tuple(k for k in ("admin1", "country", "timeZone") if _qualifier_values(row, (k,)))
+                label = _format_label(row["cityName"], keys, _qualifier_values(row, keys) or ())
+            row["disambiguationLabel"] = label
+            row["preferredInNameCluster"] = i == best
+        clusters.append(
+            {
+                "key": key,
+                "preferredId": records[best]["id"],
+                "members": [
+                    {
+                        "id": records[i]["id"],
+                        "label": records[i]["disambiguationLabel"],
+                        "population": population_by_id.get(records[i]["id"], 0),
+                    }
+                    for i in members
+                ],
+            }
+        )
 
+    preferred_zones: Dict[str, str] = {}
+    for key in sorted(by_name_country):
+        members = by_name_country[key]
+        if len(members) < 2:
+            continue
+        best = preferred(members)
+        for i in members:
+            records[i]["preferredInCountryCluster"] = i == best
+        preferred_zones[key] = records[best]["timeZoneId"]
+
+    for i in curated:
+        row = records[i]
+        twins = [
+            records[j]
+            for j in by_name.get(normalize_query(row["cityName"]), [])
+            if records[j]["countryCode"] == row["countryCode"]
+            and records[j]["timeZoneId"] == row["timeZoneId"]
+        ]
+        if not twins:
+            continue
+        twin = min(twins, key=lambda t: (t["lat"] - row["lat"]) ** 2 + (t["lon"] - row["lon"]) ** 2)
+        for field in ("disambiguationLabel", "preferredInNameCluster", "preferredInCountryCluster"):
+            if field in twin:
+                row[field] = twin[field]
+
+    return {
+        "nameClusters": len(clusters),
+        "nameCountryClusters": len(preferred_zones),
+        "unresolvedLabels": unresolved,
+        # Drop-in data for CityPickerRanking._preferredZoneByCityCountry.
+        "preferredZoneByCityCountry": preferred_zones,
+        "clusters": clusters,
+    }
+
+
+# Seed curated IDs so onboarding defaults remain stable even if GeoNames names shift.
+CURATED_CITIES: List[dict] = [
+    {
+        "id": "denver_us",
+        "cityName": "Denver",
+        "countryCode": "US",
+        "timeZoneId": "America/Denver",
+        "currencyCode": "USD",
+        "defaultUnitSystem": "imperial",
+        "defaultUse24h": False,
+        "admin1Code": "CO",
+        "admin1Name": "Colorado",
+        "countryName": "United States",
+        "iso3": "USA",
+        "continent": "NA",
+        "lat": 39.7392,
+        "lon": -104.9903,
+    },
+    {
+        "id": "new_york_us",
+        "cityName": "New York",
+        "countryCode": "US",
+        "timeZoneId": "America/New_York",
+        "currencyCode": "USD",
+        "defaultUnitSystem": "imperial",
+        "defaultUse24h": False,
+        "admin1Code": "NY",
+        "admin1Name": "New York",
+        "countryName": "United States",
+        "iso3": "USA",
+        "continent": "NA",
+        "lat": 40.71427,
+        "lon": -74.00597,
+    },
+    {
+        "id": "los_angeles_us",
+        "cityName": "Los Angeles",
+        "countryCode": "US",
+        "timeZoneId": "America/Los_Angeles",
+        "currencyCode": "USD",
+        "defaultUnitSystem": "imperial",
+        "defaultUse24h": False,
+        "admin1Code": "CA",
+        "admin1Name": "California",
+        "countryName": "United States",
+        "iso3": "USA",
+        "continent": "NA",
+        "lat": 34.05223,
+        "lon": -118.24368,
+    },
+    {
+        "id": "chicago_us",
+        "cityName": "Chicago",
+        "countryCode": "US",
+        "timeZoneId": "America/Chicago",
+        "currencyCode": "USD",
+        "defaultUnitSystem": "imperial",
+        "defaultUse24h": False,
+        "admin1Code": "IL",
+        "admin1Name": "Illinois",
+        "countryName": "United States",
+        "iso3": "USA",
+        "continent": "NA",
+        "lat": 41.85003,
+        "lon": -87.65005,
+    },
+    {
+        "id": "miami_us",
+        "cityName": "Miami",
+        "countryCode": "US",
+        "timeZoneId": "America/New_York",
+        "currencyCode": "USD",
+        "defaultUnitSystem": "imperial",
+        "defaultUse24h": False,
+        "admin1Code": "FL",
+        "admin1Name": "Florida",
+        "countryName": "United States",
+        "iso3": "USA",
+        "continent": "NA",
+        "lat": 25.77427,
+        "lon": -80.19366,
+    },
+    {
+        "id": "toronto_ca",
+        "cityName": "Toronto",
+        "countryCode": "CA",
+        "timeZoneId": "America/Toronto",
+        "currencyCode": "CAD",
+        "defaultUnitSystem": "metric",
+        "defaultUse24h": False,
+        "admin1Code": "ON",
+        "admin1Name": "Ontario",
+        "countryName": "Canada",
+        "iso3": "CAN",
+        "continent": "NA",
+        "lat": 43.70011,
+        "lon": -79.4163,
+    },
+    {
+        "id": "vancouver_ca",
+        "cityName": "Vancouver",
+        "countryCode": "CA",
+        "timeZoneId": "America/Vancouver",
+        "currencyCode": "CAD",
+        "defaultUnitSystem": "metric",
+        "defaultUse24h": False,
+        "admin1Code": "BC",
+        "admin1Name": "British Columbia",
+        "countryName": "Canada",
+        "iso3": "CAN",
+        "continent": "NA",
+        "lat": 49.24966,
+        "lon": -123.11934,
+    },
+    {
+        "id": "london_gb",
+        "cityName": "London",
+        "countryCode": "GB",
+        "timeZoneId": "Europe/London",
+        "currencyCode": "GBP",
+        "defaultUnitSystem": "metric",
+        "defaultUse24h": True,
+        "countryName": "United Kingdom",
+        "iso3": "GBR",
+        "continent": "EU",
+        "lat": 51.50853,
+        "lon": -0.12574,
+    },
+    {
+        "id": "lisbon_pt",
+        "cityName": "Lisbon",
+        "countryCode": "PT",
+        "timeZoneId": "Europe/Lisbon",
+        "currencyCode": "EUR",
+        "defaultUnitSystem": "metric",
+        "defaultUse24h": True,
+        "countryName": "Portugal",
+        "iso3": "PRT",
+        "continent": "EU",
+        "lat": 38.71667,
+        "lon": -9.13333,
+    },
+    {
+        "id": "tokyo_jp",
+        "cityName": "Tokyo",
+        "countryCode": "JP",
+        "timeZoneId": "Asia/Tokyo",
+        "currencyCode": "JPY",
+        "defaultUnitSystem": "metric",
+        "defaultUse24h": True,
+        "countryName": "Japan",
+        "iso3": "JPN",
+        "continent": "AS",
+        "lat": 35.6895,
+        "lon": 139.69171,
+    },
+]
+
+
+# Stages that need alternateNamesV2.zip; skipped when it is missing.
+NAME_STAGES = ("alternate_names", "name_shards")
+
+STAGE_NAMES = (
+    "countries",
+    "admin1",
+    "cities15000",
+    "cities1000",
+    "capitals",
+    "alternate_names",
+    "records",
+    "validate",
+    "serialize",
+    "name_shards",
+)
+
+# Locales with a shipped localization seed (lib/l10n/localization_seed_*.dart).
+SUPPORTED_NAME_LOCALES = ("es", "fr", "pt")
+NAME_SHARD_VERSION = 1
+
+
+def _parse_cities(zip_path: Path) -> List[GeoRow]:
+    return list(iter_cities(zip_path))
+
+
+def _resolve_capitals(
+    country_info: Dict[str, Country],
+    cities_15000: List[GeoRow],
+    cities_1000: List[GeoRow],
+) -> Tuple[List[GeoRow], List[Tuple[str, str]]]:
     # Base set: cities15000.
     by_id: Dict[int, GeoRow] = {r.geonameid: r for r in cities_15000}
 
@@ -260,179 +418,28 @@ def build_asset(geonames_dir: Path, output_path: Path) -> None:
     for cc, c in country_info.items():
         if not c.capital:
             continue
-        found = _best_capital_match(cities_15000, cc, c.capital)
+        found = best_capital_match(cities_15000, cc, c.capital)
         if found is None:
-            found = _best_capital_match(cities_1000, cc, c.capital)
+            found = best_capital_match(cities_1000, cc, c.capital)
             if found is not None:
                 by_id.setdefault(found.geonameid, found)
         if found is None:
             # Some entries are obsolete (e.g. AN, CS). We still record them for visibility.
             missing_capitals.append((cc, c.capital))
 
-    # Seed curated IDs so onboarding defaults remain stable even if GeoNames names shift.
-    curated = [
-        {
-            "id": "denver_us",
-            "cityName": "Denver",
-            "countryCode": "US",
-            "timeZoneId": "America/Denver",
-            "currencyCode": "USD",
-            "defaultUnitSystem": "imperial",
-            "defaultUse24h": False,
-            "admin1Code": "CO",
-            "admin1Name": "Colorado",
-            "countryName": "United States",
-            "iso3": "USA",
-            "continent": "NA",
-            "lat": 39.7392,
-            "lon": -104.9903,
-        },
-        {
-            "id": "new_york_us",
-            "cityName": "New York",
-            "countryCode": "US",
-            "timeZoneId": "America/New_York",
-            "currencyCode": "USD",
-            "defaultUnitSystem": "imperial",
-            "defaultUse24h": False,
-            "admin1Code": "NY",
-            "admin1Name": "New York",
-            "countryName": "United States",
-            "iso3": "USA",
-            "continent": "NA",
-            "lat": 40.71427,
-            "lon": -74.00597,
-        },
-        {
-            "id": "los_angeles_us",
-            "cityName": "Los Angeles",
-            "countryCode": "US",
-            "timeZoneId": "America/Los_Angeles",
-            "currencyCode": "USD",
-            "defaultUnitSystem": "imperial",
-            "defaultUse24h": False,
-            "admin1Code": "CA",
-            "admin1Name": "California",
-            "countryName": "United States",
-            "iso3": "USA",
-            "continent": "NA",
-            "lat": 34.05223,
-            "lon": -118.24368,
-        },
-        {
-            "id": "chicago_us",
-            "cityName": "Chicago",
-            "countryCode": "US",
-            "timeZoneId": "America/Chicago",
-            "currencyCode": "USD",
-            "defaultUnitSystem": "imperial",
-            "defaultUse24h": False,
-            "admin1Code": "IL",
-            "admin1Name": "Illinois",
-            "countryName": "United States",
-            "iso3": "USA",
-            "continent": "NA",
-            "lat": 41.85003,
-            "lon": -87.65005,
-        },
-        {
-            "id": "miami_us",
-            "cityName": "Miami",
-            "countryCode": "US",
-            "timeZoneId": "America/New_York",
-            "currencyCode": "USD",
-            "defaultUnitSystem": "imperial",
-            "defaultUse24h": False,
-            "admin1Code": "FL",
-            "admin1Name": "Florida",
-            "countryName": "United States",
-            "iso3": "USA",
-            "continent": "NA",
-            "lat": 25.77427,
-            "lon": -80.19366,
-        },
-        {
-            "id": "toronto_ca",
-            "cityName": "Toronto",
-            "countryCode": "CA",
-            "timeZoneId": "America/Toronto",
-            "currencyCode": "CAD",
-            "defaultUnitSystem": "metric",
-            "defaultUse24h": False,
-            "admin1Code": "ON",
-            "admin1Name": "Ontario",
-            "countryName": "Canada",
-            "iso3": "CAN",
-            "continent": "NA",
-            "lat": 43.70011,
-            "lon": -79.4163,
-        },
-        {
-            "id": "vancouver_ca",
-            "cityName": "Vancouver",
-            "countryCode": "CA",
-            "timeZoneId": "America/Vancouver",
-            "currencyCode": "CAD",
-            "defaultUnitSystem": "metric",
-            "defaultUse24h": False,
-            "admin1Code": "BC",
-            "admin1Name": "British Columbia",
-            "countryName": "Canada",
-            "iso3": "CAN",
-            "continent": "NA",
-            "lat": 49.24966,
-            "lon": -123.11934,
-        },
-        {
-            "id": "london_gb",
-            "cityName": "London",
-            "countryCode": "GB",
-            "timeZoneId": "Europe/London",
-            "currencyCode": "GBP",
-            "defaultUnitSystem": "metric",
-            "defaultUse24h": True,
-            "countryName": "United Kingdom",
-            "iso3": "GBR",
-            "continent": "EU",
-            "lat": 51.50853,
-            "lon": -0.12574,
-        },
-        {
-            "id": "lisbon_pt",
-            "cityName": "Lisbon",
-            "countryCode": "PT",
-            "timeZoneId": "Europe/Lisbon",
-            "currencyCode": "EUR",
-            "defaultUnitSystem": "metric",
-            "defaultUse24h": True,
-            "countryName": "Portugal",
-            "iso3": "PRT",
-            "continent": "EU",
-            "lat": 38.71667,
-            "lon": -9.13333,
-        },
-        {
-            "id": "tokyo_jp",
-            "cityName": "Tokyo",
-            "countryCode": "JP",
-            "timeZoneId": "Asia/Tokyo",
-            "currencyCode": "JPY",
-            "defaultUnitSystem": "metric",
-            "defaultUse24h": True,
-            "countryName": "Japan",
-            "iso3": "JPN",
-            "continent": "AS",
-            "lat": 35.6895,
-            "lon": 139.69171,
-        },
-    ]
+    # Sort GeoNames cities deterministically for stable diffs.
+    return [by_id[k] for k in sorted(by_id)], missing_capitals
 
-    out: List[dict] = []
-    out.extend(curated)
 
-    # Sort GeoNames cities deterministically for stable diffs.
-    for geonameid in sorted(by_id.keys()):
-        r = by_id[geonameid]
+def _assemble_records(
+    country_info: Dict[str, Country],
+    admin1: Dict[str, str],
+    capitals: Tuple[List[GeoRow], List[Tuple[str, str]]],
+) -> Tuple[List[dict], dict, List[Tuple[str, str]]]:
+    rows, missing_capitals = capitals
+    out: List[dict] = [dict(c) for c in CURATED_CITIES]
+
+    for r in rows:
         c = country_info.get(r.country)
         country_name = c.name if c else None
         iso3 = c.iso3 if c else None
@@ -461,18 +468,309 @@ def build_asset(geonames_dir: Path, output_path: Path) -> None:
             }
         )
 
+    population_by_id = {f"gn_{r.geonameid}": r.population for r in rows}
+    report = _add_disambiguation(out, population_by_id)
+    return out, report, missing_capitals
+
+
+def _read_alternate_names(
+    zip_path: Path,
+    isolate: bool,
+    capitals: Tuple[List[GeoRow], List[Tuple[str, str]]],
+) -> Tuple[Dict[int, Dict[str, LocalizedName]], dict]:
+    selected = {r.geonameid for r in capitals[0]}
+    reader = read_alternate_names_isolated if isolate else read_alternate_names
+    names, stats = reader(zip_path, selected, SUPPORTED_NAME_LOCALES)
+    return names, {
+        "rows": stats.rows,
+        "kept": stats.kept,
+        "megabytes": stats.bytes_read / (1 << 20),
+        "seconds": stats.seconds,
+        "rowsPerSecond": stats.rows_per_second,
+        "megabytesPerSecond": stats.mb_per_second,
+        "peakRssMb": stats.peak_rss_mb,
+        "baselineRssMb": stats.baseline_rss_mb,
+        "locales": stats.locales,
+    }
+
+
+def _name_shards(
+    records: List[dict],
+    names: Dict[int, Dict[str, LocalizedName]],
+) -> Dict[str, dict]:
+    """Per-locale `{preferred, short}` maps keyed by record index.
+
+    Curated records borrow the names of their GeoNames twin (same name,
+    country and time zone). Names equal to the record's `cityName` are left
+    out; the app falls back to `cityName` for any missing index.
+    """
+    twins: Dict[Tuple[str, str, str], int] = {}
+    for r in records:
+        if r["id"].startswith("gn_"):
+            twins.setdefault((r["cityName"], r["countryCode"], r["timeZoneId"]), int(r["id"][3:]))
+
+    shards = {
+        loc: {"version": NAME_SHARD_VERSION, "locale": loc, "records": len(records), "preferred": {}, "short": {}}
+        for loc in SUPPORTED_NAME_LOCALES
+    }
+    for i, r in enumerate(records):
+        if r["id"].startswith("gn_"):
+            geonameid: Optional[int] = int(r["id"][3:])
+        else:
+            geonameid = twins.get((r["cityName"], r["countryCode"], r["timeZoneId"]))
+        by_locale = names.get(geonameid) if geonameid is not None else None
+        if not by_locale:
+            continue
+        for loc, localized in by_locale.items():
+            shard = shards.get(loc)
+            if shard is None:
+                continue
+            if localized.preferred and localized.preferred != r["cityName"]:
+                shard["preferred"][str(i)] = localized.preferred
+            if localized.short and localized.short != r["cityName"]:
+                shard["short"][str(i)] = localized.short
+    return shards
+
+
+def _write_name_shards(
+    names_dir: Path,
+    records: Tuple[List[dict], dict, List[Tuple[str, str]]],
+    alternate: Tuple[Dict[int, Dict[str, LocalizedName]], dict],
+    validated: int,
+) -> dict:
+    names, stats = alternate
+    shards = _name_shards(records[0], names)
+    names_dir.mkdir(parents=True, exist_ok=True)
+    sizes: Dict[str, int] = {}
+    for loc, shard in shards.items():
+        data = json.dumps(shard, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        (names_dir / f"{loc}.json").write_bytes(data)
+        sizes[loc] = len(data)
+    return {"parse": stats, "shardBytes": sizes}
+
+
+def _validate_records(records: Tuple[List[dict], dict, List[Tuple[str, str]]]) -> int:
+    _validate_asset_records(records[0])
+    return len(records[0])
+
+
+def _write_outputs(
+    output_path: Path,
+    disambiguation_report: Optional[Path],
+    schema_version: int,
+    records: Tuple[List[dict], dict, List[Tuple[str, str]]],
+    validated: int,
+) -> dict:
+    out, report, missing_capitals = records
+    doc: object = out
+    if schema_version == SCHEMA_VERSION:
+        doc = compact_v2(out)
+        _validate_asset_records(doc)
+        if dataset_rows(doc) != out:
+            raise ValueError("schema v2 output does not expand back to the v1 records")
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    _validate_asset_records(out)
-    output_path.write_text(json.dumps(out, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
-
-    print(f"Wrote {output_path}")
-    print(f"Total records: {len(out)}")
+    output_path.write_text(json.dumps(doc, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    if disambiguation_report is not None:
+        disambiguation_report.parent.mkdir(parents=True, exist_ok=True)
+        disambiguation_report.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return {
+        "records": validated,
+        "missingCapitals": missing_capitals,
+        "nameClusters": report["nameClusters"],
+        "nameCountryClusters": report["nameCountryClusters"],
+        "unresolvedLabels": report["unresolvedLabels"],
+    }
+
+
+def build_stages(
+    geonames_dir: Path,
+    output_path: Path,
+    disambiguation_report: Optional[Path] = None,
+    names_dir: Optional[Path] = None,
+    schema_version: int = 1,
+    isolate_names: bool = False,
+) -> List[Stage]:
+    """Describe the build as cached stages (see `unitana_cities.pipeline`).
+
+    The four parse stages are independent and run concurrently, as do
+    `alternate_names` and `records`. Editing the curated list or enrichment
+    helpers only invalidates `records` onward. Without alternateNamesV2.zip
+    the `NAME_STAGES` are left out.
+    """
+    outputs = (output_path,) + ((disambiguation_report,) if disambiguation_report else ())
+    names_dir = names_dir or output_path.parent / "city_names"
+    names_zip = geonames_dir / "alternateNamesV2.zip"
+    stages = [
+        Stage(
+            "countries",
+            partial(read_country_info, geonames_dir / "countryInfo.txt"),
+            files=(geonames_dir / "countryInfo.txt",),
+        ),
+        Stage(
+            "admin1",
+            partial(read_admin1, geonames_dir / "admin1CodesASCII.txt"),
+            files=(geonames_dir / "admin1CodesASCII.txt",),
+        ),
+        Stage(
+            "cities15000",
+            partial(_parse_cities, geonames_dir / "cities15000.zip"),
+            files=(geonames_dir / "cities15000.zip",),
+            code=(iter_cities,),
+        ),
+        Stage(
+            "cities1000",
+            partial(_parse_cities, geonames_dir / "cities1000.zip"),
+            files=(geonames_dir / "cities1000.zip",),
+            code=(iter_cities,),
+        ),
+        Stage(
+            "capitals",
+            _resolve_capitals,
+            deps=("countries", "cities15000", "cities1000"),
+            code=(best_capital_match, capital_variants, norm_name, strip_diacritics),
+        ),
+        Stage(
+            "alternate_names",
+            partial(_read_alternate_names, names_zip, isolate_names),
+            deps=("capitals",),
+            files=(names_zip,),
+            code=(read_alternate_names, SUPPORTED_NAME_LOCALES),
+        ),
+        Stage(
+            "records",
+            _assemble_records,
+            deps=("countries", "admin1", "capitals"),
+            code=(
+                CURATED_CITIES,
+                _default_unit_system,
+                _default_use_24h,
+                _LABEL_QUALIFIERS,
+                _qualifier_values,
+                _format_label,
+                _add_disambiguation,
+                normalize_query,
+                fold_diacritics,
+            ),
+        ),
+        Stage("validate", _validate_records, deps=("records",), code=(_validate_asset_records,)),
+        Stage(
+            "serialize",
+            partial(_write_outputs, output_path, disambiguation_report, schema_version),
+            deps=("records", "validate"),
+            code=(compact_v2, dataset_rows, _validate_asset_records, _validate_v2_tables),
+            outputs=outputs,
+        ),
+        Stage(
+            "name_shards",
+            partial(_write_name_shards, names_dir),
+            deps=("records", "alternate_names", "validate"),
+            code=(_name_shards, NAME_SHARD_VERSION),
+            outputs=tuple(names_dir / f"{loc}.json" for loc in SUPPORTED_NAME_LOCALES),
+        ),
+    ]
+    if not names_zip.exists():
+        stages = [s for s in stages if s.name not in NAME_STAGES]
+    return stages
+
+
+def build_asset(
+    geonames_dir: Path,
+    output_path: Path,
+    disambiguation_report: Optional[Path] = None,
+    cache_dir: Optional[Path] = None,
+    force: Iterable[str] = (),
+    jobs: int = 1,
+    names_dir: Optional[Path] = None,
+    schema_version: int = 1,
+    isolate_names: bool = False,
+) -> List[str]:
+    """Build the asset, reusing cached stage artifacts from `cache_dir`.
+
+    Without `cache_dir` every stage runs in a throwaway directory. The
+    alternate names parse runs in a fresh process when `jobs > 1` or
+    `isolate_names` is set (that is the only way its peak RSS is reported),
+    and inline otherwise. Returns the names of the stages that actually ran.
+    """
+    names_dir = names_dir or output_path.parent / "city_names"
+    stages = build_stages(
+        geonames_dir,
+        output_path,
+        disambiguation_report,
+        names_dir,
+        schema_version,
+        isolate_names=isolate_names or jobs > 1,
+    )
+    present = {s.name for s in stages}
+    force = [name for name in force if name in present or name not in NAME_STAGES]
+    with tempfile.TemporaryDirectory() as tmp:
+        result = run_pipeline(stages, cache_dir or Path(tmp), force=force, jobs=jobs)
+        summary = result.load("serialize")
+        names_summary = result.load("name_shards") if "name_shards" in present else None
+
+    missing_capitals = summary["missingCapitals"]
+    print(f"Wrote {output_path} (schema v{schema_version})")
+    print(f"Total records: {summary['records']}")
     print(f"Missing capitals: {len(missing_capitals)}")
     if missing_capitals:
         print("Sample:", missing_capitals[:15])
-
-
-def _validate_asset_records(rows: List[dict]) -> None:
+    print(
+        "Ambiguous names: "
+        f"{summary['nameClusters']} name clusters, "
+        f"{summary['nameCountryClusters']} name+country clusters, "
+        f"{summary['unresolvedLabels']} unresolved labels"
+    )
+    if disambiguation_report is not None:
+        print(f"Wrote {disambiguation_report}")
+    if names_summary is None:
+        print(f"Alternate names: skipped (no {geonames_dir / 'alternateNamesV2.zip'}); {names_dir} not updated")
+        return result.ran()
+    parse = names_summary["parse"]
+    peak = "not measured inline"
+    if parse["peakRssMb"] is not None:
+        peak = f"{parse['peakRssMb']:.0f} MB (process baseline {parse['baselineRssMb']:.0f} MB)"
+    print(
+        "Alternate names: "
+        f"{parse['rows']:,} rows / {parse['megabytes']:.1f} MB in {parse['seconds']:.1f}s "
+        f"({parse['rowsPerSecond']:,.0f} rows/s, {parse['megabytesPerSecond']:.1f} MB/s), "
+        f"peak RSS {peak}, kept {parse['kept']:,} "
+        + " ".join(f"{loc}={n:,}" for loc, n in parse["locales"].items())
+    )
+    print(
+        f"Wrote name shards to {names_dir}: "
+        + " ".join(f"{loc}.json={size:,}B" for loc, size in names_summary["shardBytes"].items())
+    )
+    return result.ran()
+
+
+def _validate_v2_tables(doc: dict) -> None:
+    countries = doc.get("countries")
+    time_zones = doc.get("timeZones")
+    if not isinstance(countries, dict) or not all(isinstance(v, dict) for v in countries.values()):
+        raise ValueError("schema v2 countries must be an object of objects")
+    for cc, entry in countries.items():
+        unexpected = set(entry) - set(COUNTRY_FIELDS)
+        if len(cc) != 2 or unexpected:
+            raise ValueError(f"invalid countries entry {cc!r}: unexpected fields {sorted(unexpected)}")
+    if not isinstance(time_zones, list) or not all(isinstance(t, str) and t for t in time_zones):
+        raise ValueError("schema v2 timeZones must be an array of non-empty strings")
+    if len(set(time_zones)) != len(time_zones):
+        raise ValueError("schema v2 timeZones contains duplicates")
+    for i, row in enumerate(doc.get("cities") or []):
+        index = row.get("timeZoneIndex") if isinstance(row, dict) else None
+        if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < len(time_zones):
+            raise ValueError(f"row {i} invalid timeZoneIndex: {index!r}")
+        if "timeZoneId" in row:
+            raise ValueError(f"row {i} has timeZoneId; v2 rows use timeZoneIndex")
+
+
+def _validate_asset_records(data: object) -> None:
+    """Validate v1 rows, or a schema v2 document via its side tables and
+    expanded rows."""
+    if isinstance(data, dict):
+        if not is_v2(data) or not isinstance(data.get("cities"), list):
+            raise ValueError(f"expected a schema v{SCHEMA_VERSION} object with a cities array")
+        _validate_v2_tables(data)
+    rows = dataset_rows(data)
     required_fields = [
         "id",
         "cityName",
@@ -486,6 +784,8 @@ def _validate_asset_records(rows: List[dict]) -> None:
     ]
 
     for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            raise ValueError(f"row {i} is not an object")
         for field in required_fields:
             if field not in row:
                 raise ValueError(f"row {i} missing required field: {field}")
@@ -519,19 +819,70 @@ def _validate_asset_records(rows: List[dict]) -> None:
         if not (-180 <= float(lon) <= 180):
             raise ValueError(f"row {i} longitude out of range: {lon!r}")
 
+        label = row.get("disambiguationLabel")
+        if label is not None and (not isinstance(label, str) or not label.strip()):
+            raise ValueError(f"row {i} invalid disambiguationLabel: {label!r}")
+        for field in ("preferredInNameCluster", "preferredInCountryCluster"):
+            if field in row and not isinstance(row[field], bool):
+                raise ValueError(f"row {i} invalid {field}: {row[field]!r}")
+
 
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--geonames-dir",
         required=True,
-        help="Directory containing GeoNames dump files (cities15000.zip, cities1000.zip, admin1CodesASCII.txt, countryInfo.txt)",
+        help="Directory containing GeoNames dump files (cities15000.zip, cities1000.zip, admin1CodesASCII.txt, countryInfo.txt, optionally alternateNamesV2.zip)",
     )
     parser.add_argument(
         "--output",
         default="assets/data/cities_v1.json",
         help="Output path for the JSON asset (relative or absolute)",
     )
+    parser.add_argument(
+        "--schema-version",
+        type=int,
+        choices=(1, SCHEMA_VERSION),
+        default=1,
+        help="1: flat record array; 2: countries/timeZones side tables (see unitana_cities.schema)",
+    )
+    parser.add_argument(
+        "--names-dir",
+        default="assets/data/city_names",
+        help="Output directory for per-locale city name shards",
+    )
+    parser.add_argument(
+        "--disambiguation-report",
+        default="",
+        help="Optional path for a JSON report of every same-name cluster found",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".dart_tool/unitana_tools/city_build",
+        help="Directory for cached stage artifacts (unchanged stages are skipped)",
+    )
+    parser.add_argument(
+        "--force",
+        action="append",
+        default=[],
+        choices=STAGE_NAMES + ("all",),
+        metavar="STAGE",
+        help=(
+            "Rerun a stage and every stage downstream of it even if cached; repeatable. "
+            f"One of: {', '.join(STAGE_NAMES)}, all"
+        ),
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="Worker processes for independent stages (1 runs inline)",
+    )
+    parser.add_argument(
+        "--isolate-names",
+        action="store_true",
+        help="Parse alternate names in a fresh process and report its peak RSS (implied by --jobs > 1)",
+    )
     args = parser.parse_args()
 
     geonames_dir = Path(args.geonames_dir).expanduser().resolve()
@@ -542,7 +893,19 @@ def main() -> None:
         if not p.exists():
             raise SystemExit(f"Missing required file: {p}")
 
-    build_asset(geonames_dir, output_path)
+    report_path = Path(args.disambiguation_report).expanduser().resolve() if args.disambiguation_report else None
+    force = STAGE_NAMES if "all" in args.force else args.force
+    build_asset(
+        geonames_dir,
+        output_path,
+        disambiguation_report=report_path,
+        cache_dir=Path(args.cache_dir).expanduser().resolve(),
+        force=force,
+        jobs=args.jobs,
+        names_dir=Path(args.names_dir).expanduser().resolve(),
+        schema_version=args.schema_version,
+        isolate_names=args.isolate_names,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from unitana_cities import CityDataset, norm_place
+from unitana_cities.dataset import haversine_km
+from unitana_cities.schema import compact_v2
+
+
+def test_by_id_and_len(dataset_path: Path, sample_cities):
+    with CityDataset.open(dataset_path) as ds:
+        assert len(ds) == len(sample_cities)
+        rec = ds.by_id("gn_2267057")
+        assert rec is not None
+        assert rec.city_name == "Lisbon"
+        assert rec.time_zone_id == "Europe/Lisbon"
+        assert rec.admin1_name == "Lisbon"
+        assert ds.by_id("missing") is None
+
+
+def test_by_place_normalizes_and_filters(dataset_path: Path):
+    with CityDataset.open(dataset_path) as ds:
+        assert ds.by_place("  PORTLAND ").id == "gn_5746545"
+        assert ds.by_place("portland", country_code="us", admin1_code="me").id == "gn_4975802"
+        assert ds.by_place("malaga").city_name == "Málaga"
+        assert ds.by_place("Paris", country_code="US").id == "gn_4717560"
+        assert ds.by_place("Paris", country_code="GB") is None
+
+
+def test_norm_place_matches_dart_fold_map():
+    assert norm_place("  Málaga\tCITY ") == "malaga city"
+    # ń is outside CityRepository's fold map, so Dart keeps it and so must we.
+    assert norm_place("Gdańsk") == "gdańsk"
+    assert norm_place("Gdańsk") != norm_place("Gdansk")
+
+
+def test_country_and_time_zone_filters(dataset_path: Path):
+    with CityDataset.open(dataset_path) as ds:
+        assert [r.city_name for r in ds.in_country("pt")] == ["Lisbon", "Porto"]
+        assert {r.id for r in ds.in_time_zone("America/Chicago")} == {
+            "gn_4409896",
+            "gn_4250542",
+            "gn_4717560",
+        }
+        assert ds.in_country("ZZ") == []
+
+
+def test_nearest_matches_brute_force(dataset_path: Path, sample_cities):
+    with CityDataset.open(dataset_path) as ds:
+        for lat, lon in [(38.7, -9.1), (44.0, -75.0), (-33.9, 151.2), (89.0, 0.0)]:
+            expected = sorted(
+                (haversine_km(lat, lon, r["lat"], r["lon"]), r["id"]) for r in sample_cities
+            )[:3]
+            got = [(round(d, 6), r.id) for r, d in ds.nearest(lat, lon, limit=3)]
+            assert got == [(round(d, 6), i) for d, i in expected]
+        assert ds.nearest(38.7, -9.1, max_km=1) == []
+        assert ds.nearest(38.7, -9.1, limit=0) == []
+
+
+def test_object_form_and_decode_cache(tmp_path: Path, sample_cities):
+    path = tmp_path / "cities_obj.json"
+    path.write_text(json.dumps({"version": 1, "cities": sample_cities}, indent=2), encoding="utf-8")
+    with CityDataset.open(path, cache_size=2) as ds:
+        assert len(ds) == len(sample_cities)
+        assert ds.by_id("gn_1850147").city_name == "Tokyo"
+        ds.by_id("gn_1850147")
+        info = ds.record.cache_info()
+        assert info.hits == 1
+        assert info.maxsize == 2
+
+
+@pytest.mark.parametrize("v2", [False, True], ids=["no-schema-version", "v2-tables-after-cities"])
+def test_header_never_decodes_the_records(tmp_path: Path, sample_cities, monkeypatch, v2):
+    rows = sample_cities * 50
+    if v2:
+        compact = compact_v2(rows)
+        doc = {key: compact[key] for key in ("cities", "timeZones", "countries", "schemaVersion")}
+    else:
+        doc = {"cities": rows, "version": 1}
+    path = tmp_path / "cities.json"
+    path.write_text(json.dumps(doc), encoding="utf-8")
+    sizes: List[int] = []
+    loads = json.loads
+
+    def spy(data, *args, **kwargs):
+        sizes.append(len(data))
+        return loads(data, *args, **kwargs)
+
+    monkeypatch.setattr(json, "loads", spy)
+    with CityDataset.open(path) as ds:
+        assert ds.schema_version == (2 if v2 else 1)
+        assert ds.by_id("gn_1850147").city_name == "Tokyo"
+    # Only the document around the records and single records are decoded.
+    assert max(sizes) < path.stat().st_size / 10
+
+
+def test_rejects_non_dataset(tmp_path: Path):
+    path = tmp_path / "bad.json"
+    path.write_text('"nope"', encoding="utf-8")
+    with CityDataset.open(path) as ds:
+        with pytest.raises(ValueError):
+            len(ds)
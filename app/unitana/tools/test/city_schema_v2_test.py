@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+import generate_cities_v1 as generator
+import validate_cities_v1 as validator
+from unitana_cities import CityDataset
+from unitana_cities.schema import compact_v2, dataset_rows, expand_v2
+
+
+def _write(path: Path, doc: object) -> Path:
+    path.write_text(json.dumps(doc, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    return path
+
+
+def test_compact_round_trips_and_factors_country_fields(sample_cities: List[dict]):
+    rows = sample_cities + [dict(sample_cities[0], id="gn_1", cityName="Hillsboro", defaultUse24h=True)]
+    doc = compact_v2(rows)
+
+    assert list(doc) == ["schemaVersion", "countries", "timeZones", "cities"]
+    assert expand_v2(doc) == rows
+    assert doc["countries"]["US"] == {
+        "currencyCode": "USD",
+        "defaultUnitSystem": "imperial",
+        "defaultUse24h": False,
+    }
+    assert doc["timeZones"] == sorted({r["timeZoneId"] for r in rows})
+    portland = doc["cities"][0]
+    assert set(portland) == {"id", "cityName", "countryCode", "timeZoneIndex", "lat", "lon", "admin1Code", "admin1Name"}
+    assert doc["cities"][-1]["defaultUse24h"] is True  # per-row override survives
+
+
+def test_dataset_rows_rejects_other_objects():
+    with pytest.raises(ValueError):
+        dataset_rows({"cities": []})
+
+
+def test_validator_full_and_incremental_agree_on_v2(tmp_path: Path, sample_cities: List[dict], same_verdict):
+    path = tmp_path / "cities_v2.json"
+    cache = tmp_path / "cache.json"
+    doc = compact_v2(sample_cities)
+    _write(path, doc)
+    assert same_verdict(path, cache) == len(sample_cities)
+    assert same_verdict(path, cache) == 0
+    assert validator.validate_full(path)[0] == []
+
+    doc["cities"][2]["timeZoneIndex"] = 99
+    _write(path, doc)
+    assert same_verdict(path, cache) == 1
+    assert validator.validate_full(path)[0] == [
+        "row 2 (gn_4409896): invalid timeZoneIndex, missing timeZoneId, invalid timeZoneId, "
+        "timeZoneId is not a known IANA timezone"
+    ]
+
+    # A side-table edit changes every row's verdict, so every row is re-checked.
+    doc["cities"][2]["timeZoneIndex"] = 0
+    doc["countries"]["US"]["currencyCode"] = "DOLLARS"
+    _write(path, doc)
+    assert same_verdict(path, cache) == len(sample_cities)
+    errors = validator.validate_full(path)[0]
+    assert errors[0] == "countries.US: currencyCode must be ISO-4217 alpha-3"
+    assert sum("currencyCode must be ISO-4217 alpha-3" in e for e in errors) == 1 + 6  # table + US rows
+
+
+def test_city_dataset_reads_v2_like_v1(tmp_path: Path, sample_cities: List[dict]):
+    v1 = _write(tmp_path / "v1.json", sample_cities)
+    v2 = _write(tmp_path / "v2.json", compact_v2(sample_cities))
+    with CityDataset.open(v1) as a, CityDataset.open(v2) as b:
+        assert (a.schema_version, b.schema_version) == (1, 2)
+        assert [a.record(i) for i in range(len(a))] == [b.record(i) for i in range(len(b))]
+        assert [r.id for r in b.in_time_zone("America/Chicago")] == [r.id for r in a.in_time_zone("America/Chicago")]
+        assert b.by_place("Portland", country_code="US", admin1_code="ME").currency_code == "USD"
+
+
+@pytest.mark.parametrize(
+    "order",
+    [
+        ("schemaVersion", "cities", "countries", "timeZones"),
+        ("cities", "timeZones", "countries", "schemaVersion"),
+    ],
+)
+def test_side_tables_after_cities(tmp_path: Path, sample_cities: List[dict], same_verdict, order):
+    doc = compact_v2(sample_cities)
+    path = _write(tmp_path / "v2.json", {key: doc[key] for key in order})
+    assert validator.validate_full(path) == ([], len(sample_cities))
+    assert same_verdict(path, tmp_path / "cache.json") == len(sample_cities)
+
+    v1 = _write(tmp_path / "v1.json", sample_cities)
+    with CityDataset.open(v1) as a, CityDataset.open(path) as b:
+        assert b.schema_version == 2
+        assert [a.record(i) for i in range(len(a))] == [b.record(i) for i in range(len(b))]
+
+    doc["countries"]["US"]["currencyCode"] = "DOLLARS"
+    _write(path, {key: doc[key] for key in order})
+    assert same_verdict(path, tmp_path / "cache.json") == len(sample_cities)
+    assert validator.validate_full(path)[0][0] == "countries.US: currencyCode must be ISO-4217 alpha-3"
+
+
+def test_generator_writes_v2(geonames_dir: Path, tmp_path: Path):
+    v1 = tmp_path / "v1" / "cities_v1.json"
+    v2 = tmp_path / "v2" / "cities_v1.json"
+    generator.build_asset(geonames_dir, v1)
+    generator.build_asset(geonames_dir, v2, schema_version=2)
+
+    doc = json.loads(v2.read_text(encoding="utf-8"))
+    assert doc["schemaVersion"] == 2
+    assert dataset_rows(doc) == json.loads(v1.read_text(encoding="utf-8"))
+    assert v2.stat().st_size < v1.stat().st_size
+    assert validator.validate_full(v2) == ([], len(doc["cities"]))
+    generator._validate_asset_records(doc)
+
+    doc["cities"][0]["timeZoneId"] = "Europe/Lisbon"
+    with pytest.raises(ValueError, match="timeZoneIndex"):
+        generator._validate_asset_records(doc)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import random
+from dataclasses import replace
+from typing import List
+
+import pytest
+
+from bench_city_search import DEFAULT_QUERIES, load_queries
+from unitana_cities.search import (
+    WIZARD_SEARCH,
+    SearchIndex,
+    SearchOptions,
+    build_entries,
+    normalize_query,
+    search_entries,
+    sort_by_base_score,
+    top_entries,
+    wizard_entries,
+    wizard_search,
+)
+
+
+def _rows(rows: List[tuple]):
+    """Entries built like the Dart engine tests (no mainstream bonus)."""
+    return sort_by_base_score(
+        build_entries(
+            [dict(id=i, city=c, cc=cc, cn=cn, tz=tz) for i, c, cc, cn, tz in rows],
+            key_of=lambda r: r["id"],
+            city_name_of=lambda r: r["city"],
+            country_code_of=lambda r: r["cc"],
+            country_name_of=lambda r: r["cn"],
+            time_zone_id_of=lambda r: r["tz"],
+            mainstream_country_bonus=0,
+        )
+    )
+
+
+def _synthetic_records(count: int) -> List[dict]:
+    rng = random.Random(11)
+    stems = ["san", "port", "spring", "lon", "par", "new", "sao", "to", "la", "ma", "st", "bel", "york", "ville"]
+    countries = [
+        ("US", "United States", ["America/Chicago", "America/New_York", "America/Los_Angeles"]),
+        ("GB", "United Kingdom", ["Europe/London"]),
+        ("PT", "Portugal", ["Europe/Lisbon"]),
+        ("BR", "Brazil", ["America/Sao_Paulo"]),
+        ("CL", "Chile", ["America/Santiago"]),
+        ("JP", "Japan", ["Asia/Tokyo"]),
+    ]
+    out = []
+    for i in range(count):
+        cc, cn, zones = rng.choice(countries)
+        words = ["".join(rng.choice(stems) for _ in range(rng.randint(1, 2))) for _ in range(rng.randint(1, 2))]
+        name = " ".join(w.capitalize() for w in words)
+        if i % 37 == 0:
+            name += " 12"
+        out.append(
+            {
+                "id": f"gn_{i}",
+                "cityName": name,
+                "countryCode": cc,
+                "countryName": cn,
+                "timeZoneId": rng.choice(zones),
+                "currencyCode": "EUR",
+            }
+        )
+    return out
+
+
+def test_exact_city_outranks_prefix_variant():
+    entries = _rows(
+        [
+            ("springfield-us", "Springfield", "US", "United States", "America/Chicago"),
+            ("springfield-gardens-us", "Springfield Gardens", "US", "United States", "America/New_York"),
+        ]
+    )
+    assert search_entries(entries, "springfield")[0].key == "springfield-us"
+
+
+def test_dedupe_by_city_country():
+    entries = _rows(
+        [
+            ("santiago-cl-america-santiago", "Santiago", "CL", "Chile", "America/Santiago"),
+            ("santiago-cl-alt-zone", "Santiago", "CL", "Chile", "Etc/GMT+4"),
+            ("santiago-do-america-santo-domingo", "Santiago", "DO", "Dominican Republic", "America/Santo_Domingo"),
+        ]
+    )
+    keys = [e.key for e in search_entries(entries, "santiago", SearchOptions(dedupe_by_city_country=True))]
+    assert "santiago-cl-alt-zone" not in keys
+    assert "santiago-cl-america-santiago" in keys
+    assert "santiago-do-america-santo-domingo" in keys
+
+
+def test_preferred_zone_and_top_entries(sample_cities):
+    entries = wizard_entries(sample_cities)
+    results = search_entries(entries, "Portland", WIZARD_SEARCH)
+    assert [e.key for e in results] == ["gn_5746545"]  # deduped by city+country
+    assert [e.time_zone_id for e in search_entries(entries, "springfield")][:1] == ["America/Chicago"]
+    assert search_entries(entries, "Málaga")[0].key == "gn_3117735"
+
+    top = top_entries(entries, limit=5)
+    assert len({e.time_zone_id for e in top}) == len(top)
+    assert top[0].time_zone_id == "America/New_York"  # highest hub priority
+
+
+def test_normalize_query_matches_dart_fold():
+    assert normalize_query("  São-Paulo!! ") == "sao paulo"
+    # Characters outside the Dart fold map are dropped, not folded.
+    assert normalize_query("Łódź") == "od"
+
+
+@pytest.mark.parametrize(
+    "opts",
+    [
+        WIZARD_SEARCH,
+        SearchOptions(),
+        SearchOptions(max_candidates=15, dedupe_by_time_zone=True),
+        SearchOptions(short_query_allows_time_zone_prefix=True, alias_time_zone_ids=frozenset({"Asia/Tokyo"})),
+    ],
+    ids=["wizard", "defaults", "tight", "aliases"],
+)
+def test_index_matches_linear_scan(sample_cities, opts):
+    entries = wizard_entries(sample_cities + _synthetic_records(1500), ["gn_2267057"])
+    index = SearchIndex(entries)
+    queries = load_queries(DEFAULT_QUERIES) + ["port", "spring ville", "s p", "12", "america", "lisbon"]
+    for q in queries:
+        expected = [e.key for e in search_entries(entries, q, opts)]
+        assert [e.key for e in index.search(q, opts)] == expected, q
+    assert [e.key for e in index.search("x", replace(opts, max_results=0))] == []
+
+
+def test_wizard_search_normalizes_before_scoring(sample_cities):
+    entries = wizard_entries(sample_cities + _synthetic_records(1500), ["gn_2267057"])
+    index = SearchIndex(entries)
+    queries = load_queries(DEFAULT_QUERIES) + ["new_york", "America/Lisbon", "europe/lis", "utc"]
+    for q in queries:
+        expected = [e.key for e in search_entries(entries, normalize_query(q), WIZARD_SEARCH)]
+        assert [e.key for e in wizard_search(entries, q)] == expected, q
+        assert [e.key for e in wizard_search(index, q)] == expected, q
+
+    # Time-zone-shaped input: the wizard scores "new salem", so the raw
+    # query's time-zone substring bonus (+50) must not reorder the tie.
+    rows = _rows(
+        [
+            ("mills", "New Salem Mills", "US", "United States", "America/North_Dakota/New_Salem"),
+            ("falls", "New Salem Falls", "US", "United States", "America/Boise"),
+        ]
+    )
+    assert [e.key for e in search_entries(rows, "new_salem", WIZARD_SEARCH)] == ["mills", "falls"]
+    assert [e.key for e in wizard_search(rows, "new_salem")] == ["falls", "mills"]
+    assert [e.key for e in wizard_search(SearchIndex(rows), "new_salem")] == ["falls", "mills"]
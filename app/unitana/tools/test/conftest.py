@@ -0,0 +1,208 @@
+"""Shared fixtures for the Python city tooling tests.
+
+Run from app/unitana:
+  python3 -m pytest -q tools/test
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import zipfile
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import pytest
+
+TOOLS_DIR = Path(__file__).resolve().parents[1]
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOLS_DIR))
+
+
+def _city(
+    geonameid: int,
+    name: str,
+    cc: str,
+    tz: str,
+    lat: float,
+    lon: float,
+    admin1_code: str = "",
+    admin1_name: str = "",
+) -> dict:
+    row = {
+        "id": f"gn_{geonameid}",
+        "cityName": name,
+        "countryCode": cc,
+        "timeZoneId": tz,
+        "currencyCode": {"US": "USD", "PT": "EUR", "FR": "EUR", "JP": "JPY", "CA": "CAD"}.get(cc, "EUR"),
+        "defaultUnitSystem": "imperial" if cc == "US" else "metric",
+        "defaultUse24h": cc not in {"US", "CA"},
+        "lat": lat,
+        "lon": lon,
+    }
+    if admin1_code:
+        row["admin1Code"] = admin1_code
+    if admin1_name:
+        row["admin1Name"] = admin1_name
+    return row
+
+
+SAMPLE_CITIES: List[dict] = [
+    _city(5746545, "Portland", "US", "America/Los_Angeles", 45.52345, -122.67621, "OR", "Oregon"),
+    _city(4975802, "Portland", "US", "America/New_York", 43.66147, -70.25533, "ME", "Maine"),
+    _city(4409896, "Springfield", "US", "America/Chicago", 37.21533, -93.29824, "MO", "Missouri"),
+    _city(4250542, "Springfield", "US", "America/Chicago", 39.80172, -89.64371, "IL", "Illinois"),
+    _city(4951788, "Springfield", "US", "America/New_York", 42.10148, -72.58981, "MA", "Massachusetts"),
+    _city(2267057, "Lisbon", "PT", "Europe/Lisbon", 38.71667, -9.13333, "14", "Lisbon"),
+    _city(2735943, "Porto", "PT", "Europe/Lisbon", 41.14961, -8.61099, "17", "Porto"),
+    _city(2988507, "Paris", "FR", "Europe/Paris", 48.85341, 2.3488, "11", "Île-de-France"),
+    _city(4717560, "Paris", "US", "America/Chicago", 33.66094, -95.55551, "TX", "Texas"),
+    _city(1850147, "Tokyo", "JP", "Asia/Tokyo", 35.6895, 139.69171, "40", "Tokyo"),
+    _city(6167865, "Toronto", "CA", "America/Toronto", 43.70011, -79.4163, "08", "Ontario"),
+    _city(3117735, "Málaga", "ES", "Europe/Madrid", 36.72016, -4.42034, "AN", "Andalusia"),
+]
+
+
+@pytest.fixture
+def sample_cities() -> List[dict]:
+    return [dict(r) for r in SAMPLE_CITIES]
+
+
+@pytest.fixture
+def dataset_path(tmp_path: Path, sample_cities: List[dict]) -> Path:
+    path = tmp_path / "cities_v1.json"
+    path.write_text(json.dumps(sample_cities, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    return path
+
+
+# (geonameid, name, country, admin1, population, timezone, lat, lon)
+GEONAMES_ROWS: List[Tuple[int, str, str, str, int, str, float, float]] = [
+    (5746545, "Portland", "US", "OR", 652503, "America/Los_Angeles", 45.52345, -122.67621),
+    (4975802, "Portland", "US", "ME", 66881, "America/New_York", 43.66147, -70.25533),
+    (4409896, "Springfield", "US", "MO", 169176, "America/Chicago", 37.21533, -93.29824),
+    (4250542, "Springfield", "US", "IL", 116565, "America/Chicago", 39.80172, -89.64371),
+    (4951788, "Springfield", "US", "MA", 154341, "America/New_York", 42.10148, -72.58981),
+    (5419384, "Denver", "US", "CO", 715522, "America/Denver", 39.73915, -104.9847),
+    (2643743, "London", "GB", "ENG", 8961989, "Europe/London", 51.50853, -0.12574),
+    (6058560, "London", "CA", "08", 383822, "America/Toronto", 42.98339, -81.23304),
+    (2267057, "Lisbon", "PT", "14", 517802, "Europe/Lisbon", 38.71667, -9.13333),
+    (3117735, "Málaga", "ES", "AN", 568305, "Europe/Madrid", 36.72016, -4.42034),
+]
+# Only in cities1000: a small capital the generator must pull in.
+GEONAMES_1000_ONLY: List[Tuple[int, str, str, str, int, str, float, float]] = [
+    (3041563, "Andorra la Vella", "AD", "07", 20430, "Europe/Andorra", 42.50779, 1.52109),
+]
+
+
+# (alternateNameId, geonameid, lang, name, preferred, short, colloquial, historic, to)
+ALTERNATE_NAMES: List[Tuple[int, int, str, str, str, str, str, str, str]] = [
+    (1, 2643743, "es", "Londres", "1", "", "", "", ""),
+    (2, 2643743, "fr", "Londres", "1", "", "", "", ""),
+    (3, 2643743, "pt", "Londres", "1", "", "", "", ""),
+    (4, 2643743, "en", "London", "1", "", "", "", ""),
+    (5, 2643743, "es", "Londinium", "", "", "", "1", ""),
+    (6, 2267057, "es", "Lisboa", "1", "", "", "", ""),
+    (7, 2267057, "fr", "Lisbonne", "1", "", "", "", ""),
+    (8, 2267057, "pt", "Lisboa", "1", "", "", "", ""),
+    (9, 2267057, "pt", "Lisbon", "", "", "", "", ""),
+    (10, 2267057, "pt", "Lisbonense", "1", "", "1", "", ""),
+    (11, 5419384, "es", "Denver", "1", "", "", "", ""),
+    (12, 5746545, "fr", "Portland (Oregon)", "", "", "", "", ""),
+    (13, 5746545, "es", "PDX", "", "1", "", "", ""),
+    (14, 2267057, "es", "Olisipo", "1", "", "", "", "1200"),
+    (15, 9999999, "es", "Nowhere", "1", "", "", "", ""),
+]
+
+
+def _geonames_line(row: Tuple[int, str, str, str, int, str, float, float]) -> str:
+    gid, name, cc, admin1, pop, tz, lat, lon = row
+    cols = [""] * 19
+    cols[0] = str(gid)
+    cols[1] = name
+    cols[2] = name
+    cols[3] = ""
+    cols[4] = str(lat)
+    cols[5] = str(lon)
+    cols[6] = "P"
+    cols[7] = "PPL"
+    cols[8] = cc
+    cols[10] = admin1
+    cols[14] = str(pop)
+    cols[17] = tz
+    cols[18] = "2024-01-01"
+    return "\t".join(cols)
+
+
+def write_geonames_dir(root: Path) -> Path:
+    root.mkdir(parents=True, exist_ok=True)
+    for stem, rows in (
+        ("cities15000", GEONAMES_ROWS),
+        ("cities1000", GEONAMES_ROWS + GEONAMES_1000_ONLY),
+    ):
+        with zipfile.ZipFile(root / f"{stem}.zip", "w") as z:
+            z.writestr(f"{stem}.txt", "\n".join(_geonames_line(r) for r in rows) + "\n")
+    with zipfile.ZipFile(root / "alternateNamesV2.zip", "w") as z:
+        z.writestr("iso-languagecodes.txt", "ISO 639-3\tISO 639-2\tISO 639-1\tLanguage Name\n")
+        z.writestr(
+            "alternateNamesV2.txt",
+            "".join(
+                f"{aid}\t{gid}\t{lang}\t{name}\t{pref}\t{short}\t{coll}\t{hist}\t\t{to}\n"
+                for aid, gid, lang, name, pref, short, coll, hist, to in ALTERNATE_NAMES
+            ),
+        )
+    (root / "admin1CodesASCII.txt").write_text(
+        "\n".join(
+            [
+                "US.OR\tOregon\tOregon\t5744337",
+                "US.ME\tMaine\tMaine\t4971068",
+                "US.MO\tMissouri\tMissouri\t4398678",
+                "US.IL\tIllinois\tIllinois\t4896861",
+                "US.MA\tMassachusetts\tMassachusetts\t6254926",
+                "US.CO\tColorado\tColorado\t5417618",
+                "GB.ENG\tEngland\tEngland\t6269131",
+                "CA.08\tOntario\tOntario\t6093943",
+                "PT.14\tLisbon\tLisbon\t2267056",
+                "ES.AN\tAndalusia\tAndalusia\t2593109",
+                "AD.07\tAndorra la Vella\tAndorra la Vella\t3041566",
+            ]
+        )
+        + "\n",
+        encoding="utf-8",
+    )
+    (root / "countryInfo.txt").write_text(
+        "#ISO\tISO3\tISO-Numeric\tfips\tCountry\tCapital\tArea\tPopulation\tContinent\ttld\tCurrencyCode\n"
+        + "\n".join(
+            [
+                "US\tUSA\t840\tUS\tUnited States\tWashington\t9629091\t327167434\tNA\t.us\tUSD",
+                "GB\tGBR\t826\tUK\tUnited Kingdom\tLondon\t244820\t66488991\tEU\t.uk\tGBP",
+                "CA\tCAN\t124\tCA\tCanada\tOttawa\t9984670\t37058856\tNA\t.ca\tCAD",
+                "PT\tPRT\t620\tPO\tPortugal\tLisbon\t92391\t10281762\tEU\t.pt\tEUR",
+                "ES\tESP\t724\tSP\tSpain\tMadrid\t504782\t46723749\tEU\t.es\tEUR",
+                "AD\tAND\t020\tAN\tAndorra\tAndorra la Vella\t468\t77006\tEU\t.ad\tEUR",
+            ]
+        )
+        + "\n",
+        encoding="utf-8",
+    )
+    return root
+
+
+@pytest.fixture
+def geonames_dir(tmp_path: Path) -> Path:
+    return write_geonames_dir(tmp_path / "geonames")
+
+
+@pytest.fixture
+def same_verdict() -> Callable[[Path, Path], int]:
+    """Assert `validate_incremental` agrees with `validate_full` on a file;
+    returns how many records the incremental run re-checked."""
+    import validate_cities_v1 as validator
+
+    def check(path: Path, cache: Path) -> int:
+        full_errors, full_count = validator.validate_full(path)
+        inc_errors, inc_count, rechecked = validator.validate_incremental(path, cache)
+        assert inc_errors == full_errors
+        assert inc_count == full_count
+        return rechecked
+
+    return check
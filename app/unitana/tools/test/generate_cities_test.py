@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import importlib
+import json
+import tracemalloc
+import zipfile
+from functools import partial
+from pathlib import Path
+
+import generate_cities_v1 as generator
+import validate_cities_v1 as validator
+from unitana_cities.geonames import read_alternate_names, read_alternate_names_isolated
+from unitana_cities.pipeline import Stage, code_closure, run_pipeline, stage_key
+from unitana_cities.search import PREFERRED_ZONE_BY_CITY_COUNTRY, normalize_query
+
+
+def _build(geonames_dir: Path, tmp_path: Path):
+    output = tmp_path / "out" / "cities_v1.json"
+    report = tmp_path / "out" / "disambiguation.json"
+    generator.build_asset(geonames_dir, output, disambiguation_report=report)
+    rows = json.loads(output.read_text(encoding="utf-8"))
+    return output, {r["id"]: r for r in rows}, json.loads(report.read_text(encoding="utf-8"))
+
+
+def test_build_asset_passes_validator(geonames_dir: Path, tmp_path: Path):
+    output, by_id, _ = _build(geonames_dir, tmp_path)
+    assert "gn_3041563" in by_id  # capital pulled in from cities1000
+    errors, count = validator.validate_full(output)
+    assert errors == []
+    assert count == len(by_id)
+
+
+def test_disambiguation_labels_and_preferred_flags(geonames_dir: Path, tmp_path: Path):
+    _, by_id, report = _build(geonames_dir, tmp_path)
+
+    assert by_id["gn_5746545"]["disambiguationLabel"] == "Portland, Oregon"
+    assert by_id["gn_4975802"]["disambiguationLabel"] == "Portland, Maine"
+    assert by_id["gn_5746545"]["preferredInCountryCluster"] is True
+    assert by_id["gn_4975802"]["preferredInCountryCluster"] is False
+
+    assert by_id["gn_2643743"]["disambiguationLabel"] == "London, England"
+    assert by_id["gn_2643743"]["preferredInNameCluster"] is True
+    assert by_id["gn_6058560"]["preferredInNameCluster"] is False
+    assert "preferredInCountryCluster" not in by_id["gn_2643743"]
+
+    # Unambiguous names stay unannotated.
+    assert "disambiguationLabel" not in by_id["gn_2267057"]
+
+    # Curated seeds copy the annotations of their GeoNames twin.
+    assert by_id["london_gb"]["disambiguationLabel"] == "London, England"
+    assert by_id["london_gb"]["preferredInNameCluster"] is True
+    assert "disambiguationLabel" not in by_id["denver_us"]
+
+    assert report["preferredZoneByCityCountry"] == {
+        "portland|US": "America/Los_Angeles",
+        "springfield|US": "America/Chicago",
+    }
+    assert report["unresolvedLabels"] == 0
+    assert [c["key"] for c in report["clusters"]] == ["london", "portland", "springfield"]
+
+
+def test_preferred_zones_agree_with_picker_ranking(geonames_dir: Path, tmp_path: Path):
+    # Mirrors test/city_disambiguation_parity_test.dart, which checks the
+    # shipped asset against CityPickerRanking.
+    _, _, report = _build(geonames_dir, tmp_path)
+    shared = report["preferredZoneByCityCountry"].keys() & PREFERRED_ZONE_BY_CITY_COUNTRY.keys()
+    assert shared == {"portland|US", "springfield|US"}
+    for key in shared:
+        assert report["preferredZoneByCityCountry"][key] == PREFERRED_ZONE_BY_CITY_COUNTRY[key], key
+
+
+def test_label_falls_back_to_more_qualifiers():
+    records = [
+        {"id": "gn_1", "cityName": "Paris", "countryCode": "US", "timeZoneId": "America/Chicago", "admin1Name": "Texas", "lat": 0, "lon": 0},
+        {"id": "gn_2", "cityName": "Paris", "countryCode": "US", "timeZoneId": "America/New_York", "admin1Name": "Texas", "lat": 0, "lon": 0},
+        {"id": "gn_3", "cityName": "Paris", "countryCode": "FR", "timeZoneId": "Europe/Paris", "lat": 0, "lon": 0},
+    ]
+    report = generator._add_disambiguation(records, {"gn_3": 2_000_000})
+    assert [r["disambiguationLabel"] for r in records] == [
+        "Paris (America/Chicago)",
+        "Paris (America/New_York)",
+        "Paris, FR",
+    ]
+    assert [r["preferredInNameCluster"] for r in records] == [False, False, True]
+    assert report["unresolvedLabels"] == 0
+
+
+def test_country_cluster_keys_use_picker_normalization():
+    records = [
+        {"id": "gn_1", "cityName": "Poznań", "countryCode": "PL", "timeZoneId": "Europe/Warsaw", "admin1Name": "Greater Poland", "lat": 0, "lon": 0},
+        {"id": "gn_2", "cityName": "Poznań", "countryCode": "PL", "timeZoneId": "Europe/Berlin", "admin1Name": "Lubusz", "lat": 0, "lon": 0},
+        {"id": "gn_3", "cityName": "Rock & Roll", "countryCode": "US", "timeZoneId": "America/Chicago", "admin1Name": "Iowa", "lat": 0, "lon": 0},
+        {"id": "gn_4", "cityName": "Rock & Roll", "countryCode": "US", "timeZoneId": "America/Denver", "admin1Name": "Utah", "lat": 0, "lon": 0},
+    ]
+    report = generator._add_disambiguation(records, {"gn_1": 500_000, "gn_4": 10})
+    # ń is outside the picker fold map, so normalizeQuery turns it into a
+    # separator, and "&" is punctuation rather than "and".
+    assert report["preferredZoneByCityCountry"] == {
+        "pozna|PL": "Europe/Warsaw",
+        "rock roll|US": "America/Denver",
+    }
+    for row in records:
+        key = f"{normalize_query(row['cityName'])}|{row['countryCode']}"
+        assert key in report["preferredZoneByCityCountry"]
+
+
+def test_stage_keys_cover_helpers_called_by_name(tmp_path: Path, monkeypatch):
+    module = tmp_path / "stage_mod.py"
+    module.write_text("def helper(x):\n    return x + 1\n\n\ndef run():\n    return helper(1)\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import stage_mod
+
+    key = stage_key(Stage("demo", stage_mod.run), [])
+    module.write_text("def helper(x):\n    return x + 2  # edited\n\n\ndef run():\n    return helper(1)\n", encoding="utf-8")
+    importlib.reload(stage_mod)
+    assert stage_key(Stage("demo", stage_mod.run), []) != key
+
+    stages = {s.name: s for s in generator.build_stages(tmp_path, tmp_path / "out.json")}
+    assert {
+        "generate_cities_v1._validate_asset_records",
+        "generate_cities_v1._validate_v2_tables",
+    } <= set(code_closure(stages["serialize"].run))
+
+
+def test_stage_cache_skips_unchanged_stages(geonames_dir: Path, tmp_path: Path):
+    output = tmp_path / "out" / "cities_v1.json"
+    cache = tmp_path / "cache"
+
+    assert generator.build_asset(geonames_dir, output, cache_dir=cache) == list(generator.STAGE_NAMES)
+    first = output.read_bytes()
+    assert generator.build_asset(geonames_dir, output, cache_dir=cache) == []
+
+    assert generator.build_asset(geonames_dir, output, cache_dir=cache, force=["capitals"]) == [
+        "capitals",
+        "alternate_names",
+        "records",
+        "validate",
+        "serialize",
+        "name_shards",
+    ]
+    assert output.read_bytes() == first
+
+    output.unlink()
+    assert generator.build_asset(geonames_dir, output, cache_dir=cache) == ["serialize"]
+    assert output.read_bytes() == first
+
+    admin1 = geonames_dir / "admin1CodesASCII.txt"
+    admin1.write_text(admin1.read_text(encoding="utf-8").replace("\tOregon\t", "\tOregon State\t"), encoding="utf-8")
+    ran = generator.build_asset(geonames_dir, output, cache_dir=cache)
+    assert ran == ["admin1", "records", "validate", "serialize", "name_shards"]
+    rows = {r["id"]: r for r in json.loads(output.read_text(encoding="utf-8"))}
+    assert rows["gn_5746545"]["admin1Name"] == "Oregon State"
+
+
+def test_force_reruns_downstream_stages(tmp_path: Path):
+    # `source` reads an undeclared input, so only --force notices the edit.
+    source = tmp_path / "source.txt"
+    source.write_text("old", encoding="utf-8")
+    stages = [
+        Stage("source", partial(Path.read_text, source)),
+        Stage("upper", str.upper, deps=("source",)),
+        Stage("other", partial(str, "x")),
+    ]
+    cache = tmp_path / "cache"
+    assert run_pipeline(stages, cache, log=None).load("upper") == "OLD"
+
+    source.write_text("new", encoding="utf-8")
+    result = run_pipeline(stages, cache, force=["source"], log=None)
+    assert result.ran() == ["source", "upper"]
+    assert result.load("upper") == "NEW"
+
+
+def test_parallel_stages_match_inline_build(geonames_dir: Path, tmp_path: Path):
+    inline = tmp_path / "inline.json"
+    parallel = tmp_path / "parallel.json"
+    generator.build_asset(geonames_dir, inline)
+    generator.build_asset(geonames_dir, parallel, cache_dir=tmp_path / "cache", jobs=2)
+    assert inline.read_bytes() == parallel.read_bytes()
+
+
+def test_name_shards_keep_preferred_and_short_names(geonames_dir: Path, tmp_path: Path):
+    output, by_id, _ = _build(geonames_dir, tmp_path)
+    rows = json.loads(output.read_text(encoding="utf-8"))
+    index = {r["id"]: i for i, r in enumerate(rows)}
+    shards = {
+        loc: json.loads((output.parent / "city_names" / f"{loc}.json").read_text(encoding="utf-8"))
+        for loc in generator.SUPPORTED_NAME_LOCALES
+    }
+
+    es, fr, pt = shards["es"], shards["fr"], shards["pt"]
+    assert es["records"] == len(rows) and es["locale"] == "es"
+    lisbon = str(index["gn_2267057"])
+    assert es["preferred"][lisbon] == "Lisboa"  # bounded "Olisipo" skipped
+    assert fr["preferred"][lisbon] == "Lisbonne"
+    assert pt["preferred"][lisbon] == "Lisboa"  # colloquial row skipped
+    # Curated seeds borrow their GeoNames twin's names.
+    assert es["preferred"][str(index["london_gb"])] == "Londres"
+    assert es["preferred"][str(index["gn_2643743"])] == "Londres"
+    # Short names are kept separately; plain and same-as-cityName names are not.
+    assert es["short"] == {str(index["gn_5746545"]): "PDX"}
+    assert str(index["gn_5746545"]) not in fr["preferred"]
+    assert str(index["gn_5419384"]) not in es["preferred"]
+
+
+def test_names_stages_are_skipped_without_alternate_names(geonames_dir: Path, tmp_path: Path, capsys):
+    (geonames_dir / "alternateNamesV2.zip").unlink()
+    output = tmp_path / "out" / "cities_v1.json"
+    ran = generator.build_asset(geonames_dir, output, cache_dir=tmp_path / "cache", force=generator.STAGE_NAMES)
+    assert ran == [s for s in generator.STAGE_NAMES if s not in generator.NAME_STAGES]
+    assert validator.validate_full(output)[0] == []
+    assert not (output.parent / "city_names").exists()
+    assert "Alternate names: skipped" in capsys.readouterr().out
+
+
+def test_alternate_names_parse_inline_with_one_job(geonames_dir: Path, tmp_path: Path, monkeypatch, capsys):
+    def no_spawn(*_args):
+        raise AssertionError("--jobs 1 must not start a process")
+
+    monkeypatch.setattr(generator, "read_alternate_names_isolated", no_spawn)
+    generator.build_asset(geonames_dir, tmp_path / "cities_v1.json", jobs=1)
+    assert "peak RSS not measured inline" in capsys.readouterr().out
+
+
+def test_alternate_names_are_streamed(tmp_path: Path):
+    zip_path = tmp_path / "alternateNamesV2.zip"
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        with z.open("alternateNamesV2.txt", "w") as f:
+            for i in range(100_000):
+                lang = ("es", "fr", "pt", "en", "de", "")[i % 6]
+                f.write(f"{i}\t{i % 5000}\t{lang}\tName {i}\t{i % 2}\t\t\t\t\t\n".encode("utf-8"))
+    size = zipfile.ZipFile(zip_path).getinfo("alternateNamesV2.txt").file_size
+
+    tracemalloc.start()
+    try:
+        names, stats = read_alternate_names(zip_path, set(range(0, 5000, 7)), ("es", "fr", "pt"))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert stats.rows == 100_000
+    assert stats.bytes_read == size
+    assert peak < size / 4
+    assert stats.kept == sum(1 for by_loc in names.values() for n in by_loc.values() if n.preferred)
+    assert set(stats.locales) == {"es", "fr", "pt"}
+    assert stats.peak_rss_mb is None  # only measured in a fresh process
+
+    isolated, isolated_stats = read_alternate_names_isolated(zip_path, set(range(0, 5000, 7)), ("es", "fr", "pt"))
+    assert isolated == names
+    assert isolated_stats.rows == stats.rows
+    if isolated_stats.peak_rss_mb is not None:
+        assert 0 < isolated_stats.baseline_rss_mb <= isolated_stats.peak_rss_mb
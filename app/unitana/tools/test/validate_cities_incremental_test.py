@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+import validate_cities_v1 as validator
+
+
+def _write(path: Path, rows: List[object]) -> None:
+    path.write_text(json.dumps(rows, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+
+
+def test_incremental_matches_full_across_edits(tmp_path: Path, sample_cities, same_verdict):
+    path = tmp_path / "cities_v1.json"
+    cache = tmp_path / "cache" / "cities_v1.validation_cache.json"
+    rows = [dict(r) for r in sample_cities]
+    _write(path, rows)
+
+    assert same_verdict(path, cache) == len(rows)
+    assert same_verdict(path, cache) == 0
+
+    # Break one row, duplicate an id, and add a new valid row.
+    rows[1]["timeZoneId"] = "Mars/Olympus_Mons"
+    rows[3]["id"] = rows[0]["id"]
+    rows.append(dict(rows[5], id="gn_999", cityName="Sintra"))
+    _write(path, rows)
+    assert same_verdict(path, cache) == 3
+    errors, _ = validator.validate_full(path)
+    assert any("timeZoneId is not a known IANA timezone" in e for e in errors)
+    assert any("duplicate id" in e for e in errors)
+
+    # Removing a row shifts indexes; cached results must still report the
+    # current row numbers and the duplicate must be recomputed.
+    del rows[0]
+    _write(path, rows)
+    assert same_verdict(path, cache) == 0
+    errors, _ = validator.validate_full(path)
+    assert not any("duplicate id" in e for e in errors)
+    assert errors[0].startswith("row 0 (gn_4975802)")
+
+    rows[0]["timeZoneId"] = "America/New_York"
+    _write(path, rows)
+    assert same_verdict(path, cache) == 1
+    assert validator.validate_full(path)[0] == []
+
+
+def test_only_changed_rows_are_decoded(tmp_path: Path, sample_cities, monkeypatch, same_verdict):
+    path = tmp_path / "cities_v1.json"
+    cache = tmp_path / "cache.json"
+    rows = [dict(r, id=f"{r['id']}_{i}") for i in range(500) for r in sample_cities]
+    _write(path, rows)
+    assert same_verdict(path, cache) == len(rows)
+
+    for i in (0, 1234, len(rows) - 1):
+        rows[i]["cityName"] += " Norte"
+    _write(path, rows)
+    decoded: List[dict] = []
+    summarize = validator._summarize_row
+
+    def spy(item, tables=None):
+        decoded.append(item)
+        return summarize(item, tables)
+
+    monkeypatch.setattr(validator, "_summarize_row", spy)
+    errors, count, rechecked = validator.validate_incremental(path, cache)
+    assert (errors, count, rechecked) == ([], len(rows), 3)
+    assert [r["cityName"] for r in decoded] == [rows[i]["cityName"] for i in (0, 1234, len(rows) - 1)]
+    # The cache is replaced atomically; no temp file is left behind.
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cache.json", "cities_v1.json"]
+
+
+def test_other_layouts_get_a_full_run(tmp_path: Path, sample_cities, same_verdict):
+    path = tmp_path / "cities_v1.json"
+    cache = tmp_path / "cache.json"
+    path.write_text(json.dumps(sample_cities, indent=2), encoding="utf-8")
+    assert same_verdict(path, cache) == len(sample_cities)
+    path.write_text(json.dumps(sample_cities, indent=2) + "\n", encoding="utf-8")
+    assert same_verdict(path, cache) == len(sample_cities)
+
+    # A `},{` inside a string splits a record; it must not pass as two rows.
+    rows = [dict(r) for r in sample_cities]
+    rows[2]["disambiguationLabel"] = 'Lisbon},{"id":"fake'
+    _write(path, rows)
+    assert same_verdict(path, cache) == len(rows)
+    _write(path, [])
+    assert same_verdict(path, cache) == 0
+    assert validator.validate_full(path)[0] == ["dataset is empty"]
+
+
+def test_tzdata_version_invalidates_cache(tmp_path: Path, sample_cities, monkeypatch, same_verdict):
+    path = tmp_path / "cities_v1.json"
+    cache = tmp_path / "cache.json"
+    _write(path, sample_cities)
+    same_verdict(path, cache)
+    assert same_verdict(path, cache) == 0
+    monkeypatch.setattr(validator, "_tzdata_version", lambda: "2099z")
+    assert same_verdict(path, cache) == len(sample_cities)
+
+
+def test_rules_version_invalidates_cache(tmp_path: Path, sample_cities, monkeypatch, same_verdict):
+    path = tmp_path / "cities_v1.json"
+    cache = tmp_path / "cache.json"
+    _write(path, sample_cities)
+    same_verdict(path, cache)
+    monkeypatch.setattr(validator, "RULES_VERSION", validator.RULES_VERSION + 1)
+    assert same_verdict(path, cache) == len(sample_cities)
+
+
+def test_non_object_rows_are_summarized(tmp_path: Path, sample_cities, same_verdict):
+    path = tmp_path / "cities_v1.json"
+    _write(path, [sample_cities[0], 42])
+    rechecked = same_verdict(path, tmp_path / "cache.json")
+    assert rechecked == 2
+    assert validator.validate_full(path)[0] == ["row 1: expected object"]
+
+
+def test_object_form_is_rejected_like_full_run(tmp_path: Path, sample_cities):
+    path = tmp_path / "cities_v1.json"
+    path.write_text(json.dumps({"cities": sample_cities}), encoding="utf-8")
+    with pytest.raises(SystemExit):
+        validator.validate_incremental(path, tmp_path / "cache.json")
@@ -0,0 +1,20 @@
+"""Importable access to the generated Unitana city dataset.
+
+Backend services resolve the same place ids as the app. This package opens a
+built `cities_v1.json` lazily so a long-running process can start quickly and
+answer lookups without holding every record as a Python dict.
+
+Usage:
+  from unitana_cities import CityDataset
+
+  with CityDataset.open("assets/data/cities_v1.json") as ds:
+      ds.by_id("denver_us")
+      ds.by_place("Portland", country_code="US")
+      ds.nearest(38.72, -9.14, limit=3)
+"""
+
+from __future__ import annotations
+
+from .dataset import CityDataset, CityRecord, norm_place
+
+__all__ = ["CityDataset", "CityRecord", "norm_place"]
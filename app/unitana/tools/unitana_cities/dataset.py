@@ -0,0 +1,455 @@
+"""Lazy, memory-mapped reader for the city dataset JSON asset.
+
+`CityDataset.open()` only maps the file. Record byte spans are located on the
+first query, and each lookup index (ids, places, countries, time zones,
+coordinates) is built the first time a query needs it by scanning the mapped
+bytes for a single field. Full records are decoded one at a time and kept in a
+bounded LRU cache.
+
+Schema v2 files (see `unitana_cities.schema`) are read the same way: the
+country and time-zone side tables are decoded on first use (from the bytes
+ahead of `cities` when they are written first, as the generator does, else
+from those bytes plus the ones after the array, never the records) and each
+record is expanded to its v1 form when decoded.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import mmap
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from functools import lru_cache
+from heapq import heappush, heappushpop
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from .schema import SCHEMA_VERSION, expand_row
+from .search import fold_diacritics
+
+
+_EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEGREE = _EARTH_RADIUS_KM * math.pi / 180.0
+
+# Records are flat objects, so a string-aware brace match is enough to find
+# their byte spans without decoding them.
+_STRING = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+_RECORD_RE = re.compile(rb'\{[^{}"]*(?:' + _STRING + rb'[^{}"]*)*\}')
+_CLOSE_ARRAY_RE = re.compile(rb"\s*\]")
+_CITIES_KEY_RE = re.compile(rb'"cities"\s*:\s*\[')
+_SPACE_RE = re.compile(r"\s+")
+_SIDE_TABLES = {"countries", "timeZones"}
+
+
+def _field_re(name: str) -> "re.Pattern[bytes]":
+    return re.compile(
+        rb'"' + name.encode("ascii") + rb'"\s*:\s*(' + _STRING + rb'|-?[0-9][0-9.eE+-]*)'
+    )
+
+
+_ID_RE = _field_re("id")
+_CITY_NAME_RE = _field_re("cityName")
+_COUNTRY_CODE_RE = _field_re("countryCode")
+_TIME_ZONE_RE = _field_re("timeZoneId")
+_TIME_ZONE_INDEX_RE = _field_re("timeZoneIndex")
+_LAT_RE = _field_re("lat")
+_LON_RE = _field_re("lon")
+
+
+def norm_place(s: str) -> str:
+    """Normalize a place name the way `CityRepository._norm` does: fold the
+    fixed diacritic map (nothing outside it), lowercase, trim, collapse
+    whitespace."""
+    return _SPACE_RE.sub(" ", fold_diacritics(s or "").lower().strip())
+
+
+@dataclass(frozen=True)
+class CityRecord:
+    id: str
+    city_name: str
+    country_code: str
+    time_zone_id: str
+    currency_code: str
+    default_unit_system: str
+    default_use_24h: bool
+    lat: float
+    lon: float
+    admin1_code: Optional[str] = None
+    admin1_name: Optional[str] = None
+    country_name: Optional[str] = None
+    iso3: Optional[str] = None
+    continent: Optional[str] = None
+    disambiguation_label: Optional[str] = None
+    preferred_in_name_cluster: Optional[bool] = None
+    preferred_in_country_cluster: Optional[bool] = None
+
+    @classmethod
+    def from_json(cls, row: Dict[str, Any]) -> "CityRecord":
+        return cls(
+            id=str(row["id"]).strip(),
+            city_name=str(row["cityName"]).strip(),
+            country_code=str(row["countryCode"]).strip(),
+            time_zone_id=str(row["timeZoneId"]).strip(),
+            currency_code=str(row["currencyCode"]).strip(),
+            default_unit_system=str(row["defaultUnitSystem"]),
+            default_use_24h=bool(row["defaultUse24h"]),
+            lat=float(row["lat"]),
+            lon=float(row["lon"]),
+            admin1_code=row.get("admin1Code"),
+            admin1_name=row.get("admin1Name"),
+            country_name=row.get("countryName"),
+            iso3=row.get("iso3"),
+            continent=row.get("continent"),
+            disambiguation_label=row.get("disambiguationLabel"),
+            preferred_in_name_cluster=row.get("preferredInNameCluster"),
+            preferred_in_country_cluster=row.get("preferredInCountryCluster"),
+        )
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * _EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class CityDataset:
+    """Read-only view over a generated city dataset file.
+
+    Opening is O(1): nothing is parsed until a query runs. Indexes hold record
+    positions (`array` of ints/floats) rather than decoded rows, and decoded
+    `CityRecord`s live in an LRU cache of `cache_size` entries.
+    """
+
+    def __init__(self, path: Path, cache_size: int = 4096) -> None:
+        self.path = Path(path)
+        self._file = self.path.open("rb")
+        try:
+            self._buf: Union[mmap.mmap, bytes] = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        except ValueError:
+            # Empty files cannot be mapped.
+            self._buf = b""
+        self._lock = threading.RLock()
+        self._starts: Optional[array] = None
+        self._ends: Optional[array] = None
+        self._array_close = 0
+        self._by_id: Optional[Dict[str, int]] = None
+        self._by_place: Optional[Dict[str, array]] = None
+        self._by_country: Optional[Dict[str, array]] = None
+        self._by_time_zone: Optional[Dict[str, array]] = None
+        self._lat_order: Optional[array] = None
+        self._lat_sorted: Optional[array] = None
+        self._lon_by_index: Optional[array] = None
+        self._header: Optional[Dict[str, Any]] = None
+        self.record = lru_cache(maxsize=cache_size)(self._decode)
+
+    @classmethod
+    def open(cls, path: Union[str, Path], cache_size: int = 4096) -> "CityDataset":
+        return cls(Path(path).expanduser(), cache_size=cache_size)
+
+    def close(self) -> None:
+        self.record.cache_clear()
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
+
+    def __enter__(self) -> "CityDataset":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._spans()[0])
+
+    def header(self) -> Dict[str, Any]:
+        """Top-level keys other than `cities` in object-form files (the v2
+        side tables); empty for plain arrays."""
+        if self._header is None:
+            with self._lock:
+                if self._header is None:
+                    self._header = self._read_header()
+        return self._header
+
+    @property
+    def schema_version(self) -> int:
+        return SCHEMA_VERSION if self.header().get("schemaVersion") == SCHEMA_VERSION else 1
+
+    def side_tables(self) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """`(countries, timeZones)` of a schema v2 file; empty for v1."""
+        if self.schema_version != SCHEMA_VERSION:
+            return {}, []
+        countries = self.header().get("countries")
+        time_zones = self.header().get("timeZones")
+        return (
+            countries if isinstance(countries, dict) else {},
+            time_zones if isinstance(time_zones, list) else [],
+        )
+
+    def raw_record(self, idx: int) -> bytes:
+        """Undecoded JSON bytes of record `idx`, exactly as stored in the file."""
+        starts, ends = self._spans()
+        return bytes(self._buf[starts[idx] : ends[idx]])
+
+    # -- Queries -------------------------------------------------------------
+
+    def by_id(self, city_id: str) -> Optional[CityRecord]:
+        idx = self._id_index().get(city_id.strip())
+        return None if idx is None else self.record(idx)
+
+    def by_place(
+        self,
+        city_name: str,
+        country_code: Optional[str] = None,
+        admin1_code: Optional[str] = None,
+    ) -> Optional[CityRecord]:
+        """First record whose normalized name (and optional country/admin1) matches."""
+        cc = None if country_code is None else norm_place(country_code)
+        a1 = None if admin1_code is None else norm_place(admin1_code)
+        for idx in self._place_index().get(norm_place(city_name), ()):
+            rec = self.record(idx)
+            if cc is not None and norm_place(rec.country_code) != cc:
+                continue
+            if a1 is not None and norm_place(rec.admin1_code or "") != a1:
+                continue
+            return rec
+        return None
+
+    def in_country(self, country_code: str) -> List[CityRecord]:
+        idxs = self._country_index().get(country_code.strip().upper(), ())
+        return [self.record(i) for i in idxs]
+
+    def in_time_zone(self, time_zone_id: str) -> List[CityRecord]:
+        idxs = self._time_zone_index().get(time_zone_id.strip(), ())
+        return [self.record(i) for i in idxs]
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        limit: int = 1,
+        max_km: Optional[float] = None,
+    ) -> List[Tuple[CityRecord, float]]:
+        """Closest records by great-circle distance, nearest first.
+
+        Records are scanned outward from `lat` in latitude order; the scan
+        stops once the latitude gap alone exceeds the current k-th distance.
+        """
+        if limit <= 0:
+            return []
+        order, lats, lons = self._coordinate_index()
+        n = len(lats)
+        bound = math.inf if max_km is None else max_km
+        best: List[Tuple[float, int]] = []  # max-heap on (-distance, -idx)
+        hi = bisect_left(lats, lat)
+        lo = hi - 1
+        while lo >= 0 or hi < n:
+            gap_lo = lat - lats[lo] if lo >= 0 else math.inf
+            gap_hi = lats[hi] - lat if hi < n else math.inf
+            if gap_lo <= gap_hi:
+                pos, gap = lo, gap_lo
+                lo -= 1
+            else:
+                pos, gap = hi, gap_hi
+                hi += 1
+            kth = -best[0][0] if len(best) >= limit else bound
+            if gap * _KM_PER_DEGREE > kth:
+                break
+            idx = order[pos]
+            d = haversine_km(lat, lon, lats[pos], lons[idx])
+            if d > bound:
+                continue
+            item = (-d, -idx)
+            if len(best) < limit:
+                heappush(best, item)
+            elif item > best[0]:
+                heappushpop(best, item)
+        ranked = sorted((-nd, -ni) for nd, ni in best)
+        return [(self.record(i), d) for d, i in ranked]
+
+    # -- Decoding ------------------------------------------------------------
+
+    def _decode(self, idx: int) -> CityRecord:
+        starts, ends = self._spans()
+        row = json.loads(self._buf[starts[idx] : ends[idx]])
+        if self.schema_version == SCHEMA_VERSION:
+            row = expand_row(row, *self.side_tables())
+        return CityRecord.from_json(row)
+
+    def _field_values(self, pattern: "re.Pattern[bytes]") -> Iterator[Tuple[int, Any]]:
+        """Yield `(record index, value)` for one field in a single pass over the buffer."""
+        starts, ends = self._spans()
+        n = len(starts)
+        if n == 0:
+            return
+        idx = 0
+        for m in pattern.finditer(self._buf, starts[0], ends[-1]):
+            at = m.start()
+            while idx + 1 < n and starts[idx + 1] <= at:
+                idx += 1
+            raw = m.group(1)
+            if raw[:1] == b'"':
+                yield idx, raw[1:-1].decode("utf-8") if b"\\" not in raw else json.loads(raw)
+            else:
+                yield idx, float(raw)
+
+    # -- Lazy indexes --------------------------------------------------------
+
+    def _read_header(self) -> Dict[str, Any]:
+        buf = self._buf
+        if not buf[:64].lstrip().startswith(b"{"):
+            return {}
+        m = _CITIES_KEY_RE.search(buf)
+        if m is None:
+            raise ValueError(f"City dataset object has no cities array: {self.path}")
+        # Everything before "cities" is normally a small object holding the
+        # side tables, so only that prefix is decoded.
+        header = bytes(buf[: m.start()]).rstrip().rstrip(b",") + b"}"
+        try:
+            doc = json.loads(header)
+        except ValueError:
+            doc = None
+        if isinstance(doc, dict) and "schemaVersion" in doc:
+            if doc["schemaVersion"] != SCHEMA_VERSION or _SIDE_TABLES <= doc.keys():
+                return doc
+        # No version, or side tables written after `cities`: decode the
+        # document with the records cut out of the array.
+        self._spans()
+        outer = bytes(buf[: m.end()]) + bytes(buf[self._array_close :])
+        doc = json.loads(outer)
+        if not isinstance(doc, dict) or doc.get("cities") != []:
+            raise ValueError(f"Malformed city dataset object: {self.path}")
+        del doc["cities"]
+        return doc
+
+    def _spans(self) -> Tuple[array, array]:
+        if self._starts is None:
+            with self._lock:
+                if self._starts is None:
+                    starts, ends = self._scan_spans()
+                    self._ends = ends
+                    self._starts = starts
+        return self._starts, self._ends  # type: ignore[return-value]
+
+    def _scan_spans(self) -> Tuple[array, array]:
+        buf = self._buf
+        head = buf[:64].lstrip()
+        if head.startswith(b"["):
+            pos = buf.find(b"[") + 1
+        elif head.startswith(b"{"):
+            m = _CITIES_KEY_RE.search(buf)
+            if m is None:
+                raise ValueError(f"City dataset object has no cities array: {self.path}")
+            pos = m.end()
+        else:
+            raise ValueError(f"City dataset must be a JSON array: {self.path}")
+
+        starts = array("Q")
+        ends = array("Q")
+        # Records may only be separated by commas; a closing bracket ends the
+        # cities array (object-form files can carry other keys after it).
+        for m in _RECORD_RE.finditer(buf, pos):
+            gap = buf[pos : m.start()].strip()
+            if gap.startswith(b"]"):
+                break
+            if gap != (b"," if starts else b""):
+                raise ValueError(f"Malformed city record at byte {pos}: {self.path}")
+            starts.append(m.start())
+            ends.append(m.end())
+            pos = m.end()
+        close = _CLOSE_ARRAY_RE.match(buf, pos)
+        if not close:
+            raise ValueError(f"Malformed city record at byte {pos}: {self.path}")
+        self._array_close = close.end() - 1
+        return starts, ends
+
+    def _group_by(self, pattern: "re.Pattern[bytes]", key: Callable[[str], str]) -> Dict[str, array]:
+        out: Dict[str, array] = {}
+        for idx, value in self._field_values(pattern):
+            if not isinstance(value, str):
+                continue
+            k = key(value)
+            bucket = out.get(k)
+            if bucket is None:
+                bucket = out[k] = array("I")
+            bucket.append(idx)
+        return out
+
+    def _group_by_zone_index(self, time_zones: List[str]) -> Dict[str, array]:
+        out: Dict[str, array] = {}
+        for idx, value in self._field_values(_TIME_ZONE_INDEX_RE):
+            if not isinstance(value, float) or not value.is_integer() or not 0 <= value < len(time_zones):
+                continue
+            k = time_zones[int(value)].strip()
+            bucket = out.get(k)
+            if bucket is None:
+                bucket = out[k] = array("I")
+            bucket.append(idx)
+        return out
+
+    def _id_index(self) -> Dict[str, int]:
+        if self._by_id is None:
+            with self._lock:
+                if self._by_id is None:
+                    out: Dict[str, int] = {}
+                    for idx, value in self._field_values(_ID_RE):
+                        if isinstance(value, str):
+                            out.setdefault(value.strip(), idx)
+                    self._by_id = out
+        return self._by_id
+
+    def _place_index(self) -> Dict[str, array]:
+        if self._by_place is None:
+            with self._lock:
+                if self._by_place is None:
+                    self._by_place = self._group_by(_CITY_NAME_RE, norm_place)
+        return self._by_place
+
+    def _country_index(self) -> Dict[str, array]:
+        if self._by_country is None:
+            with self._lock:
+                if self._by_country is None:
+                    self._by_country = self._group_by(
+                        _COUNTRY_CODE_RE, lambda v: v.strip().upper()
+                    )
+        return self._by_country
+
+    def _time_zone_index(self) -> Dict[str, array]:
+        if self._by_time_zone is None:
+            with self._lock:
+                if self._by_time_zone is None:
+                    if self.schema_version == SCHEMA_VERSION:
+                        self._by_time_zone = self._group_by_zone_index(self.side_tables()[1])
+                    else:
+                        self._by_time_zone = self._group_by(_TIME_ZONE_RE, str.strip)
+        return self._by_time_zone
+
+    def _coordinate_index(self) -> Tuple[array, array, array]:
+        if self._lat_order is None:
+            with self._lock:
+                if self._lat_order is None:
+                    n = len(self._spans()[0])
+                    lats = array("d", [math.nan]) * n
+                    lons = array("d", [math.nan]) * n
+                    for idx, value in self._field_values(_LAT_RE):
+                        if isinstance(value, float):
+                            lats[idx] = value
+                    for idx, value in self._field_values(_LON_RE):
+                        if isinstance(value, float):
+                            lons[idx] = value
+                    valid = [
+                        i for i in range(n) if not (math.isnan(lats[i]) or math.isnan(lons[i]))
+                    ]
+                    order = array("I", sorted(valid, key=lats.__getitem__))
+                    self._lon_by_index = lons
+                    self._lat_sorted = array("d", (lats[i] for i in order))
+                    self._lat_order = order
+        return self._lat_order, self._lat_sorted, self._lon_by_index  # type: ignore[return-value]
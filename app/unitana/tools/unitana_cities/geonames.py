@@ -0,0 +1,355 @@
+"""GeoNames dump parsing shared by the city generator and backend tools.
+
+Readers for `countryInfo.txt`, `admin1CodesASCII.txt`, the `cities*.zip`
+dumps and `alternateNamesV2.zip`, plus the capital-matching helpers. Rows are plain dataclasses so they
+can be cached between generator stages.
+"""
+
+from __future__ import annotations
+
+import io
+import multiprocessing
+import re
+import sys
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+
+_PUNCT_RE = re.compile(r"[^a-z0-9\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def strip_diacritics(s: str) -> str:
+    return "".join(
+        ch for ch in unicodedata.normalize("NFD", s) if unicodedata.category(ch) != "Mn"
+    )
+
+
+def norm_name(s: str) -> str:
+    s = (s or "").strip().lower()
+    s = strip_diacritics(s)
+    s = s.replace("&", " and ")
+    s = _PUNCT_RE.sub(" ", s)
+    s = _SPACE_RE.sub(" ", s).strip()
+    return s
+
+
+def capital_variants(capital: str) -> List[str]:
+    base = norm_name(capital)
+    out: Set[str] = {base}
+
+    # Common Saint abbreviations.
+    if base.startswith("st "):
+        out.add("saint " + base[3:])
+    if base.startswith("st "):
+        out.add("st" + base[2:])
+
+    # Some countryInfo capitals use hyphenation; try a space variant.
+    out.add(base.replace("-", " "))
+
+    # Macau vs Macao.
+    if base == "macao":
+        out.add("macau")
+
+    return [v for v in out if v]
+
+
+@dataclass(frozen=True)
+class Country:
+    code2: str
+    name: str
+    iso3: str
+    capital: str
+    continent: str
+    currency: str
+
+
+@dataclass
+class GeoRow:
+    geonameid: int
+    name: str
+    asciiname: str
+    alternates: List[str]
+    country: str
+    admin1: str
+    tz: str
+    population: int
+    lat: float
+    lon: float
+
+
+def read_country_info(path: Path) -> Dict[str, Country]:
+    countries: Dict[str, Country] = {}
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 11:
+                continue
+            code2 = parts[0].strip()
+            iso3 = parts[1].strip()
+            name = parts[4].strip()
+            capital = parts[5].strip()
+            continent = parts[8].strip()
+            currency = parts[10].strip()
+            if not code2:
+                continue
+            countries[code2] = Country(
+                code2=code2,
+                name=name,
+                iso3=iso3,
+                capital=capital,
+                continent=continent,
+                currency=currency,
+            )
+    return countries
+
+
+def read_admin1(path: Path) -> Dict[str, str]:
+    # Key format: CC.ADMIN1 (e.g. US.CO)
+    out: Dict[str, str] = {}
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 2:
+                continue
+            out[parts[0].strip()] = parts[1].strip()
+    return out
+
+
+def iter_cities(zip_path: Path) -> Iterable[GeoRow]:
+    with zipfile.ZipFile(zip_path, "r") as z:
+        # Each zip contains a single .txt with the same stem.
+        txt_names = [n for n in z.namelist() if n.endswith(".txt")]
+        if not txt_names:
+            raise RuntimeError(f"No .txt found in {zip_path}")
+        txt_name = txt_names[0]
+        with z.open(txt_name) as raw:
+            for b in raw:
+                line = b.decode("utf-8", errors="ignore").rstrip("\n")
+                if not line:
+                    continue
+                parts = line.split("\t")
+                if len(parts) < 19:
+                    continue
+
+                # GeoNames schema for cities*.txt
+                # 0 geonameid
+                # 1 name
+                # 2 asciiname
+                # 3 alternatenames
+                # 8 country code
+                # 10 admin1
+                # 14 population
+                # 17 timezone
+                # 4 latitude
+                # 5 longitude
+                try:
+                    geonameid = int(parts[0])
+                except ValueError:
+                    continue
+
+                name = parts[1].strip()
+                asciiname = parts[2].strip()
+                alternates = [a for a in (parts[3] or "").split(",") if a]
+                country = parts[8].strip()
+                admin1 = parts[10].strip()
+                tz = parts[17].strip()
+                try:
+                    lat = float(parts[4])
+                    lon = float(parts[5])
+                except ValueError:
+                    continue
+                try:
+                    population = int(parts[14])
+                except ValueError:
+                    population = 0
+
+                # Keep only populated places.
+                if parts[6].strip() != "P":
+                    continue
+
+                if not (name and country and tz):
+                    continue
+
+                yield GeoRow(
+                    geonameid=geonameid,
+                    name=name,
+                    asciiname=asciiname,
+                    alternates=alternates,
+                    country=country,
+                    admin1=admin1,
+                    tz=tz,
+                    population=population,
+                    lat=lat,
+                    lon=lon,
+                )
+
+
+def best_capital_match(rows: List[GeoRow], country_code: str, capital: str) -> Optional[GeoRow]:
+    variants = capital_variants(capital)
+    for v in variants:
+        best: Optional[GeoRow] = None
+        for r in rows:
+            if r.country != country_code:
+                continue
+            if norm_name(r.name) == v or norm_name(r.asciiname) == v:
+                if best is None or r.population > best.population:
+                    best = r
+        if best is not None:
+            return best
+
+    # Fall back to alternatenames matching.
+    vset = set(variants)
+    best: Optional[GeoRow] = None
+    for r in rows:
+        if r.country != country_code:
+            continue
+        if any(norm_name(a) in vset for a in r.alternates[:80]):
+            if best is None or r.population > best.population:
+                best = r
+    return best
+
+
+@dataclass
+class LocalizedName:
+    """First preferred and first short GeoNames name for one place and locale."""
+
+    preferred: Optional[str] = None
+    short: Optional[str] = None
+
+
+@dataclass
+class AlternateNamesStats:
+    rows: int = 0
+    kept: int = 0
+    bytes_read: int = 0
+    seconds: float = 0.0
+    # Set by `read_alternate_names_isolated`: the parse process's peak RSS and
+    # its RSS before parsing (interpreter and imports).
+    peak_rss_mb: Optional[float] = None
+    baseline_rss_mb: Optional[float] = None
+    locales: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes_read / (1 << 20) / self.seconds if self.seconds else 0.0
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def read_alternate_names(
+    zip_path: Path,
+    geonameids: Set[int],
+    locales: Iterable[str],
+) -> Tuple[Dict[int, Dict[str, LocalizedName]], AlternateNamesStats]:
+    """Stream `alternateNamesV2.zip`, keeping preferred/short names only.
+
+    The dump is read line by line from the zip member; memory is bounded by
+    the kept names, not the file. Rows are filtered on the raw bytes (language
+    first, then geonameid) before anything is decoded, and colloquial,
+    historic or date-bounded names are skipped. For each geonameid and locale
+    the first preferred and first short name in file order win.
+    """
+    # alternateNamesV2.txt columns:
+    # 0 alternateNameId, 1 geonameid, 2 isolanguage, 3 alternate name,
+    # 4 isPreferredName, 5 isShortName, 6 isColloquial, 7 isHistoric, 8 from, 9 to
+    wanted = {loc.encode("ascii") for loc in locales}
+    out: Dict[int, Dict[str, LocalizedName]] = {}
+    stats = AlternateNamesStats(locales={loc.decode("ascii"): 0 for loc in sorted(wanted)})
+    start = time.perf_counter()
+    with zipfile.ZipFile(zip_path, "r") as z:
+        member = next((n for n in z.namelist() if n.endswith("alternateNamesV2.txt")), None)
+        if member is None:
+            raise RuntimeError(f"No alternateNamesV2.txt found in {zip_path}")
+        # Small reads: inflating a large chunk holds several copies of it at once.
+        with z.open(member) as raw, io.BufferedReader(raw, buffer_size=1 << 16) as f:
+            for line in f:
+                stats.rows += 1
+                stats.bytes_read += len(line)
+                head = line.split(b"\t", 3)
+                if len(head) < 4 or head[2] not in wanted:
+                    continue
+                try:
+                    geonameid = int(head[1])
+                except ValueError:
+                    continue
+                if geonameid not in geonameids:
+                    continue
+                cols = head[3].rstrip(b"\r\n").split(b"\t")
+                cols += [b""] * (7 - len(cols))
+                is_preferred = cols[1] == b"1"
+                is_short = cols[2] == b"1"
+                if not (is_preferred or is_short):
+                    continue
+                if cols[3] == b"1" or cols[4] == b"1" or cols[5] or cols[6]:
+                    continue
+                name = cols[0].decode("utf-8", errors="ignore").strip()
+                if not name:
+                    continue
+                locale = head[2].decode("ascii")
+                entry = out.setdefault(geonameid, {}).setdefault(locale, LocalizedName())
+                kept = False
+                if is_preferred and entry.preferred is None:
+                    entry.preferred = name
+                    kept = True
+                if is_short and entry.short is None:
+                    entry.short = name
+                    kept = True
+                if kept:
+                    stats.kept += 1
+                    stats.locales[locale] += 1
+    stats.seconds = time.perf_counter() - start
+    return out, stats
+
+
+def _measured_read(
+    zip_path: Path,
+    geonameids: Set[int],
+    locales: Tuple[str, ...],
+) -> Tuple[Dict[int, Dict[str, LocalizedName]], AlternateNamesStats]:
+    baseline = _peak_rss_mb()
+    out, stats = read_alternate_names(zip_path, geonameids, locales)
+    stats.baseline_rss_mb = baseline
+    stats.peak_rss_mb = _peak_rss_mb()
+    return out, stats
+
+
+def read_alternate_names_isolated(
+    zip_path: Path,
+    geonameids: Set[int],
+    locales: Iterable[str],
+) -> Tuple[Dict[int, Dict[str, LocalizedName]], AlternateNamesStats]:
+    """`read_alternate_names` in a freshly spawned process.
+
+    `ru_maxrss` is a lifetime peak, so measured inline (or in a reused pool
+    worker) it reflects whatever ran earlier. A fresh process's peak covers
+    only interpreter startup and this parse; `baseline_rss_mb` records the
+    former. `tracemalloc` would measure the parse alone but slows it ~15x.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(_measured_read, zip_path, set(geonameids), tuple(locales)).result()
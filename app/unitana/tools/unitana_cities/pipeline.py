@@ -0,0 +1,324 @@
+"""Small cached stage runner for the city build.
+
+A build is a list of `Stage`s forming a DAG. Each stage's result is pickled to
+`<cache_dir>/<stage>-<key>.pickle`, where the key hashes the stage name, the
+source of its code (see `code_closure`), the content of its input files, its
+bound arguments and the keys of its dependencies. A stage whose key already has an
+artifact is skipped; stages whose dependencies are done run concurrently in a
+process pool. Forcing a stage also reruns every stage downstream of it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import re
+import sysconfig
+import time
+import types
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+# Bump to invalidate every cached artifact (e.g. after changing this runner).
+PIPELINE_VERSION = 2
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One build step.
+
+    `run` is called with the results of `deps` in order and must be picklable
+    (a module-level function or a `functools.partial` of one). `files` are
+    hashed by content. The source of `run` and of every project function,
+    class or constant it reaches by global name feeds the key (`code_closure`);
+    `code` lists extra items reached some other way (attribute access,
+    callbacks passed in as data) whose source or repr should count too. `outputs` are
+    files the stage writes outside the cache; a cached result is only reused
+    if they still exist with the recorded content.
+    """
+
+    name: str
+    run: Callable[..., Any]
+    deps: Tuple[str, ...] = ()
+    files: Tuple[Path, ...] = ()
+    code: Tuple[Any, ...] = ()
+    outputs: Tuple[Path, ...] = ()
+
+
+@dataclass
+class StageReport:
+    name: str
+    key: str
+    cached: bool
+    seconds: float
+
+
+class PipelineResult:
+    def __init__(self, artifacts: Dict[str, Path], reports: List[StageReport]) -> None:
+        self.artifacts = artifacts
+        self.reports = reports
+
+    def load(self, name: str) -> Any:
+        return _read_artifact(self.artifacts[name])
+
+    def ran(self) -> List[str]:
+        return [r.name for r in self.reports if not r.cached]
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+_LIBRARY_DIRS = tuple(
+    sorted(
+        {
+            os.path.join(os.path.realpath(path), "")
+            for name, path in sysconfig.get_paths().items()
+            if name in ("stdlib", "platstdlib", "purelib", "platlib")
+        }
+    )
+)
+_CONSTANT_TYPES = (str, bytes, int, float, bool, type(None), tuple, list, dict, set, frozenset, re.Pattern)
+
+
+def _stable_repr(value: Any) -> str:
+    """`repr` with sets sorted, so keys do not depend on hash randomization."""
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(_stable_repr(v) for v in value)) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_stable_repr(v) for v in value) + "]"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{_stable_repr(k)}: {_stable_repr(v)}" for k, v in value.items()) + "}"
+    return repr(value)
+
+
+def _is_project_code(obj: Any) -> bool:
+    try:
+        path = inspect.getsourcefile(obj)
+    except TypeError:
+        return False
+    return bool(path) and not os.path.realpath(path).startswith(_LIBRARY_DIRS)
+
+
+def _global_refs(code: types.CodeType, namespace: Dict[str, Any]) -> Iterable[Tuple[str, Any]]:
+    for name in code.co_names:
+        if name in namespace:
+            yield name, namespace[name]
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _global_refs(const, namespace)
+
+
+def code_closure(item: Any) -> Dict[str, str]:
+    """Fingerprints of `item` and everything it reaches through module globals.
+
+    Follows project functions and classes (anything not from the standard
+    library or site-packages) transitively; constants they name are included
+    by repr. Calls made through attributes (`module.fn`, `obj.method`) are not
+    followed; list those in `Stage.code`.
+    """
+    out: Dict[str, str] = {}
+    stack: List[Tuple[str, Any]] = [("", item)]
+    seen: Set[int] = set()
+    while stack:
+        label, obj = stack.pop()
+        obj = obj.func if isinstance(obj, partial) else obj
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, (types.FunctionType, type)) and _is_project_code(obj):
+            name = f"{obj.__module__}.{obj.__qualname__}"
+            try:
+                out[name] = inspect.getsource(obj)
+            except (OSError, TypeError):
+                out[name] = name
+            funcs = [obj]
+            if isinstance(obj, type):
+                # Methods, unwrapping static/class methods and properties.
+                funcs = [getattr(v, "__func__", None) or getattr(v, "fget", None) or v for v in vars(obj).values()]
+            for fn in funcs:
+                if isinstance(fn, types.FunctionType):
+                    stack.extend(_global_refs(fn.__code__, fn.__globals__))
+        elif callable(obj) and not isinstance(obj, _CONSTANT_TYPES):
+            # Library callables and builtins: their name is enough.
+            if not label:
+                out[f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', repr(obj))}"] = ""
+        elif isinstance(obj, _CONSTANT_TYPES):
+            out[f"{label or 'code'}={_stable_repr(obj)}"] = ""
+    return out
+
+
+def _bound_args(run: Callable[..., Any]) -> str:
+    if not isinstance(run, partial):
+        return ""
+    return repr((run.args, sorted(run.keywords.items())))
+
+
+def stage_key(stage: Stage, dep_keys: Sequence[str]) -> str:
+    h = hashlib.sha256()
+    h.update(f"pipeline:{PIPELINE_VERSION}\0stage:{stage.name}\0".encode("utf-8"))
+    fingerprints: Dict[str, str] = {}
+    for item in (stage.run, *stage.code):
+        fingerprints.update(code_closure(item))
+    for name in sorted(fingerprints):
+        h.update(f"{name}\0{fingerprints[name]}\0".encode("utf-8"))
+    h.update(_bound_args(stage.run).encode("utf-8") + b"\0")
+    for path in stage.files:
+        h.update(file_digest(path).encode("ascii") + b"\0")
+    for key in dep_keys:
+        h.update(key.encode("ascii") + b"\0")
+    return h.hexdigest()
+
+
+def _read_artifact(path: Path) -> Any:
+    with path.open("rb") as f:
+        return pickle.load(f)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _execute(run: Callable[..., Any], dep_paths: List[Path], artifact: Path) -> float:
+    start = time.perf_counter()
+    result = run(*[_read_artifact(p) for p in dep_paths])
+    _write_atomic(artifact, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+    return time.perf_counter() - start
+
+
+def _outputs_path(artifact: Path) -> Path:
+    return artifact.with_suffix(".outputs.json")
+
+
+def _outputs_match(stage: Stage, artifact: Path) -> bool:
+    if not stage.outputs:
+        return True
+    try:
+        recorded = json.loads(_outputs_path(artifact).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    for path in stage.outputs:
+        if not path.exists() or recorded.get(str(path)) != file_digest(path):
+            return False
+    return True
+
+
+def _record_outputs(stage: Stage, artifact: Path) -> None:
+    if stage.outputs:
+        digests = {str(p): file_digest(p) for p in stage.outputs if p.exists()}
+        _write_atomic(_outputs_path(artifact), json.dumps(digests, indent=2).encode("utf-8"))
+
+
+def _prune(cache_dir: Path, stage: Stage, keep: Path) -> None:
+    for old in cache_dir.glob(f"{stage.name}-*"):
+        if old.name.startswith(keep.stem) or old.suffix == ".tmp":
+            continue
+        old.unlink(missing_ok=True)
+
+
+class _InlineExecutor(Executor):
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:  # surfaced via future.result()
+            future.set_exception(exc)
+        return future
+
+
+def run_pipeline(
+    stages: Iterable[Stage],
+    cache_dir: Path,
+    force: Iterable[str] = (),
+    jobs: int = 1,
+    log: Optional[Callable[[str], None]] = print,
+) -> PipelineResult:
+    """Run `stages`, reusing cached artifacts.
+
+    `force` names stages to rerun; their transitive dependents rerun too, since
+    a dependent's key covers its dependencies' keys, not their output.
+    """
+    by_name: Dict[str, Stage] = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"duplicate stage: {stage.name}")
+        by_name[stage.name] = stage
+    for stage in by_name.values():
+        missing = [d for d in stage.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"stage {stage.name} depends on unknown stages: {missing}")
+    order = {name: i for i, name in enumerate(by_name)}
+    forced: Set[str] = set(force)
+    unknown = forced - set(by_name)
+    if unknown:
+        raise ValueError(f"unknown stage(s) for --force: {sorted(unknown)}")
+    grew = True
+    while grew:
+        grew = False
+        for stage in by_name.values():
+            if stage.name not in forced and forced.intersection(stage.deps):
+                forced.add(stage.name)
+                grew = True
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    keys: Dict[str, str] = {}
+    artifacts: Dict[str, Path] = {}
+    reports: List[StageReport] = []
+    done: Set[str] = set()
+    running: Dict[Future, Stage] = {}
+
+    def say(msg: str) -> None:
+        if log is not None:
+            log(msg)
+
+    executor: Executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else _InlineExecutor()
+    try:
+        while len(done) < len(by_name):
+            for stage in by_name.values():
+                if stage.name in done or stage.name in keys:
+                    continue
+                if not all(d in done for d in stage.deps):
+                    continue
+                key = stage_key(stage, [keys[d] for d in stage.deps])
+                keys[stage.name] = key
+                artifact = cache_dir / f"{stage.name}-{key[:20]}.pickle"
+                artifacts[stage.name] = artifact
+                if stage.name not in forced and artifact.exists() and _outputs_match(stage, artifact):
+                    reports.append(StageReport(stage.name, key, True, 0.0))
+                    say(f"[{stage.name}] cached ({key[:12]})")
+                    done.add(stage.name)
+                    continue
+                dep_paths = [artifacts[d] for d in stage.deps]
+                running[executor.submit(_execute, stage.run, dep_paths, artifact)] = stage
+
+            if len(done) == len(by_name):
+                break
+            if not running:
+                raise RuntimeError("pipeline has a dependency cycle")
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            # Settle in declaration order so logs and reports are deterministic.
+            for future in sorted(finished, key=lambda f: order[running[f].name]):
+                stage = running.pop(future)
+                seconds = future.result()
+                _record_outputs(stage, artifacts[stage.name])
+                _prune(cache_dir, stage, artifacts[stage.name])
+                reports.append(StageReport(stage.name, keys[stage.name], False, seconds))
+                say(f"[{stage.name}] ran in {seconds:.2f}s")
+                done.add(stage.name)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return PipelineResult(artifacts, reports)
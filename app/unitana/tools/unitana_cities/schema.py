@@ -0,0 +1,120 @@
+"""City dataset schema v2: v1 rows with country and time-zone side tables.
+
+v1 is a JSON array of flat records. v2 is an object that factors out the
+fields that are functions of the country, and interns time zones:
+
+    {
+      "schemaVersion": 2,
+      "countries": {"US": {"countryName": "United States", "iso3": "USA",
+                           "continent": "NA", "currencyCode": "USD",
+                           "defaultUnitSystem": "imperial",
+                           "defaultUse24h": false}, ...},
+      "timeZones": ["America/Chicago", ...],
+      "cities": [{"id": "gn_5746545", "cityName": "Portland",
+                  "countryCode": "US", "timeZoneIndex": 3, ...}, ...]
+    }
+
+A row expands to `{**countries[countryCode], **row}` with `timeZoneIndex`
+replaced by `timeZoneId`, so a row may override any country field. A field
+only enters a country entry when every record of that country has it, which
+makes `expand_v2(compact_v2(rows)) == rows` for any v1 rows. The side tables
+are written before `cities` so streaming readers can decode them first.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any, Dict, List, Sequence
+
+SCHEMA_VERSION = 2
+COUNTRY_FIELDS = (
+    "countryName",
+    "iso3",
+    "continent",
+    "currencyCode",
+    "defaultUnitSystem",
+    "defaultUse24h",
+)
+
+
+def is_v2(doc: Any) -> bool:
+    return isinstance(doc, dict) and doc.get("schemaVersion") == SCHEMA_VERSION
+
+
+def compact_v2(rows: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Factor v1 `rows` into a v2 document (lossless; see module docstring)."""
+    by_country: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_country.setdefault(row["countryCode"], []).append(row)
+
+    countries: Dict[str, Dict[str, Any]] = {}
+    for cc in sorted(by_country):
+        members = by_country[cc]
+        entry: Dict[str, Any] = {}
+        for field in COUNTRY_FIELDS:
+            if not all(field in r for r in members):
+                continue
+            # Most common value; ties go to the first seen (Counter keeps
+            # insertion order) so output is deterministic.
+            counts = Counter(repr(r[field]) for r in members)
+            best = counts.most_common(1)[0][0]
+            entry[field] = next(r[field] for r in members if repr(r[field]) == best)
+        countries[cc] = entry
+
+    zone_index: Dict[str, int] = {}
+    for tz in sorted({r["timeZoneId"] for r in rows}):
+        zone_index[tz] = len(zone_index)
+
+    cities: List[Dict[str, Any]] = []
+    for row in rows:
+        shared = countries[row["countryCode"]]
+        out: Dict[str, Any] = {}
+        for key, value in row.items():
+            if key == "timeZoneId":
+                out["timeZoneIndex"] = zone_index[value]
+            elif key in shared and shared[key] == value and type(shared[key]) is type(value):
+                continue
+            else:
+                out[key] = value
+        cities.append(out)
+
+    return {
+        "schemaVersion": SCHEMA_VERSION,
+        "countries": countries,
+        "timeZones": list(zone_index),
+        "cities": cities,
+    }
+
+
+def expand_row(
+    row: Dict[str, Any],
+    countries: Dict[str, Dict[str, Any]],
+    time_zones: Sequence[str],
+) -> Dict[str, Any]:
+    """v1 view of one v2 row. Unknown countries or indexes are left for the
+    validator to report (the row simply lacks the shared fields)."""
+    shared = countries.get(row.get("countryCode"))  # type: ignore[arg-type]
+    out: Dict[str, Any] = dict(shared) if isinstance(shared, dict) else {}
+    for key, value in row.items():
+        if key == "timeZoneIndex":
+            if isinstance(value, int) and not isinstance(value, bool) and 0 <= value < len(time_zones):
+                out["timeZoneId"] = time_zones[value]
+        else:
+            out[key] = value
+    return out
+
+
+def expand_v2(doc: Dict[str, Any]) -> List[Any]:
+    countries = doc.get("countries") or {}
+    time_zones = doc.get("timeZones") or []
+    return [expand_row(r, countries, time_zones) if isinstance(r, dict) else r for r in doc.get("cities", [])]
+
+
+def dataset_rows(doc: Any) -> List[Any]:
+    """Rows of a v1 array or v2 document in v1 form. Raises `ValueError` for
+    anything else."""
+    if isinstance(doc, list):
+        return doc
+    if is_v2(doc) and isinstance(doc.get("cities"), list):
+        return expand_v2(doc)
+    raise ValueError("city dataset must be a JSON array or a schema v2 object")
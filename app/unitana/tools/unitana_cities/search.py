@@ -0,0 +1,682 @@
+"""Python reference port of `CityPickerEngine` and `CityPickerRanking`.
+
+Mirrors `lib/data/city_picker_engine.dart` and `lib/data/city_picker_ranking.dart`
+so ranking changes can be evaluated offline against the generated dataset.
+Keep the two in lockstep: any scoring change on the Dart side must be ported
+here in the same commit.
+
+`search_entries` is the literal port (a linear scan). `SearchIndex.search`
+returns identical results but only scores candidate rows drawn from n-gram
+postings (substring containment needs n-grams rather than word prefixes)
+plus time-zone postings for alias matches. Candidates are visited in entry
+order, so the `max_candidates` cut-off lands on the same rows.
+`wizard_search` wraps either path the way the city picker wizard calls it.
+
+Known divergence: Dart's `List.sort` is not stable for long lists, while
+Python's is; rows tied on both score and normalized name may order
+differently. Neither path here depends on that.
+"""
+
+from __future__ import annotations
+
+import re
+from array import array
+from dataclasses import dataclass
+from typing import (
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+T = TypeVar("T")
+
+
+# -- CityPickerRanking ------------------------------------------------------
+
+MAINSTREAM_HUB_ZONE_PRIORITY: List[str] = [
+    "America/New_York",
+    "America/Los_Angeles",
+    "America/Chicago",
+    "Europe/London",
+    "Europe/Paris",
+    "Europe/Berlin",
+    "Europe/Madrid",
+    "Asia/Tokyo",
+    "Asia/Singapore",
+    "Asia/Hong_Kong",
+    "Asia/Seoul",
+    "Asia/Kolkata",
+    "Australia/Sydney",
+    "America/Toronto",
+    "America/Vancouver",
+    "America/Mexico_City",
+    "America/Sao_Paulo",
+    "Pacific/Auckland",
+    "UTC",
+]
+
+MAINSTREAM_COUNTRY_CODES: Set[str] = {
+    "US",
+    "GB",
+    "FR",
+    "DE",
+    "ES",
+    "IT",
+    "JP",
+    "SG",
+    "HK",
+    "KR",
+    "IN",
+    "CA",
+    "AU",
+    "NZ",
+    "MX",
+    "BR",
+}
+
+# Ambiguity v3: prefer mainstream travel-default rows for same-city
+# same-country collisions where multiple zones exist in data.
+PREFERRED_ZONE_BY_CITY_COUNTRY: Dict[str, str] = {
+    "portland|US": "America/Los_Angeles",
+    "long beach|US": "America/Los_Angeles",
+    "springfield|US": "America/Chicago",
+}
+
+
+def hub_priority_bonus(time_zone_id: str) -> int:
+    try:
+        hub_index = MAINSTREAM_HUB_ZONE_PRIORITY.index(time_zone_id)
+    except ValueError:
+        return 0
+    return 220 - hub_index * 6
+
+
+def is_mainstream_country_code(country_code: str) -> bool:
+    return country_code.upper() in MAINSTREAM_COUNTRY_CODES
+
+
+def exact_city_disambiguation_bonus(city_name_norm: str, country_code: str, time_zone_id: str) -> int:
+    key = f"{city_name_norm.lower()}|{country_code.upper()}"
+    preferred_zone = PREFERRED_ZONE_BY_CITY_COUNTRY.get(key)
+    if preferred_zone is None:
+        return 0
+    return 160 if time_zone_id == preferred_zone else -45
+
+
+# -- CityPickerEngine -------------------------------------------------------
+
+_FOLD_MAP: Dict[str, str] = {
+    "à": "a",
+    "á": "a",
+    "â": "a",
+    "ã": "a",
+    "ä": "a",
+    "å": "a",
+    "ç": "c",
+    "è": "e",
+    "é": "e",
+    "ê": "e",
+    "ë": "e",
+    "ì": "i",
+    "í": "i",
+    "î": "i",
+    "ï": "i",
+    "ñ": "n",
+    "ò": "o",
+    "ó": "o",
+    "ô": "o",
+    "õ": "o",
+    "ö": "o",
+    "ù": "u",
+    "ú": "u",
+    "û": "u",
+    "ü": "u",
+    "ý": "y",
+    "ÿ": "y",
+    "À": "A",
+    "Á": "A",
+    "Â": "A",
+    "Ã": "A",
+    "Ä": "A",
+    "Å": "A",
+    "Ç": "C",
+    "È": "E",
+    "É": "E",
+    "Ê": "E",
+    "Ë": "E",
+    "Ì": "I",
+    "Í": "I",
+    "Î": "I",
+    "Ï": "I",
+    "Ñ": "N",
+    "Ò": "O",
+    "Ó": "O",
+    "Ô": "O",
+    "Õ": "O",
+    "Ö": "O",
+    "Ù": "U",
+    "Ú": "U",
+    "Û": "U",
+    "Ü": "U",
+    "Ý": "Y",
+}
+_FOLD_TABLE = str.maketrans(_FOLD_MAP)
+# Dart's `\d` and `[A-Za-z0-9]` are ASCII-only; spell them out so Python's
+# Unicode-aware classes do not widen the match.
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_SPACE_RE = re.compile(r"\s+")
+_DIGIT_RE = re.compile(r"[0-9]")
+_LEADING_SYMBOL_RE = re.compile(r"^[^A-Za-z0-9]")
+_MULTI_DIGIT_RE = re.compile(r"[0-9]{2,}")
+
+
+def fold_diacritics(s: str) -> str:
+    return s.translate(_FOLD_TABLE)
+
+
+def normalize_query(s: str) -> str:
+    s = s.strip()
+    if not s:
+        return ""
+    s = fold_diacritics(s).lower()
+    s = _NON_ALNUM_RE.sub(" ", s)
+    return _SPACE_RE.sub(" ", s).strip()
+
+
+def tokenize(query: str) -> List[str]:
+    raw = [t for t in query.split(" ") if t.strip()]
+    if len(raw) >= 2 and all(len(t) == 1 for t in raw):
+        return ["".join(raw)]
+    return raw
+
+
+def has_token_boundary(haystack: str, token: str) -> bool:
+    return haystack.startswith(token) or f" {token}" in haystack
+
+
+def continent_name(code: Optional[str]) -> str:
+    return {
+        "NA": "north america",
+        "SA": "south america",
+        "EU": "europe",
+        "AF": "africa",
+        "AS": "asia",
+        "OC": "oceania",
+    }.get((code or "").upper(), "")
+
+
+def _is_low_signal(city_raw: str) -> bool:
+    clean = city_raw.strip()
+    if not clean:
+        return True
+    if _LEADING_SYMBOL_RE.search(clean):
+        return True
+    return _MULTI_DIGIT_RE.search(clean) is not None
+
+
+def _looks_like_time_zone_query(raw_query: str) -> bool:
+    q = raw_query.strip().lower()
+    if not q:
+        return False
+    return "/" in q or "_" in q or "utc" in q or "gmt" in q
+
+
+@dataclass(frozen=True)
+class Entry(Generic[T]):
+    value: T
+    key: str
+    city_name_norm: str
+    country_norm: str
+    country_code: str
+    time_zone_id: str
+    time_zone_norm: str
+    search_text: str
+    low_signal: bool
+    base_score: int
+
+    @property
+    def city_country_search(self) -> str:
+        return f"{self.city_name_norm} {self.country_norm} {self.country_code.lower()}"
+
+
+def build_entries(
+    items: Iterable[T],
+    key_of: Callable[[T], str],
+    city_name_of: Callable[[T], str],
+    country_code_of: Callable[[T], str],
+    country_name_of: Callable[[T], str],
+    time_zone_id_of: Callable[[T], str],
+    extra_search_terms_of: Optional[Callable[[T], Iterable[str]]] = None,
+    is_curated: Optional[Callable[[T], bool]] = None,
+    mainstream_country_bonus: int = 60,
+) -> List[Entry[T]]:
+    out: List[Entry[T]] = []
+    for item in items:
+        key = key_of(item).strip().lower()
+        if not key:
+            continue
+        city_raw = city_name_of(item)
+        city_norm = normalize_query(city_raw)
+        if not city_norm:
+            continue
+        country_code = country_code_of(item).strip().upper()
+        country_norm = normalize_query(country_name_of(item))
+        time_zone_id = time_zone_id_of(item).strip()
+        time_zone_norm = normalize_query(time_zone_id)
+        low_signal = _is_low_signal(city_raw)
+        base_score = 0
+        if is_curated is not None and is_curated(item):
+            base_score += 260
+        if time_zone_id:
+            base_score += hub_priority_bonus(time_zone_id)
+        if is_mainstream_country_code(country_code):
+            base_score += mainstream_country_bonus
+        if low_signal:
+            base_score -= 120
+        if _DIGIT_RE.search(city_raw):
+            base_score -= 35
+        base_score -= len(city_norm) // 4
+
+        parts = [city_raw, country_code, country_name_of(item)]
+        if time_zone_id:
+            parts.append(time_zone_id)
+        if extra_search_terms_of is not None:
+            parts.extend(extra_search_terms_of(item))
+        out.append(
+            Entry(
+                value=item,
+                key=key,
+                city_name_norm=city_norm,
+                country_norm=country_norm,
+                country_code=country_code,
+                time_zone_id=time_zone_id,
+                time_zone_norm=time_zone_norm,
+                search_text=normalize_query(" ".join(parts)),
+                low_signal=low_signal,
+                base_score=base_score,
+            )
+        )
+    return out
+
+
+def sort_by_base_score(entries: Sequence[Entry[T]]) -> List[Entry[T]]:
+    return sorted(entries, key=lambda e: (-e.base_score, e.city_name_norm))
+
+
+def top_entries(
+    ranked_entries: Sequence[Entry[T]],
+    limit: int = 24,
+    preferred_time_zone_ids: Set[str] = frozenset(),
+    dedupe_by_time_zone: bool = True,
+    dedupe_by_city_token: bool = True,
+    include_low_signal: bool = False,
+) -> List[Entry[T]]:
+    out: List[Entry[T]] = []
+    seen_zones: Set[str] = set()
+    seen_city_tokens: Set[str] = set()
+
+    def accept(row: Entry[T], is_preferred: bool) -> None:
+        if not include_low_signal and not is_preferred and row.low_signal:
+            return
+        if dedupe_by_time_zone and row.time_zone_id:
+            if row.time_zone_id in seen_zones:
+                return
+            seen_zones.add(row.time_zone_id)
+        if dedupe_by_city_token:
+            token = row.city_name_norm.replace(" ", "")
+            if token:
+                if token in seen_city_tokens:
+                    return
+                seen_city_tokens.add(token)
+        out.append(row)
+
+    for row in ranked_entries:
+        if len(out) >= limit:
+            break
+        if row.time_zone_id not in preferred_time_zone_ids:
+            continue
+        accept(row, True)
+    for row in ranked_entries:
+        if len(out) >= limit:
+            break
+        if row.time_zone_id in preferred_time_zone_ids:
+            continue
+        accept(row, False)
+    return out
+
+
+@dataclass(frozen=True)
+class SearchOptions:
+    preferred_time_zone_ids: frozenset = frozenset()
+    alias_time_zone_ids: frozenset = frozenset()
+    max_candidates: int = 220
+    max_results: int = 100
+    short_query_allows_time_zone_prefix: bool = False
+    dedupe_by_time_zone: bool = False
+    dedupe_by_city_country: bool = False
+    allow_time_zone_only_matches: bool = True
+    deprioritize_time_zone_only_matches: bool = True
+
+
+# The city picker wizard's engine options (`CityPicker._filter`); see
+# `wizard_search` for the full call, which also normalizes the query first.
+WIZARD_SEARCH = SearchOptions(
+    max_candidates=220,
+    max_results=100,
+    dedupe_by_time_zone=False,
+    dedupe_by_city_country=True,
+    allow_time_zone_only_matches=False,
+)
+
+
+def _query_includes_country_hint(query: str, row: Entry) -> bool:
+    if not query:
+        return False
+    cc = row.country_code.lower()
+    if cc and (query == cc or query.endswith(f" {cc}") or query.startswith(f"{cc} ")):
+        return True
+    cn = row.country_norm
+    return query == cn or query.endswith(f" {cn}") or query.startswith(f"{cn} ")
+
+
+def _score_row(
+    row: Entry,
+    query: str,
+    query_raw: str,
+    tokens: List[str],
+    short_query: bool,
+    opts: SearchOptions,
+) -> Optional[int]:
+    """Score one row, or None when `searchEntries` would skip it."""
+    matches_city_country = all(t in row.city_country_search for t in tokens)
+    matches_time_zone = bool(row.time_zone_norm) and all(t in row.time_zone_norm for t in tokens)
+    matches_alias = row.time_zone_id in opts.alias_time_zone_ids
+    if not matches_city_country and not matches_alias:
+        if not opts.allow_time_zone_only_matches or not matches_time_zone:
+            return None
+
+    if (
+        short_query
+        and not matches_alias
+        and not has_token_boundary(row.city_name_norm, query)
+        and not row.city_name_norm.startswith(query)
+        and not has_token_boundary(row.country_norm, query)
+        and not row.country_norm.startswith(query)
+        and not (
+            opts.short_query_allows_time_zone_prefix
+            and row.time_zone_id.lower().startswith(query_raw.lower())
+        )
+    ):
+        return None
+
+    score = row.base_score
+    if row.time_zone_id in opts.preferred_time_zone_ids:
+        score += 260
+    if matches_alias:
+        score += 220
+    if row.city_name_norm.startswith(query):
+        score += 180
+    if f" {query}" in row.city_name_norm:
+        score += 100
+    if query == row.city_name_norm:
+        score += 280
+        if query in row.time_zone_norm:
+            score += 60
+        score += exact_city_disambiguation_bonus(row.city_name_norm, row.country_code, row.time_zone_id)
+    if _query_includes_country_hint(query, row):
+        score += 90
+    if row.country_norm.startswith(query) or f" {query}" in row.country_norm:
+        score += 70
+    if query_raw.lower() in row.time_zone_id.lower():
+        score += 50
+    if (
+        opts.deprioritize_time_zone_only_matches
+        and matches_time_zone
+        and not matches_city_country
+        and not _looks_like_time_zone_query(query_raw)
+    ):
+        score -= 140
+    if len(tokens) >= 2 and row.city_name_norm != query and query in row.city_name_norm:
+        extra_length = len(row.city_name_norm) - len(query)
+        if extra_length > 0:
+            score -= min(140, extra_length * 8)
+    return score
+
+
+def _finish(scored: List[Tuple[Entry[T], int]], opts: SearchOptions) -> List[Entry[T]]:
+    scored.sort(key=lambda rs: (-rs[1], rs[0].city_name_norm))
+    out: List[Entry[T]] = []
+    seen_keys: Set[str] = set()
+    seen_zones: Set[str] = set()
+    seen_city_country: Set[str] = set()
+    for row, _ in scored:
+        if len(out) >= opts.max_results:
+            break
+        if row.key in seen_keys:
+            continue
+        seen_keys.add(row.key)
+        if opts.dedupe_by_time_zone and row.time_zone_id:
+            if row.time_zone_id in seen_zones:
+                continue
+            seen_zones.add(row.time_zone_id)
+        if opts.dedupe_by_city_country:
+            city_country_key = f"{row.city_name_norm}|{row.country_code.lower()}"
+            if city_country_key in seen_city_country:
+                continue
+            seen_city_country.add(city_country_key)
+        out.append(row)
+    return out
+
+
+def search_entries(
+    entries: Sequence[Entry[T]],
+    query_raw: str,
+    opts: SearchOptions = SearchOptions(),
+) -> List[Entry[T]]:
+    """Literal port of `CityPickerEngine.searchEntries` (linear scan)."""
+    query = normalize_query(query_raw)
+    if not query:
+        return []
+    tokens = tokenize(query)
+    short_query = len(query) <= 3
+    scored: List[Tuple[Entry[T], int]] = []
+    for row in entries:
+        score = _score_row(row, query, query_raw, tokens, short_query, opts)
+        if score is None:
+            continue
+        scored.append((row, score))
+        if len(scored) >= opts.max_candidates:
+            break
+    return _finish(scored, opts)
+
+
+_GRAM = 3
+
+
+def _grams(text: str) -> Set[str]:
+    out: Set[str] = set()
+    for n in range(1, _GRAM + 1):
+        for i in range(len(text) - n + 1):
+            out.add(text[i : i + n])
+    return out
+
+
+def _boundary_grams(text: str) -> Set[str]:
+    out: Set[str] = set()
+    for i in range(len(text)):
+        if i == 0 or text[i - 1] == " ":
+            for n in range(1, _GRAM + 1):
+                if i + n <= len(text):
+                    out.add(text[i : i + n])
+    return out
+
+
+def _token_grams(token: str) -> List[str]:
+    if len(token) <= _GRAM:
+        return [token]
+    return [token[i : i + _GRAM] for i in range(len(token) - _GRAM + 1)]
+
+
+class SearchIndex(Generic[T]):
+    """Postings over a fixed entry list for `search_entries`-identical search.
+
+    `city_grams` / `zone_grams` map every 1..3 character substring of the
+    city+country search string / normalized time zone to the ascending entry
+    positions containing it. A token can only be contained in rows that hold
+    all of its grams, so the rarest gram's postings bound the candidates;
+    each candidate is then scored with the same code as the linear scan.
+
+    Queries of three characters or fewer must also start a word of the city
+    or country name (unless a time-zone alias or prefix lets them through);
+    `boundary_grams` holds exactly those prefixes, which is a far smaller
+    pool than the raw substring postings for one- and two-letter queries.
+    """
+
+    def __init__(self, entries: Sequence[Entry[T]]) -> None:
+        self.entries = list(entries)
+        self.city_grams: Dict[str, array] = {}
+        self.zone_grams: Dict[str, array] = {}
+        self.boundary_grams: Dict[str, array] = {}
+        self.by_zone: Dict[str, array] = {}
+        zone_grams_cache: Dict[str, Set[str]] = {}
+        for pos, row in enumerate(self.entries):
+            for g in _grams(row.city_country_search):
+                self._post(self.city_grams, g, pos)
+            for g in _boundary_grams(row.city_name_norm) | _boundary_grams(row.country_norm):
+                self._post(self.boundary_grams, g, pos)
+            if row.time_zone_norm:
+                grams = zone_grams_cache.get(row.time_zone_norm)
+                if grams is None:
+                    grams = zone_grams_cache[row.time_zone_norm] = _grams(row.time_zone_norm)
+                for g in grams:
+                    self._post(self.zone_grams, g, pos)
+            self._post(self.by_zone, row.time_zone_id, pos)
+
+    @staticmethod
+    def _post(postings: Dict[str, array], key: str, pos: int) -> None:
+        bucket = postings.get(key)
+        if bucket is None:
+            bucket = postings[key] = array("I")
+        bucket.append(pos)
+
+    @staticmethod
+    def _rarest(postings: Dict[str, array], tokens: List[str]) -> Sequence[int]:
+        best: Optional[Sequence[int]] = None
+        for token in tokens:
+            for g in _token_grams(token):
+                hits = postings.get(g)
+                if hits is None:
+                    return ()
+                if best is None or len(hits) < len(best):
+                    best = hits
+        return best if best is not None else ()
+
+    def candidates(self, query: str, tokens: List[str], opts: SearchOptions) -> List[int]:
+        if len(query) <= 3 and not opts.short_query_allows_time_zone_prefix:
+            pools: List[Sequence[int]] = [self.boundary_grams.get(query, ())]
+        else:
+            pools = [self._rarest(self.city_grams, tokens)]
+            if opts.allow_time_zone_only_matches:
+                pools.append(self._rarest(self.zone_grams, tokens))
+        for zone in opts.alias_time_zone_ids:
+            pools.append(self.by_zone.get(zone, ()))
+        if len(pools) == 1:
+            return list(pools[0])
+        merged: Set[int] = set()
+        for pool in pools:
+            merged.update(pool)
+        return sorted(merged)
+
+    def search(self, query_raw: str, opts: SearchOptions = SearchOptions()) -> List[Entry[T]]:
+        query = normalize_query(query_raw)
+        if not query:
+            return []
+        tokens = tokenize(query)
+        short_query = len(query) <= 3
+        scored: List[Tuple[Entry[T], int]] = []
+        entries = self.entries
+        for pos in self.candidates(query, tokens, opts):
+            row = entries[pos]
+            score = _score_row(row, query, query_raw, tokens, short_query, opts)
+            if score is None:
+                continue
+            scored.append((row, score))
+            if len(scored) >= opts.max_candidates:
+                break
+        return _finish(scored, opts)
+
+
+# -- Wizard surface -----------------------------------------------------------
+
+_COUNTRY_ALIAS_TERMS: Dict[str, List[str]] = {
+    "US": ["USA", "UNITED STATES", "U S"],
+    "BR": ["BRAZIL", "BRASIL"],
+    "GB": ["UK", "UNITED KINGDOM", "GREAT BRITAIN"],
+    "ES": ["SPAIN", "ESPANA", "ESPAÑA"],
+    "DE": ["GERMANY", "DEUTSCHLAND"],
+    "PT": ["PORTUGAL", "PORTUGUES", "PORTUGUÊS"],
+}
+
+
+def wizard_entries(records: Iterable[dict], curated_ids: Iterable[str] = ()) -> List[Entry[dict]]:
+    """Entries as `CityPicker._buildIndexData` builds them, ranked by base score.
+
+    `records` are dataset rows (JSON dicts). Currency symbols are left out of
+    the extra search terms; `searchText` is not consulted by search or top
+    entries, so results are unaffected.
+    """
+    curated = set(curated_ids)
+
+    def extra_terms(r: dict) -> List[str]:
+        cc = str(r["countryCode"]).upper()
+        terms = [
+            r.get("iso3") or "",
+            r.get("admin1Name") or "",
+            r.get("admin1Code") or "",
+            r.get("continent") or "",
+            continent_name(r.get("continent")),
+            r["currencyCode"],
+        ]
+        terms.extend(_COUNTRY_ALIAS_TERMS.get(cc, ()))
+        if "porto" in str(r["cityName"]).lower():
+            terms.extend(["OPORTO", "O PORTO"])
+        return terms
+
+    return sort_by_base_score(
+        build_entries(
+            records,
+            key_of=lambda r: r["id"],
+            city_name_of=lambda r: r["cityName"],
+            country_code_of=lambda r: r["countryCode"],
+            country_name_of=lambda r: r.get("countryName") or r["countryCode"],
+            time_zone_id_of=lambda r: r["timeZoneId"],
+            extra_search_terms_of=extra_terms,
+            is_curated=lambda r: r["id"] in curated,
+            mainstream_country_bonus=60,
+        )
+    )
+
+
+def wizard_search(
+    entries_or_index: Union[Sequence[Entry[T]], SearchIndex[T]],
+    query: str,
+) -> List[Entry[T]]:
+    """Search the way `CityPicker._filter` does.
+
+    The wizard normalizes what the user typed before calling the engine, so
+    the engine's raw-query checks (time-zone prefix, time-zone substring
+    bonus, time-zone-shaped query) see the normalized text. An empty query
+    returns no rows; the wizard shows its default top cities instead.
+    """
+    q = normalize_query(query)
+    if isinstance(entries_or_index, SearchIndex):
+        return entries_or_index.search(q, WIZARD_SEARCH)
+    return search_entries(entries_or_index, q, WIZARD_SEARCH)
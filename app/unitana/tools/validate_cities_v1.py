@@ -1,16 +1,45 @@
 #!/usr/bin/env python3
-"""Validate the canonical city dataset contract."""
+"""Validate the canonical city dataset contract.
+
+Usage (from app/unitana):
+  python3 tools/validate_cities_v1.py
+  python3 tools/validate_cities_v1.py --incremental
+
+Accepts the v1 array and the schema v2 object (`unitana_cities.schema`). v2
+rows are checked in their expanded v1 form, after the side tables themselves.
+
+`--incremental` keeps a sidecar cache with the whole-file digest and its last
+verdict, plus a hash of each record's raw bytes and its last validation
+result. An unchanged file returns the cached verdict without decoding. After
+an edit the file is split into record byte ranges at the generator's `},{`
+separators without decoding it; only records whose bytes are new are decoded
+and re-checked. Dataset invariants (non-empty, unique ids) are recomputed
+from the cached per-record summaries, so the verdict always matches a full
+run. A file in any other layout (pretty-printed, non-object rows) is
+validated in full. Bump `RULES_VERSION` whenever row rules or dataset
+invariants change to invalidate old caches; the cache is also keyed on the
+time zone database version, and for v2 files on the side tables, since row
+verdicts depend on them.
+"""
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
+import os
 import re
+import time
+import zoneinfo
+from importlib import metadata
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
+from unitana_cities.schema import COUNTRY_FIELDS, SCHEMA_VERSION, expand_row, is_v2
 
+
+RULES_VERSION = 3
 REQUIRED_FIELDS = [
     "id",
     "cityName",
@@ -25,6 +54,14 @@ REQUIRED_FIELDS = [
 _ALPHA2 = re.compile(r"^[A-Z]{2}$")
 _ALPHA3 = re.compile(r"^[A-Z]{3}$")
 _TZ_CACHE: Dict[str, bool] = {}
+_CITIES_KEY_RE = re.compile(rb'"cities"\s*:\s*\[')
+
+# v2 side tables: (countries, timeZones).
+SideTables = Tuple[Dict[str, Dict[str, Any]], List[str]]
+
+# Per-record summary: (id used in messages, or None for non-object rows;
+# id key for dataset invariants; row errors).
+RowSummary = Tuple[Optional[str], Optional[str], List[str]]
 
 
 def _is_known_timezone(tz_id: str) -> bool:
@@ -42,7 +79,7 @@ def _is_known_timezone(tz_id: str) -> bool:
         return False
 
 
-def _validate_row(row: Dict[str, Any], idx: int) -> List[str]:
+def _row_errors(row: Dict[str, Any]) -> List[str]:
     errors: List[str] = []
 
     for field in REQUIRED_FIELDS:
@@ -79,9 +116,331 @@ def _validate_row(row: Dict[str, Any], idx: int) -> List[str]:
     if not isinstance(lon, (int, float)) or not -180 <= float(lon) <= 180:
         errors.append("invalid longitude")
 
-    if errors:
-        return [f"row {idx} ({row.get('id', 'missing-id')}): {', '.join(errors)}"]
-    return []
+    label = row.get("disambiguationLabel")
+    if label is not None and (not isinstance(label, str) or not label.strip()):
+        errors.append("invalid disambiguationLabel")
+    for field in ("preferredInNameCluster", "preferredInCountryCluster"):
+        if field in row and not isinstance(row[field], bool):
+            errors.append(f"invalid {field}")
+
+    return errors
+
+
+def _country_entry_errors(entry: Dict[str, Any]) -> List[str]:
+    errors: List[str] = []
+    for field in sorted(set(entry) - set(COUNTRY_FIELDS)):
+        errors.append(f"unexpected field {field}")
+    for field in ("countryName", "iso3", "continent"):
+        if field in entry and (not isinstance(entry[field], str) or not entry[field].strip()):
+            errors.append(f"invalid {field}")
+    if "currencyCode" in entry and not (
+        isinstance(entry["currencyCode"], str) and _ALPHA3.match(entry["currencyCode"].strip().upper())
+    ):
+        errors.append("currencyCode must be ISO-4217 alpha-3")
+    if "defaultUnitSystem" in entry and entry["defaultUnitSystem"] not in {"metric", "imperial"}:
+        errors.append("invalid defaultUnitSystem")
+    if "defaultUse24h" in entry and not isinstance(entry["defaultUse24h"], bool):
+        errors.append("invalid defaultUse24h")
+    return errors
+
+
+def _side_table_errors(doc: Dict[str, Any]) -> List[str]:
+    """Structural errors in a v2 document's `countries` and `timeZones`."""
+    errors: List[str] = []
+    countries = doc.get("countries")
+    if not isinstance(countries, dict):
+        errors.append("countries: expected object")
+    else:
+        for cc, entry in countries.items():
+            if not _ALPHA2.match(cc):
+                errors.append(f"countries.{cc}: key must be ISO-3166 alpha-2")
+            if not isinstance(entry, dict):
+                errors.append(f"countries.{cc}: expected object")
+                continue
+            entry_errors = _country_entry_errors(entry)
+            if entry_errors:
+                errors.append(f"countries.{cc}: {', '.join(entry_errors)}")
+    time_zones = doc.get("timeZones")
+    if not isinstance(time_zones, list):
+        errors.append("timeZones: expected array")
+    else:
+        seen: Dict[str, int] = {}
+        for i, tz in enumerate(time_zones):
+            if not isinstance(tz, str) or not _is_known_timezone(tz.strip()):
+                errors.append(f"timeZones[{i}]: not a known IANA timezone")
+            elif seen.setdefault(tz, i) != i:
+                errors.append(f"timeZones[{i}]: duplicate of timeZones[{seen[tz]}]")
+    if not isinstance(doc.get("cities"), list):
+        errors.append("cities: expected array")
+    return errors
+
+
+def _tables(doc: Dict[str, Any]) -> SideTables:
+    countries = doc.get("countries")
+    time_zones = doc.get("timeZones")
+    return (
+        countries if isinstance(countries, dict) else {},
+        time_zones if isinstance(time_zones, list) else [],
+    )
+
+
+def _v2_row_errors(row: Dict[str, Any], time_zones: List[str]) -> List[str]:
+    errors: List[str] = []
+    if "timeZoneId" in row:
+        errors.append("timeZoneId must be interned as timeZoneIndex")
+    index = row.get("timeZoneIndex")
+    if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < len(time_zones):
+        errors.append("invalid timeZoneIndex")
+    return errors
+
+
+def _summarize_row(item: Any, tables: Optional[SideTables] = None) -> RowSummary:
+    if not isinstance(item, dict):
+        return (None, None, ["expected object"])
+    raw_id = item.get("id")
+    id_key = raw_id.strip() if isinstance(raw_id, str) and raw_id.strip() else None
+    if tables is None:
+        errors = _row_errors(item)
+    else:
+        countries, time_zones = tables
+        errors = _v2_row_errors(item, time_zones)
+        errors += [e for e in _row_errors(expand_row(item, countries, time_zones)) if e not in errors]
+    return (str(item.get("id", "missing-id")), id_key, errors)
+
+
+def _format_row(idx: int, summary: RowSummary) -> List[str]:
+    message_id, _, errors = summary
+    if not errors:
+        return []
+    if message_id is None:
+        return [f"row {idx}: {', '.join(errors)}"]
+    return [f"row {idx} ({message_id}): {', '.join(errors)}"]
+
+
+def _validate_row(row: Dict[str, Any], idx: int) -> List[str]:
+    return _format_row(idx, _summarize_row(row))
+
+
+def _dataset_errors(id_keys: List[Optional[str]]) -> List[str]:
+    errors: List[str] = []
+    if not id_keys:
+        errors.append("dataset is empty")
+    first_row: Dict[str, int] = {}
+    for idx, id_key in enumerate(id_keys):
+        if id_key is None:
+            continue
+        seen = first_row.setdefault(id_key, idx)
+        if seen != idx:
+            errors.append(f"row {idx} ({id_key}): duplicate id (first seen at row {seen})")
+    return errors
+
+
+def _collect_errors(summaries: List[RowSummary], table_errors: Optional[List[str]] = None) -> List[str]:
+    errors: List[str] = list(table_errors or [])
+    for idx, summary in enumerate(summaries):
+        errors.extend(_format_row(idx, summary))
+    errors.extend(_dataset_errors([id_key for _, id_key, _ in summaries]))
+    return errors
+
+
+def _parse_doc(raw: Any, path: Path) -> Tuple[List[Any], Optional[SideTables], List[str]]:
+    """(rows, v2 side tables or None for v1, side-table errors)."""
+    if isinstance(raw, list):
+        return raw, None, []
+    if not is_v2(raw):
+        raise SystemExit(f"Dataset must be a JSON array or a schema v{SCHEMA_VERSION} object: {path}")
+    cities = raw.get("cities") if isinstance(raw.get("cities"), list) else []
+    return cities, _tables(raw), _side_table_errors(raw)
+
+
+def _parse(path: Path) -> Tuple[List[Any], Optional[SideTables], List[str]]:
+    return _parse_doc(json.loads(path.read_text(encoding="utf-8")), path)
+
+
+def validate_full(path: Path) -> Tuple[List[str], int]:
+    rows, tables, table_errors = _parse(path)
+    summaries = [_summarize_row(item, tables) for item in rows]
+    return _collect_errors(summaries, table_errors), len(rows)
+
+
+def _pack_summary(summary: RowSummary) -> Any:
+    """Cache form of a summary: the bare id for a clean row, else a list."""
+    message_id, id_key, errors = summary
+    if not errors and message_id is not None and message_id == id_key:
+        return message_id
+    return [message_id, id_key, errors]
+
+
+def _unpack_summary(entry: Any) -> RowSummary:
+    if isinstance(entry, str):
+        return (entry, entry, [])
+    return (entry[0], entry[1], entry[2])
+
+
+def _tzdata_version() -> str:
+    """Identify the time zone database `ZoneInfo` reads (system first, then
+    the `tzdata` package), so an upgrade invalidates cached verdicts."""
+    parts: List[str] = []
+    for root in zoneinfo.TZPATH:
+        for name in ("tzdata.zi", "+VERSION"):
+            try:
+                with open(os.path.join(root, name), encoding="utf-8") as f:
+                    parts.append(f"{root}/{name}:{f.readline().strip()}")
+                break
+            except OSError:
+                continue
+    try:
+        parts.append(f"tzdata=={metadata.version('tzdata')}")
+    except metadata.PackageNotFoundError:
+        pass
+    return ";".join(parts)
+
+
+def _file_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _split_rows(data: bytes) -> Optional[Tuple[List[bytes], bytes]]:
+    """Split the cities array into raw record bodies without decoding it.
+
+    Returns (each record's bytes between its braces, the document with an
+    empty cities array), or None when the array is not a run of objects
+    separated by exactly `},{`. A split that lands inside a string leaves an
+    unterminated string, so such a body never decodes and is never cached.
+    """
+    head = data[:64].lstrip()
+    if head.startswith(b"["):
+        open_at = data.index(b"[")
+    elif head.startswith(b"{"):
+        m = _CITIES_KEY_RE.search(data)
+        if m is None:
+            return None
+        open_at = m.end() - 1
+    else:
+        return None
+    body_start = open_at + 1
+    stripped = data[body_start:].lstrip()
+    if stripped.startswith(b"]"):
+        close_at = len(data) - len(stripped)
+        return [], data[:body_start] + data[close_at:]
+    close_at = data.find(b"}]", body_start)
+    if close_at < 0 or not stripped.startswith(b"{"):
+        return None
+    first = len(data) - len(stripped) + 1
+    bodies = data[first:close_at].split(b"},{")
+    return bodies, data[:body_start] + data[close_at + 1 :]
+
+
+def _load_cache(cache_path: Path, tz_version: str) -> Dict[str, Any]:
+    try:
+        cached = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cached, dict) or cached.get("rulesVersion") != RULES_VERSION:
+        return {}
+    if cached.get("tzdataVersion") != tz_version or not isinstance(cached.get("records"), dict):
+        return {}
+    return cached
+
+
+def _write_cache(cache_path: Path, cache: Dict[str, Any]) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(cache, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, cache_path)
+
+
+def _check_bodies(
+    bodies: List[bytes],
+    tables: Optional[SideTables],
+    records: Dict[str, Any],
+) -> Optional[Tuple[List[Any], Dict[str, Any], int]]:
+    """(cache entry per row, entries to keep, rows re-checked), or None if a
+    new body does not decode to an object."""
+    salt = b""
+    if tables is not None:
+        # Every v2 row's verdict depends on the side tables.
+        salt = hashlib.blake2b(
+            json.dumps(list(tables), sort_keys=True).encode("utf-8"), digest_size=16
+        ).digest()
+    blake2b = hashlib.blake2b
+    fresh: Dict[str, Any] = {}
+    entries: List[Any] = []
+    rechecked = 0
+    for body in bodies:
+        key = blake2b(salt + body, digest_size=16).hexdigest()
+        entry = fresh.get(key)
+        if entry is None:
+            entry = records.get(key)
+            if entry is None:
+                try:
+                    item = json.loads(b"{" + body + b"}")
+                except ValueError:
+                    return None
+                entry = _pack_summary(_summarize_row(item, tables))
+                rechecked += 1
+            fresh[key] = entry
+        entries.append(entry)
+    return entries, fresh, rechecked
+
+
+def validate_incremental(path: Path, cache_path: Path) -> Tuple[List[str], int, int]:
+    """Validate using the sidecar cache. Returns (errors, records, rechecked).
+
+    An unchanged file (same whole-file digest) returns the cached verdict
+    without parsing. Otherwise each record is keyed by a hash of its raw
+    bytes and only unseen records are decoded and checked; a file that cannot
+    be split that way gets a full run.
+    """
+    data = path.read_bytes()
+    file_digest = _file_digest(data)
+    tz_version = _tzdata_version()
+    cached = _load_cache(cache_path, tz_version)
+    if cached.get("fileDigest") == file_digest and isinstance(cached.get("errors"), list):
+        return list(cached["errors"]), int(cached["count"]), 0
+
+    checked = None
+    split = _split_rows(data)
+    if split is not None:
+        bodies, outer = split
+        try:
+            doc = json.loads(outer)
+        except ValueError:
+            doc = None
+        # `outer` must be the same document with only the rows taken out.
+        if (isinstance(doc, list) and not doc) or (isinstance(doc, dict) and doc.get("cities") == []):
+            _, tables, table_errors = _parse_doc(doc, path)
+            checked = _check_bodies(bodies, tables, cached.get("records", {}))
+
+    if checked is None:
+        rows, tables, table_errors = _parse(path)
+        summaries = [_summarize_row(item, tables) for item in rows]
+        entries, fresh, rechecked = [_pack_summary(s) for s in summaries], {}, len(rows)
+    else:
+        entries, fresh, rechecked = checked
+
+    # Clean rows are cached as their bare id; only the rest need formatting.
+    errors = list(table_errors)
+    for idx, entry in enumerate(entries):
+        if not isinstance(entry, str):
+            errors.extend(_format_row(idx, _unpack_summary(entry)))
+    errors.extend(_dataset_errors([e if isinstance(e, str) else e[1] for e in entries]))
+    _write_cache(
+        cache_path,
+        {
+            "rulesVersion": RULES_VERSION,
+            "tzdataVersion": tz_version,
+            "fileDigest": file_digest,
+            "errors": errors,
+            "count": len(entries),
+            "records": fresh,
+        },
+    )
+    return errors, len(entries), rechecked
+
+
+def _default_cache_path(input_path: Path) -> Path:
+    return Path(".dart_tool") / "unitana_tools" / f"{input_path.name}.validation_cache.json"
 
 
 def main() -> None:
@@ -91,19 +450,27 @@ def main() -> None:
         default="assets/data/cities_v1.json",
         help="Path to city dataset JSON asset",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-check only records whose content changed since the last run",
+    )
+    parser.add_argument(
+        "--cache",
+        default="",
+        help="Sidecar cache path for --incremental (default: .dart_tool/unitana_tools/<input>.validation_cache.json)",
+    )
     args = parser.parse_args()
 
     path = Path(args.input).expanduser()
-    raw = json.loads(path.read_text(encoding="utf-8"))
-    if not isinstance(raw, list):
-        raise SystemExit(f"Dataset must be a JSON array: {path}")
-
-    errors: List[str] = []
-    for idx, item in enumerate(raw):
-        if not isinstance(item, dict):
-            errors.append(f"row {idx}: expected object")
-            continue
-        errors.extend(_validate_row(item, idx))
+    start = time.perf_counter()
+    if args.incremental:
+        cache_path = Path(args.cache).expanduser() if args.cache else _default_cache_path(path)
+        errors, count, rechecked = validate_incremental(path, cache_path)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        print(f"Incremental: re-checked {rechecked} of {count} records in {elapsed_ms:.0f} ms ({cache_path})")
+    else:
+        errors, count = validate_full(path)
 
     if errors:
         print("City dataset validation failed.")
@@ -111,7 +478,7 @@ def main() -> None:
             print(f"- {e}")
         raise SystemExit(1)
 
-    print(f"City dataset validation passed: {len(raw)} records.")
+    print(f"City dataset validation passed: {count} records.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""Content-addressed, deduplicated storage for patch zips.
+
+Usage:
+  python3 docs/tools/patch_store.py ingest [ZIP ...] [--jobs N] [--prune]
+  python3 docs/tools/patch_store.py rebuild unitana_patch_p0_p1_2026-02-05.zip --out /tmp
+  python3 docs/tools/patch_store.py verify
+  python3 docs/tools/patch_store.py report
+
+With no ZIP arguments, `ingest` picks up every registered archive
+(`docs/patches/YYYY-MM-DD/*.zip`) plus `unitana_patch_*.zip` at the repo root.
+
+What it does:
+- Splits each zip into member payloads and a "frame" (local headers, data
+  descriptors, central directory, end record). Every member is stored once
+  under `docs/patches/store/objects/` keyed by the SHA-256 of its
+  uncompressed content, so an unchanged file shared by consecutive patches
+  costs one blob.
+- Writes one small manifest per zip to `docs/patches/store/manifests/`
+  recording, for each member, the blob and how to re-encode it.
+- Deflated members are re-encoded with zlib at the level that reproduces the
+  original stream. A stream that no zlib level reproduces (other deflate
+  implementations pick different matches on larger inputs) is stored
+  verbatim under the hash of the stream itself, so rebuilds stay exact.
+- Hashes and re-encodes members in a thread pool; zlib and hashlib release
+  the GIL, so this scales with cores without pickling payloads.
+- Rebuilds the zip before writing its manifest and refuses to record one
+  whose SHA-256 differs from the original. Re-ingesting a zip that already
+  has a manifest checks that it still rebuilds (and repairs the store if
+  not). `--prune` deletes a source only after one of those checks passes.
+- `report` prints the deduplication ratio over every manifest in the store.
+
+Blobs are zlib-compressed at rest, like git loose objects, so store size is
+comparable with the zips it replaces. Savings need shared files: archives
+with little overlap cost more in the store than as zips (per-blob overhead,
+verbatim streams and manifests).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+MANIFEST_VERSION = 1
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+PATCHES_DIR = REPO_ROOT / "docs" / "patches"
+DEFAULT_STORE = PATCHES_DIR / "store"
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_LOCAL_SIG = 0x04034B50
+_EOCD_SIG = b"PK\x05\x06"
+_CENTRAL_SIG = 0x02014B50
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+
+# zlib's default level first: it is what `zip` and Python's zipfile use.
+_DEFLATE_LEVELS = (6, 9, 1, 2, 3, 4, 5, 7, 8, 0)
+
+
+@dataclass(frozen=True)
+class Member:
+    name: str
+    method: int
+    crc: int
+    size: int
+    offset: int  # first payload byte in the original zip
+    length: int  # payload (compressed) length
+
+
+@dataclass(frozen=True)
+class Encoded:
+    content_sha256: str
+    blob: str
+    encoding: Dict[str, object]
+    blob_bytes: bytes  # what the blob holds (content, or a verbatim stream)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _deflate(data: bytes, level: int) -> bytes:
+    c = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return c.compress(data) + c.flush()
+
+
+def _central_directory(raw: bytes) -> Iterable[Tuple[str, int, int, int, int, int]]:
+    """(name, method, crc, compressed size, size, local header offset) per entry."""
+    eocd = raw.rfind(_EOCD_SIG, max(0, len(raw) - (1 << 16) - 22))
+    if eocd < 0:
+        raise ValueError("no end of central directory record")
+    count, cd_size, cd_offset = struct.unpack_from("<HII", raw, eocd + 10)
+    if count == 0xFFFF or 0xFFFFFFFF in (cd_size, cd_offset):
+        raise ValueError("zip64 archives are not supported")
+    pos = cd_offset
+    for _ in range(count):
+        fields = _CENTRAL_HEADER.unpack_from(raw, pos)
+        if fields[0] != _CENTRAL_SIG:
+            raise ValueError(f"bad central directory entry at {pos}")
+        flags, method = fields[3], fields[4]
+        crc, csize, size = fields[7], fields[8], fields[9]
+        name_len, extra_len, comment_len = fields[10], fields[11], fields[12]
+        local_offset = fields[16]
+        name = raw[pos + 46 : pos + 46 + name_len].decode("utf-8" if flags & 0x800 else "cp437")
+        if flags & 0x1:
+            method = -1  # encrypted: keep the payload verbatim
+        yield name, method, crc, csize, size, local_offset
+        pos += 46 + name_len + extra_len + comment_len
+
+
+def read_members(raw: bytes) -> List[Member]:
+    """Members in file order with payload spans taken from the local headers.
+
+    Raises `ValueError` for layouts the store cannot split (zip64, payloads
+    that overlap or point outside the file).
+    """
+    members: List[Member] = []
+    for name, method, crc, csize, size, local_offset in _central_directory(raw):
+        fields = _LOCAL_HEADER.unpack_from(raw, local_offset)
+        if fields[0] != _LOCAL_SIG:
+            raise ValueError(f"{name}: bad local header at {local_offset}")
+        start = local_offset + _LOCAL_HEADER.size + fields[9] + fields[10]
+        members.append(Member(name, method, crc, size, start, csize))
+    members.sort(key=lambda m: m.offset)
+    end = 0
+    for m in members:
+        if m.offset < end or m.offset + m.length > len(raw):
+            raise ValueError(f"{m.name}: payload overlaps another member or the end of file")
+        end = m.offset + m.length
+    return members
+
+
+def encode_member(member: Member, payload: bytes) -> Encoded:
+    """Pick the cheapest exact encoding for one payload (runs in the pool)."""
+    if member.method == 0:
+        return Encoded(_sha256(payload), _sha256(payload), {"method": "stored"}, payload)
+    if member.method == 8:
+        try:
+            content = zlib.decompress(payload, -zlib.MAX_WBITS)
+        except zlib.error:
+            content = None
+        if content is not None and len(content) == member.size and zlib.crc32(content) == member.crc:
+            digest = _sha256(content)
+            for level in _DEFLATE_LEVELS:
+                if _deflate(content, level) == payload:
+                    return Encoded(digest, digest, {"method": "deflate", "level": level}, content)
+            return Encoded(digest, _sha256(payload), {"method": "verbatim"}, payload)
+    return Encoded("", _sha256(payload), {"method": "verbatim"}, payload)
+
+
+def decode_member(encoding: Dict[str, object], blob: bytes) -> bytes:
+    if encoding["method"] == "deflate":
+        return _deflate(blob, int(encoding["level"]))  # type: ignore[arg-type]
+    return blob
+
+
+class BlobStore:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.objects = root / "objects"
+        self.manifests = root / "manifests"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:]
+
+    def put(self, digest: str, data: bytes, repair: bool = False) -> bool:
+        """Store `data` under `digest`; False if it was already present.
+
+        With `repair`, an existing object that fails its hash check is
+        rewritten.
+        """
+        path = self._object_path(digest)
+        if path.exists() and not (repair and not self.is_valid(digest)):
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(zlib.compress(data, 9))
+        os.replace(tmp, path)
+        return True
+
+    def get(self, digest: str) -> bytes:
+        data = zlib.decompress(self._object_path(digest).read_bytes())
+        if _sha256(data) != digest:
+            raise ValueError(f"blob {digest} is corrupt")
+        return data
+
+    def is_valid(self, digest: str) -> bool:
+        try:
+            self.get(digest)
+        except (OSError, ValueError, zlib.error):
+            return False
+        return True
+
+    def stored_size(self, digest: str) -> int:
+        return self._object_path(digest).stat().st_size
+
+    def manifest_path(self, zip_name: str) -> Path:
+        return self.manifests / f"{zip_name}.json"
+
+    def load_manifest(self, zip_name: str) -> dict:
+        path = self.manifest_path(zip_name)
+        if not path.exists():
+            raise SystemExit(f"No manifest for {zip_name} in {self.manifests}")
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def iter_manifests(self) -> List[dict]:
+        if not self.manifests.is_dir():
+            return []
+        return [
+            json.loads(p.read_text(encoding="utf-8"))
+            for p in sorted(self.manifests.glob("*.zip.json"))
+        ]
+
+
+def rebuild_bytes(store: BlobStore, manifest: dict) -> bytes:
+    frame = store.get(manifest["frame"])
+    out = bytearray()
+    cursor = 0  # position in the frame
+    for entry in manifest["members"]:
+        # Frame bytes between the previous payload and this one.
+        gap = entry["offset"] - len(out)
+        out += frame[cursor : cursor + gap]
+        cursor += gap
+        payload = decode_member(entry["encoding"], store.get(entry["blob"]))
+        if len(payload) != entry["compressedSize"]:
+            raise ValueError(f"{manifest['zip']}:{entry['name']} re-encoded to the wrong length")
+        out += payload
+    out += frame[cursor:]
+    return bytes(out)
+
+
+def rebuilds(store: BlobStore, manifest: dict) -> bool:
+    """True if `manifest` rebuilds to its recorded SHA-256 from the store."""
+    try:
+        return _sha256(rebuild_bytes(store, manifest)) == manifest["sha256"]
+    except (OSError, ValueError, zlib.error):
+        return False
+
+
+def _build_manifest(zip_path: Path, raw: bytes, members: List[Member], encoded: List[Encoded]) -> Tuple[dict, bytes]:
+    frame = bytearray()
+    cursor = 0
+    entries = []
+    for m, e in zip(members, encoded):
+        frame += raw[cursor : m.offset]
+        cursor = m.offset + m.length
+        entries.append(
+            {
+                "name": m.name,
+                "offset": m.offset,
+                "compressedSize": m.length,
+                "size": m.size,
+                "sha256": e.content_sha256,
+                "blob": e.blob,
+                "encoding": e.encoding,
+            }
+        )
+    frame += raw[cursor:]
+    try:
+        source = str(zip_path.resolve().relative_to(REPO_ROOT)).replace("\\", "/")
+    except ValueError:
+        source = str(zip_path)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "zip": zip_path.name,
+        "source": source,
+        "size": len(raw),
+        "sha256": _sha256(raw),
+        "frame": _sha256(bytes(frame)),
+        "members": entries,
+    }
+    return manifest, bytes(frame)
+
+
+def discover_archives() -> List[Path]:
+    found = sorted(PATCHES_DIR.glob("[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]/*.zip"))
+    found += sorted(REPO_ROOT.glob("unitana_patch_*.zip"))
+    return found
+
+
+def ingest(store: BlobStore, zip_paths: List[Path], jobs: Optional[int] = None, prune: bool = False) -> List[dict]:
+    """Ingest `zip_paths`, returning their manifests.
+
+    A zip whose manifest already exists with the same SHA-256 is skipped if
+    it still rebuilds from the store; otherwise it is ingested again and its
+    missing or corrupt blobs are rewritten. A different zip with the same
+    file name is an error. With `prune`, a source is only deleted once its
+    rebuild has been checked.
+    """
+    loaded: List[Tuple[Path, bytes, List[Member]]] = []
+    repairing: Set[str] = set()
+    manifests: List[dict] = []
+    seen: Dict[str, str] = {}
+    for path in zip_paths:
+        raw = path.read_bytes()
+        digest = _sha256(raw)
+        if seen.setdefault(path.name, digest) != digest:
+            raise SystemExit(f"Two different archives are named {path.name}")
+        existing = store.manifest_path(path.name)
+        if existing.exists():
+            manifest = json.loads(existing.read_text(encoding="utf-8"))
+            if manifest["sha256"] != digest:
+                raise SystemExit(f"{path}: store already holds a different {path.name}")
+            if rebuilds(store, manifest):
+                manifests.append(manifest)
+                print(f"unchanged {path.name}")
+                if prune:
+                    path.unlink()
+                continue
+            print(f"warning: {path.name} no longer rebuilds from the store; re-ingesting", file=sys.stderr)
+            repairing.add(path.name)
+        if any(p.name == path.name for p, _, _ in loaded):
+            continue  # same archive registered twice (root copy and docs/patches/<date>/)
+        try:
+            members = read_members(raw)
+        except (ValueError, struct.error) as exc:
+            print(f"warning: {path.name}: {exc}; storing it as a single blob", file=sys.stderr)
+            members = []
+        loaded.append((path, raw, members))
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = [
+            [pool.submit(encode_member, m, raw[m.offset : m.offset + m.length]) for m in members]
+            for _, raw, members in loaded
+        ]
+        for (path, raw, members), futures in zip(loaded, pending):
+            encoded = [f.result() for f in futures]
+            manifest, frame = _build_manifest(path, raw, members, encoded)
+            repair = path.name in repairing
+            new = int(store.put(manifest["frame"], frame, repair))
+            for e in encoded:
+                new += store.put(e.blob, e.blob_bytes, repair)
+            if not rebuilds(store, manifest):
+                raise SystemExit(f"{path}: rebuild does not match the original; manifest not written")
+            out = store.manifest_path(path.name)
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_text(json.dumps(manifest, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+            manifests.append(manifest)
+            verbatim = sum(1 for e in encoded if e.encoding["method"] == "verbatim")
+            print(
+                f"ingested {path.name}: {len(members)} members, {new} new blobs"
+                + (f", {verbatim} stored verbatim" if verbatim else "")
+            )
+            if prune:
+                for p in zip_paths:
+                    if p.name == path.name and p.exists():
+                        p.unlink()
+    return manifests
+
+
+def dedup_report(store: BlobStore) -> Dict[str, float]:
+    manifests = store.iter_manifests()
+    archive_bytes = sum(m["size"] for m in manifests)
+    member_count = sum(len(m["members"]) for m in manifests)
+    content_bytes = sum(e["size"] for m in manifests for e in m["members"])
+
+    unique_content: Dict[str, int] = {}
+    blobs = set()
+    for m in manifests:
+        blobs.add(m["frame"])
+        for e in m["members"]:
+            blobs.add(e["blob"])
+            unique_content.setdefault(e["sha256"] or e["blob"], e["size"])
+    store_bytes = sum(store.stored_size(b) for b in blobs)
+    store_bytes += sum(store.manifest_path(m["zip"]).stat().st_size for m in manifests)
+    unique_bytes = sum(unique_content.values())
+    return {
+        "archives": len(manifests),
+        "members": member_count,
+        "uniqueMembers": len(unique_content),
+        "contentBytes": content_bytes,
+        "uniqueContentBytes": unique_bytes,
+        "contentDedupRatio": content_bytes / unique_bytes if unique_bytes else 1.0,
+        "archiveBytes": archive_bytes,
+        "storeBytes": store_bytes,
+        "storageRatio": archive_bytes / store_bytes if store_bytes else 1.0,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser()
+    p.add_argument("--store", default=str(DEFAULT_STORE), help="Blob store directory")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    ing = sub.add_parser("ingest", help="Ingest patch zips (default: every registered archive)")
+    ing.add_argument("zips", nargs="*")
+    ing.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Hashing threads")
+    ing.add_argument("--prune", action="store_true", help="Delete each zip once its rebuild is verified")
+
+    reb = sub.add_parser("rebuild", help="Rebuild an archive byte-for-byte")
+    reb.add_argument("zip_name")
+    reb.add_argument("--out", default=".", help="Output directory")
+
+    sub.add_parser("verify", help="Rebuild every archive in memory and check its SHA-256")
+    sub.add_parser("report", help="Print the deduplication ratio over the store")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    store = BlobStore(Path(args.store).expanduser().resolve())
+
+    if args.command == "ingest":
+        paths = [Path(z).expanduser() for z in args.zips] or discover_archives()
+        missing = [p for p in paths if not p.exists()]
+        if missing:
+            raise SystemExit(f"Zip not found: {missing[0]}")
+        if not paths:
+            print("No patch archives found")
+            return 0
+        ingest(store, paths, jobs=max(1, args.jobs), prune=args.prune)
+        args.command = "report"
+
+    if args.command == "rebuild":
+        manifest = store.load_manifest(Path(args.zip_name).name)
+        data = rebuild_bytes(store, manifest)
+        if _sha256(data) != manifest["sha256"]:
+            raise SystemExit(f"Rebuilt {manifest['zip']} does not match its manifest SHA-256")
+        out_dir = Path(args.out).expanduser()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        (out_dir / manifest["zip"]).write_bytes(data)
+        print(f"Rebuilt {out_dir / manifest['zip']} ({len(data)} bytes, sha256 {manifest['sha256'][:12]})")
+        return 0
+
+    if args.command == "verify":
+        failures = 0
+        for manifest in store.iter_manifests():
+            ok = rebuilds(store, manifest)
+            print(f"{'ok  ' if ok else 'FAIL'} {manifest['zip']}")
+            failures += not ok
+        return 1 if failures else 0
+
+    r = dedup_report(store)
+    print(
+        f"archives={r['archives']} members={r['members']} uniqueMembers={r['uniqueMembers']}\n"
+        f"content: {r['contentBytes']:,} bytes -> {r['uniqueContentBytes']:,} unique "
+        f"(dedup {r['contentDedupRatio']:.2f}x)\n"
+        f"on disk: {r['archiveBytes']:,} bytes of zips -> {r['storeBytes']:,} bytes of blobs+manifests "
+        f"({r['storageRatio']:.2f}x)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
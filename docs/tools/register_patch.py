@@ -6,10 +6,12 @@ Usage:
     --title "Fix dashboard smoke overflow" \
     --summary "Resolved RenderFlex overflow; updated tests" \
     --slice "dashboard" \
-    --files "lib/features/dashboard/..." 
+    --files "lib/features/dashboard/..." \
+    [--store]
 
 What it does:
-- Copies the zip into docs/patches/YYYY-MM-DD/
+- Copies the zip into docs/patches/YYYY-MM-DD/, or with --store ingests it into
+  the deduplicated blob store (docs/patches/store/, see patch_store.py)
 - Appends a record under `artifacts.patches` in docs/ai/context_db.json
 - Adds a line entry to docs/patches/PATCH_LOG.md
 """
@@ -22,6 +24,8 @@ import shutil
 from datetime import datetime
 from pathlib import Path
 
+import patch_store
+
 
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser()
@@ -31,6 +35,11 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--slice", default="")
     p.add_argument("--files", default="")
     p.add_argument("--date", default="", help="Override date YYYY-MM-DD")
+    p.add_argument(
+        "--store",
+        action="store_true",
+        help="Ingest into docs/patches/store/ instead of copying the zip",
+    )
     return p.parse_args()
 
 
@@ -47,11 +56,15 @@ def main() -> int:
         raise SystemExit(f"Zip not found: {zip_src}")
 
     day = args.date or datetime.now().strftime("%Y-%m-%d")
-    dest_dir = docs / "patches" / day
-    dest_dir.mkdir(parents=True, exist_ok=True)
-
-    dest_zip = dest_dir / zip_src.name
-    shutil.copy2(zip_src, dest_zip)
+    if args.store:
+        store = patch_store.BlobStore(patch_store.DEFAULT_STORE)
+        patch_store.ingest(store, [zip_src])
+        dest_zip = store.manifest_path(zip_src.name)
+    else:
+        dest_dir = docs / "patches" / day
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        dest_zip = dest_dir / zip_src.name
+        shutil.copy2(zip_src, dest_zip)
 
     # Load / update context DB
     db = json.loads(ai_db.read_text(encoding="utf-8"))
@@ -67,8 +80,9 @@ def main() -> int:
         "summary": args.summary,
         "slice": args.slice,
         "files": [x.strip() for x in args.files.split(",") if x.strip()],
-        "zip_path": str(dest_zip.relative_to(repo_root)).replace("\\", "/"),
     }
+    rel_dest = str(dest_zip.relative_to(repo_root)).replace("\\", "/")
+    rec["manifest_path" if args.store else "zip_path"] = rel_dest
     artifacts["patches"].append(rec)
     ai_db.write_text(json.dumps(db, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
 
@@ -80,8 +94,7 @@ def main() -> int:
         )
 
     # Append to patch log
-    rel = rec["zip_path"]
-    line = f"| {day} | `{rel}` | {args.title} |\n"
+    line = f"| {day} | `{rel_dest}` | {args.title} |\n"
     s = patch_log.read_text(encoding="utf-8")
     if line not in s:
         patch_log.write_text(s + line, encoding="utf-8")
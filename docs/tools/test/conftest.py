@@ -0,0 +1,14 @@
+"""Shared setup for the docs/tools tests.
+
+Run from the repo root:
+  python3 -m pytest -q docs/tools/test
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[1]
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOLS_DIR))
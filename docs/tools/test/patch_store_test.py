@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import warnings
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pytest
+
+import patch_store
+from patch_store import BlobStore, ingest, rebuild_bytes, rebuilds
+
+_SOURCE = "".join(f"final value{i} = compute({i}, {i * 7});\n" for i in range(400)).encode("utf-8")
+
+
+def _huffman_only(*_args, **_kwargs):
+    # Not reproducible by any zlib level, like Info-ZIP output on large files.
+    return zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS, 9, zlib.Z_HUFFMAN_ONLY)
+
+
+def _write_zip(path: Path, members: List[Tuple[str, bytes, int]], monkeypatch) -> Path:
+    """`members` are (name, data, method); method -1 deflates with Huffman-only."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # duplicate names are intentional
+        with zipfile.ZipFile(path, "w") as z:
+            for name, data, method in members:
+                info = zipfile.ZipInfo(name, date_time=(2026, 2, 5, 15, 27, 42))
+                if method == -1:
+                    with monkeypatch.context() as m:
+                        m.setattr(zipfile, "_get_compressor", _huffman_only)
+                        info.compress_type = zipfile.ZIP_DEFLATED
+                        z.writestr(info, data)
+                else:
+                    info.compress_type = method
+                    z.writestr(info, data)
+    return path
+
+
+def _patch_zip(tmp_path: Path, monkeypatch, name: str = "unitana_patch_a_2026-02-05.zip", extra: bytes = b"") -> Path:
+    return _write_zip(
+        tmp_path / name,
+        [
+            ("app/", b"", zipfile.ZIP_STORED),
+            ("app/notes.md", b"stored as-is\n" + extra, zipfile.ZIP_STORED),
+            ("app/lib/main.dart", _SOURCE, zipfile.ZIP_DEFLATED),
+            ("app/lib/main.dart", _SOURCE + b"// second copy\n", zipfile.ZIP_DEFLATED),
+            ("app/lib/big.dart", _SOURCE * 2, -1),
+        ],
+        monkeypatch,
+    )
+
+
+def _objects(store: BlobStore) -> Dict[str, bytes]:
+    return {str(p.relative_to(store.objects)): p.read_bytes() for p in store.objects.rglob("*") if p.is_file()}
+
+
+def test_round_trip_is_byte_for_byte(tmp_path: Path, monkeypatch):
+    source = _patch_zip(tmp_path, monkeypatch)
+    store = BlobStore(tmp_path / "store")
+    [manifest] = ingest(store, [source], jobs=4)
+
+    methods = [e["encoding"]["method"] for e in manifest["members"]]
+    assert methods == ["stored", "stored", "deflate", "deflate", "verbatim"]
+    assert [e["name"] for e in manifest["members"]].count("app/lib/main.dart") == 2
+    assert rebuild_bytes(store, manifest) == source.read_bytes()
+    assert rebuilds(store, manifest)
+    with zipfile.ZipFile(source) as z:
+        assert z.testzip() is None
+
+
+def test_reingest_unchanged_and_dedup(tmp_path: Path, monkeypatch, capsys):
+    store = BlobStore(tmp_path / "store")
+    first = _patch_zip(tmp_path, monkeypatch)
+    ingest(store, [first])
+    before = _objects(store)
+
+    [manifest] = ingest(store, [first])
+    assert "unchanged unitana_patch_a_2026-02-05.zip" in capsys.readouterr().out
+    assert _objects(store) == before
+    assert manifest == store.load_manifest(first.name)
+
+    # A follow-up patch that edits one file adds its blob and a new frame only.
+    second = _patch_zip(tmp_path, monkeypatch, "unitana_patch_b_2026-02-06.zip", extra=b"edited\n")
+    ingest(store, [second])
+    assert len(_objects(store)) == len(before) + 2
+    report = patch_store.dedup_report(store)
+    assert report["members"] == 10
+    assert report["uniqueMembers"] == 6
+    assert report["contentDedupRatio"] > 1.5
+
+
+def test_prune_checks_the_store_before_deleting(tmp_path: Path, monkeypatch):
+    store = BlobStore(tmp_path / "store")
+    source = _patch_zip(tmp_path, monkeypatch)
+    original = source.read_bytes()
+    [manifest] = ingest(store, [source])
+
+    # A missing and a corrupt blob: re-ingesting repairs them before pruning.
+    store._object_path(manifest["members"][2]["blob"]).unlink()
+    store._object_path(manifest["frame"]).write_bytes(zlib.compress(b"garbage"))
+    assert not rebuilds(store, manifest)
+    ingest(store, [source], prune=True)
+    assert not source.exists()
+    assert rebuild_bytes(store, manifest) == original
+
+    # If the rebuild cannot be verified, the source is kept.
+    source.write_bytes(original)
+    store._object_path(manifest["frame"]).unlink()
+    monkeypatch.setattr(patch_store, "rebuilds", lambda *_: False)
+    with pytest.raises(SystemExit):
+        ingest(store, [source], prune=True)
+    assert source.read_bytes() == original
+
+
+def test_same_name_different_zip_is_rejected(tmp_path: Path, monkeypatch):
+    store = BlobStore(tmp_path / "store")
+    ingest(store, [_patch_zip(tmp_path, monkeypatch)])
+    other = tmp_path / "other"
+    other.mkdir()
+    changed = _patch_zip(other, monkeypatch, extra=b"different\n")
+    with pytest.raises(SystemExit):
+        ingest(store, [changed])
+
+
+def test_repository_archives_round_trip(tmp_path: Path):
+    archives = sorted(patch_store.REPO_ROOT.glob("unitana_patch_*.zip"))
+    if not archives:
+        pytest.skip("no patch archives at the repo root")
+    store = BlobStore(tmp_path / "store")
+    for manifest, path in zip(ingest(store, archives), archives):
+        assert rebuild_bytes(store, manifest) == path.read_bytes()